@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+adaptive_limit.py
+
+Adaptive concurrency control for ULPR backend requests.
+
+What it does
+------------
+- AdaptiveLimiter: an AIMD limiter with a latency gradient. While the
+  recent latency stays close to the best latency seen, the in-flight limit
+  grows additively (+1 per "round" of limit completions); when latency
+  climbs past `latency_tolerance` × baseline, or a request errors/times out,
+  the limit is cut multiplicatively.
+- LimitedBackend: wraps any LLMBackend so every generate() call goes
+  through the limiter.
+- metrics(): current limit, in-flight count, recent/baseline latency and
+  error rate, for logs and the service /health endpoint.
+
+Throughput then settles near what the backend (e.g. one Ollama server) can
+actually serve, without hand-tuning a worker count.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from lesson_plan_evaluator import LLMBackend
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial_limit: float = 2,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_tolerance: float = 1.5,
+        backoff: float = 0.7,
+        error_backoff: float = 0.5,
+        smoothing: float = 0.2,
+        baseline_window: int = 500,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.error_backoff = error_backoff
+        self.smoothing = smoothing
+
+        self.inflight = 0
+        self.latency_ewma: Optional[float] = None
+        self.baseline: Optional[float] = None  # best latency in the window
+        self._window: Deque[float] = deque(maxlen=baseline_window)
+        self.successes = 0
+        self.errors = 0
+        self._error_ewma = 0.0
+        self._since_decrease = 0
+        self._cond = threading.Condition()
+
+    # ------------------------------------------------------------------ #
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            ok = self._cond.wait_for(lambda: self.inflight < int(self.limit), timeout=timeout)
+            if ok:
+                self.inflight += 1
+            return ok
+
+    def release(self, latency: float, ok: bool = True):
+        with self._cond:
+            self.inflight -= 1
+            self._error_ewma = (1 - self.smoothing) * self._error_ewma + self.smoothing * (0.0 if ok else 1.0)
+            self._since_decrease += 1
+            if not ok:
+                self.errors += 1
+                self._decrease(self.error_backoff)
+            else:
+                self.successes += 1
+                self._observe(latency)
+                if self.latency_ewma <= self.baseline * self.latency_tolerance:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+                else:
+                    self._decrease(self.backoff)
+            self._cond.notify_all()
+
+    def _decrease(self, factor: float):
+        # At most one cut per round: requests already in flight when we backed
+        # off report the old congestion and must not cut the limit again.
+        if self._since_decrease >= int(self.limit):
+            self.limit = max(self.min_limit, self.limit * factor)
+            self._since_decrease = 0
+
+    def _observe(self, latency: float):
+        self._window.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = (1 - self.smoothing) * self.latency_ewma + self.smoothing * latency
+        # Baseline = fastest latency in a long window, so a permanently slower
+        # backend (bigger model, longer lessons) is eventually re-learned.
+        self.baseline = min(self._window)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "inflight": self.inflight,
+                "latency_ewma_s": self.latency_ewma,
+                "latency_baseline_s": self.baseline,
+                "error_rate": self._error_ewma,
+                "successes": self.successes,
+                "errors": self.errors,
+            }
+
+
+class LimitedBackend(LLMBackend):
+    """Route generate() through an AdaptiveLimiter; errors count as congestion."""
+
+    def __init__(self, backend: LLMBackend, limiter: Optional[AdaptiveLimiter] = None):
+        self.backend = backend
+        self.limiter = limiter or AdaptiveLimiter()
+
+    def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.limiter.acquire()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            out = self.backend.generate(system_prompt, user_prompt)
+            ok = True
+            return out
+        finally:
+            self.limiter.release(time.perf_counter() - t0, ok=ok)
+
+    def last_usage(self) -> Optional[Dict[str, Any]]:
+        return self.backend.last_usage()
+
+    def metrics(self) -> Dict[str, Any]:
+        out = self.limiter.metrics()
+        if hasattr(self.backend, "metrics"):
+            out["inner"] = self.backend.metrics()
+        return out
+
+
+def format_metrics(m: Dict[str, Any]) -> str:
+    lat = m.get("latency_ewma_s")
+    base = m.get("latency_baseline_s")
+    return (
+        f"limit={m['limit']} inflight={m['inflight']} "
+        f"latency={lat if lat is None else round(lat, 2)}s baseline={base if base is None else round(base, 2)}s "
+        f"error_rate={m['error_rate']:.2f}"
+    )
@@ -4,7 +4,8 @@ compare_reports_top10_pdf.py
 
 What it does
 ------------
-- Loads one or more JSON report files.
+- Loads one or more JSON report files (raw model JSON, *.scored.json, or a
+  scored_reports.jsonl stream with one report per line).
 - Flattens nested JSON to dot-notation numeric features.
 - Computes the top-K (default 10) most variable features across tools.
 - Saves a CSV (features × tools), per-feature PNG bar charts, and a single
@@ -32,16 +33,21 @@ Notes
 - Missing or non-numeric values are ignored when computing variance.
 """
 
+from __future__ import annotations
+
 import os
 import json
 import math
 import argparse
-from typing import Any, Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from profiling import add_profile_args, profiled, span
 
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+# numpy / pandas / matplotlib are imported inside the functions that use them,
+# so `--help` and argument errors return immediately.
+if TYPE_CHECKING:
+    import pandas as pd
+    import matplotlib.pyplot as plt
 
 
 # ----------------------------- JSON flattening ------------------------------ #
@@ -99,6 +105,25 @@ def flatten_json(obj: Any, parent_key: str = "") -> Dict[str, float]:
 
 # --------------------------- Loading & alignment ---------------------------- #
 
+def iter_jsonl_reports(path: str):
+    """
+    Yield (label, record) from a scored_reports.jsonl file; blank lines are
+    skipped. The file may still be growing (a batch run streams into it), so
+    an unterminated last line that does not parse yet is ignored.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                if line.endswith("\n"):
+                    raise
+                break
+            yield str(rec.get("lesson") or f"{os.path.basename(path)}[{i}]"), rec
+
+
 def load_reports(paths: List[str]) -> Tuple[pd.DataFrame, List[str], List[str]]:
     """
     Returns:
@@ -106,12 +131,24 @@ def load_reports(paths: List[str]) -> Tuple[pd.DataFrame, List[str], List[str]]:
         labels: list of tool labels in df.index
         missing: paths that were missing or failed to parse
     """
+    import pandas as pd
+
     labels, flat_rows, missing = [], [], []
     for p in paths:
-        label = os.path.basename(p).replace("report(", "").replace(").json", "")
+        label = os.path.basename(p).replace("report(", "").replace(").scored.json", "").replace(").json", "")
         if not os.path.exists(p):
             missing.append(p)
             continue
+        if p.endswith(".jsonl"):
+            # Scored-report stream from a batch run: one tool/lesson per line.
+            try:
+                for rec_label, data in iter_jsonl_reports(p):
+                    labels.append(rec_label)
+                    flat_rows.append(flatten_json(data))
+            except Exception as e:
+                print(f"Failed to load {p}: {e}")
+                missing.append(p)
+            continue
         try:
             with open(p, "r", encoding="utf-8") as f:
                 data = json.load(f)
@@ -144,6 +181,8 @@ def plot_feature_bar(df: pd.DataFrame, feature: str, title: str = None, dpi: int
     """
     Create and return a matplotlib Figure for a single feature bar chart.
     """
+    import matplotlib.pyplot as plt
+
     fig = plt.figure()
     ax = fig.add_subplot(111)
     series = df[feature]
@@ -157,6 +196,8 @@ def plot_feature_bar(df: pd.DataFrame, feature: str, title: str = None, dpi: int
 
 
 def figure_title_page(title: str, subtitle: str = "", dpi: int = 150):
+    import matplotlib.pyplot as plt
+
     fig = plt.figure()
     # simple centered text layout
     fig.text(0.5, 0.65, title, ha="center", va="center", fontsize=22, weight="bold")
@@ -171,6 +212,9 @@ def figure_table(df: pd.DataFrame, title: str = "", fontsize: int = 8, dpi: int
     """
     Render a DataFrame as a table on a figure.
     """
+    import numpy as np
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=(10, 6))
     ax = fig.add_subplot(111)
     ax.axis("off")
@@ -210,6 +254,9 @@ def build_pdf_report(output_pdf: str,
     - Table page
     - One page per feature (bar chart)
     """
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
     with PdfPages(output_pdf) as pdf:
         # Title
         title_fig = figure_title_page(
@@ -239,12 +286,19 @@ def main():
     parser.add_argument("-o", "--output_dir", default="./out", help="Directory for outputs")
     parser.add_argument("-k", "--topk", type=int, default=10, help="Number of most variable features")
     parser.add_argument("-p", "--pdf_name", default="report_comparison.pdf", help="Output PDF filename")
+    add_profile_args(parser)
     args = parser.parse_args()
 
+    with profiled(args):
+        run(args)
+
+
+def run(args: argparse.Namespace):
     ensure_dir(args.output_dir)
 
     # Load reports
-    df, labels, missing = load_reports(args.files)
+    with span("load_reports"):
+        df, labels, missing = load_reports(args.files)
     if missing:
         print("Missing / failed files:")
         for m in missing:
@@ -259,7 +313,8 @@ def main():
         return
 
     # Top-K features by variance
-    top_features = compute_top_k_variance(df, args.topk)
+    with span("top_k"):
+        top_features = compute_top_k_variance(df, args.topk)
     if not top_features:
         print("Could not determine top features. Exiting.")
         return
@@ -271,7 +326,8 @@ def main():
 
     # Save CSV
     csv_path = os.path.join(args.output_dir, "top_variable_features.csv")
-    top_table.to_csv(csv_path)
+    with span("write_csv"):
+        top_table.to_csv(csv_path)
     print(f"Saved table CSV: {csv_path}")
 
     # Per-feature charts (PNG) and also collect figures for PDF
@@ -280,16 +336,19 @@ def main():
 
     feature_figs: List[Tuple[str, plt.Figure]] = []
     for feat in top_features:
-        fig = plot_feature_bar(df, feat, title=feat)
+        with span("plot"):
+            fig = plot_feature_bar(df, feat, title=feat)
         png_path = os.path.join(charts_dir, f"{sanitize_filename(feat)}.png")
-        fig.savefig(png_path, dpi=150)
+        with span("save_png"):
+            fig.savefig(png_path, dpi=150)
         print(f"Saved chart: {png_path}")
         # keep fig open for PDF; we'll close when writing the PDF
         feature_figs.append((feat, fig))
 
     # Build PDF
     pdf_path = os.path.join(args.output_dir, args.pdf_name)
-    build_pdf_report(pdf_path, top_table, feature_figs)
+    with span("build_pdf"):
+        build_pdf_report(pdf_path, top_table, feature_figs)
     print(f"Wrote PDF: {pdf_path}")
 
 
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+evaluator_service.py
+
+Local asynchronous HTTP service around the ULPR evaluator.
+
+What it does
+------------
+- Builds the backend once and keeps it warm across requests.
+- Accepts lessons into bounded priority lanes (scheduling.Lanes):
+  "interactive" (the default) and "bulk", each with its own queue limit;
+  when a lane is full, new submissions get `429 Too Many Requests` with a
+  Retry-After header.
+- Runs at most --concurrency backend calls at a time through the usual
+  build_user_prompt → backend → rate_from_model → format_markdown_report path,
+  taking the next job by deadline and lane weight: interactive jobs overtake
+  queued bulk jobs, and bulk still gets a share of the slots.
+
+Endpoints
+---------
+POST /jobs               {"lesson": "<lesson text>", "priority": "interactive"|"bulk", "deadline_s": 20}
+                         → 202 {"id": ..., "status": "queued"}   (priority and deadline_s are optional)
+GET  /jobs/<id>          → {"id", "status", "priority", "deadline", "submitted_at", "started_at", "finished_at", "error"}
+GET  /jobs/<id>/result   → {"id", "total", "by_section", "cap_notes", "model_json", "scored", "report_md"}
+GET  /health             → queue depth, running jobs, limits, per-lane depth/waits/deadline misses
+                           (+ adaptive limiter metrics)
+
+Usage
+-----
+python evaluator_service.py --backend ollama --model llama3.1 \
+    --host 127.0.0.1 --port 8765 --queue-size 64 --bulk-queue-size 4096 --concurrency 2 [--adaptive]
+
+The service binds to localhost by default and needs only the standard
+library (plus whatever the chosen backend needs). For tests, construct
+`EvaluationService(backend=<any LLMBackend>)` directly.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from lesson_plan_evaluator import (
+    LLMBackend, add_backend_args, backend_meta, build_scored_report, evaluate_lesson, make_backend, raw_model_json,
+    totals,
+)
+from scheduling import DEFAULT_LANES, Lane, Lanes
+
+MAX_BODY_BYTES = 2 * 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+class QueueFullError(Exception):
+    """Raised by EvaluationService.submit when the job queue is at capacity."""
+
+
+@dataclasses.dataclass
+class Job:
+    id: str
+    lesson_text: str
+    priority: str = "interactive"
+    deadline: Optional[float] = None
+    status: str = "queued"  # queued | running | done | failed
+    submitted_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: str = ""
+    result: Optional[Dict[str, Any]] = None
+
+    def status_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "deadline": self.deadline,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+# ------------------------------- Service ------------------------------------ #
+
+class EvaluationService:
+    """Bounded priority lanes + fixed pool of workers calling a shared backend."""
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        queue_size: int = 64,
+        concurrency: int = 2,
+        keep_finished: int = 1000,
+        prompt_mode: str = "full",
+        lanes: Optional[Dict[str, Lane]] = None,
+        lane_queue_sizes: Optional[Dict[str, int]] = None,
+    ):
+        self.backend = backend
+        self.prompt_mode = prompt_mode
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+        self.keep_finished = keep_finished
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.lanes = Lanes(lanes)
+        # Per-lane queue limits; lanes not listed use queue_size.
+        self.lane_queue_sizes = {name: (lane_queue_sizes or {}).get(name, queue_size) for name in self.lanes.lanes}
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._workers: list = []
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ulpr-eval")
+        self._running = 0
+
+    async def start(self):
+        self._ready = asyncio.Semaphore(0)  # one permit per queued job
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    def submit(self, lesson_text: str, priority: str = "interactive", deadline_s: Optional[float] = None) -> Job:
+        """
+        Enqueue a lesson in `priority`'s lane, due `deadline_s` seconds from
+        now (default: the lane's target). Raises ValueError for an unknown
+        priority and QueueFullError instead of waiting when the lane is full.
+        Raises RuntimeError before start().
+        """
+        if self._ready is None:
+            raise RuntimeError("service not started; await start() before submitting jobs")
+        if priority not in self.lanes.lanes:
+            raise ValueError(f"unknown priority {priority!r}; expected one of {', '.join(self.lanes.lanes)}")
+        if self.lanes.depth(priority) >= self.lane_queue_sizes[priority]:
+            raise QueueFullError(f"{priority} queue full ({self.lane_queue_sizes[priority]})")
+        job = Job(id=uuid.uuid4().hex, lesson_text=lesson_text, priority=priority, submitted_at=time.time())
+        job.deadline = self.lanes.push(job, priority, deadline_s, now=job.submitted_at).deadline
+        self._ready.release()
+        self.jobs[job.id] = job
+        self._evict_finished()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.lanes),
+            "running": self._running,
+            "queue_size": self.queue_size,
+            "lane_queue_sizes": self.lane_queue_sizes,
+            "concurrency": self.concurrency,
+            "jobs_tracked": len(self.jobs),
+            "lanes": self.lanes.metrics(),
+            **({"backend": self.backend.metrics()} if hasattr(self.backend, "metrics") else {}),
+        }
+
+    def _evict_finished(self):
+        finished = [jid for jid, j in self.jobs.items() if j.status in ("done", "failed")]
+        for jid in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[jid]
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._ready.acquire()
+            ticket = self.lanes.pop()
+            job = ticket.item
+            job.status = "running"
+            job.started_at = time.time()
+            self._running += 1
+            try:
+                timings: Dict[str, float] = {}
+                model_json, ratings, cap_notes, report_md = await loop.run_in_executor(
+                    self._executor, evaluate_lesson, self.backend, job.lesson_text, timings, self.prompt_mode
+                )
+                total, by_section = totals(ratings)
+                job.result = {
+                    "id": job.id,
+                    "total": total,
+                    "by_section": by_section,
+                    "cap_notes": cap_notes,
+                    "model_json": raw_model_json(model_json),
+                    "scored": build_scored_report(
+                        ratings, cap_notes, model_json, lesson=job.id,
+                        meta={**backend_meta(self.backend), "timings": timings}, prompt_mode=self.prompt_mode,
+                    ),
+                    "report_md": report_md,
+                }
+                job.status = "done"
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = "failed"
+            finally:
+                self._running -= 1
+                job.finished_at = time.time()
+                self.lanes.done(ticket, now=job.finished_at)
+                job.lesson_text = ""  # results are kept; inputs are not
+
+    # ----------------------------- HTTP layer ------------------------------- #
+
+    def route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+
+        if parts == ["health"] and method == "GET":
+            return 200, self.stats()
+
+        if parts == ["jobs"]:
+            if method != "POST":
+                return 405, {"error": "use POST /jobs"}
+            try:
+                payload = json.loads(body.decode("utf-8") or "{}")
+            except Exception:
+                return 400, {"error": "body must be JSON"}
+            lesson = payload.get("lesson") if isinstance(payload, dict) else None
+            if not isinstance(lesson, str) or not lesson.strip():
+                return 400, {"error": "missing 'lesson' text"}
+            priority = payload.get("priority", "interactive")
+            deadline_s = payload.get("deadline_s")
+            if deadline_s is not None and (isinstance(deadline_s, bool) or not isinstance(deadline_s, (int, float))
+                                           or deadline_s <= 0):
+                return 400, {"error": "'deadline_s' must be a positive number of seconds"}
+            try:
+                job = self.submit(lesson, priority=priority, deadline_s=deadline_s)
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            except QueueFullError as e:
+                return 429, {"error": str(e), **self.stats()}
+            return 202, {"id": job.id, "status": job.status}
+
+        if len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return 404, {"error": "unknown job id"}
+            if len(parts) == 2:
+                return 200, job.status_dict()
+            if parts[2] == "result":
+                if job.status == "done":
+                    return 200, job.result
+                if job.status == "failed":
+                    return 500, job.status_dict()
+                return 409, job.status_dict()
+
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                return
+            method, path, _ = (request_line.split(" ", 2) + ["", ""])[:3]
+            headers: Dict[str, str] = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                k, _, v = line.partition(":")
+                headers[k.strip().lower()] = v.strip()
+
+            length = int(headers.get("content-length", "0") or 0)
+            if length > MAX_BODY_BYTES:
+                status, payload = 413, {"error": f"body larger than {MAX_BODY_BYTES} bytes"}
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = self.route(method.upper(), path, body)
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(data)}",
+            "Connection: close",
+        ]
+        if status == 429:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(service: EvaluationService, host: str = "127.0.0.1", port: int = 8765):
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"ULPR service listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="ULPR evaluation service (local HTTP, async job queue)")
+    add_backend_args(p)
+    p.add_argument("--host", default="127.0.0.1", help="Bind address (default: localhost only)")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--queue-size", type=int, default=64, help="Max queued interactive jobs before answering 429")
+    p.add_argument("--bulk-queue-size", type=int, default=4096, help="Max queued bulk jobs before answering 429")
+    p.add_argument("--interactive-weight", type=float, default=DEFAULT_LANES["interactive"].weight,
+                   help="Interactive dispatches per bulk dispatch while both lanes are backlogged")
+    p.add_argument("--interactive-target", type=float, default=DEFAULT_LANES["interactive"].target_s,
+                   help="Deadline (seconds) for interactive jobs that don't set deadline_s")
+    p.add_argument("--bulk-target", type=float, default=DEFAULT_LANES["bulk"].target_s,
+                   help="Deadline (seconds) for bulk jobs that don't set deadline_s")
+    p.add_argument("--concurrency", type=int, default=2, help="Max concurrent backend requests")
+    p.add_argument("--adaptive", action="store_true",
+                   help="Adapt in-flight backend requests (AIMD on latency/errors) up to --concurrency")
+    args = p.parse_args(argv)
+
+    backend = make_backend(args)
+    if args.adaptive:
+        from adaptive_limit import AdaptiveLimiter, LimitedBackend
+        backend = LimitedBackend(backend, AdaptiveLimiter(initial_limit=1, max_limit=args.concurrency))
+    lanes = {
+        "interactive": Lane(weight=args.interactive_weight, target_s=args.interactive_target),
+        "bulk": Lane(weight=1.0, target_s=args.bulk_target),
+    }
+    service = EvaluationService(
+        backend, queue_size=args.queue_size, concurrency=args.concurrency, prompt_mode=args.prompt_mode,
+        lanes=lanes, lane_queue_sizes={"bulk": args.bulk_queue_size},
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,22 +1,271 @@
 # 02_correlations.py
+import argparse
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
 INPUT_CSV = "rubric_converted.csv"
 OUTPUT_CSV = "criteria_correlations(ANA).csv"
+CI_OUTPUT_CSV = "criteria_correlations_ci(ANA).csv"
+
+# Upper bound for the per-chunk resampling arrays (bytes).
+CHUNK_BYTES = 256 * 2**20
+
+
+def correlation_matrix(df: pd.DataFrame, method: str = "pearson") -> pd.DataFrame:
+    """Pairwise correlation between criteria (columns) across reports (rows)."""
+    return df.corr(method=method)
+
+
+def _variance(var: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """E[x²] - E[x]² with round-off (a constant column comes out at ~1e-16) snapped to 0."""
+    return np.where(var > 1e-12 * np.maximum(second, 1.0), var, 0.0)
+
+
+def _corr_from_moments(mean: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """(B, p) means and (B, p, p) E[xy] → (B, p, p) Pearson r (NaN for constant columns)."""
+    cov = second - mean[:, :, None] * mean[:, None, :]
+    sd = np.sqrt(_variance(np.diagonal(cov, axis1=1, axis2=2), np.diagonal(second, axis1=1, axis2=2)))
+    denom = sd[:, :, None] * sd[:, None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denom > 0, cov / denom, np.nan)
+
+
+# ---- Band path: resample 5x5 contingency tables (cost independent of corpus size) ----
+
+def _pair_tables(X: np.ndarray, max_levels: int = 10):
+    """
+    For small-integer data (bands): (levels, (P, L, L) joint counts per pair),
+    or None when the columns are not discrete enough for the table path.
+    """
+    levels = np.unique(X)
+    if len(levels) > max_levels or not np.all(np.isfinite(levels)):
+        return None
+    codes = np.searchsorted(levels, X)
+    n, p = X.shape
+    L = len(levels)
+    i, j = np.triu_indices(p, k=1)
+    flat = codes[:, i] * L + codes[:, j] + (np.arange(len(i)) * L * L)[None, :]
+    tables = np.bincount(flat.ravel(), minlength=len(i) * L * L).reshape(len(i), L, L)
+    return levels, tables
+
+
+def _table_corr(levels: np.ndarray, cells: np.ndarray, n: int) -> np.ndarray:
+    """Pearson r from (..., L, L) cell counts."""
+    row = cells.sum(axis=-1)
+    col = cells.sum(axis=-2)
+    mi, mj = row @ levels / n, col @ levels / n
+    si, sj = row @ levels**2 / n, col @ levels**2 / n
+    vi, vj = _variance(si - mi**2, si), _variance(sj - mj**2, sj)
+    sij = np.einsum("...ab,a,b->...", cells, levels, levels) / n
+    denom = np.sqrt(vi * vj)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denom > 0, (sij - mi * mj) / denom, np.nan)
+
+
+def _table_bootstrap(data, n_resamples: int, seed) -> np.ndarray:
+    """Row bootstrap per pair = multinomial redraw of that pair's table."""
+    levels, tables = data
+    rng = np.random.default_rng(seed)
+    P, L, _ = tables.shape
+    n = int(tables[0].sum())
+    cells = rng.multinomial(n, tables.reshape(P, L * L) / n, size=(n_resamples, P))
+    return _table_corr(levels, cells.reshape(n_resamples, P, L, L), n)
+
+
+def _table_permutation(data, n_resamples: int, seed) -> np.ndarray:
+    """
+    Shuffling one column against the other keeps both margins and gives a
+    hypergeometric table; drawn cell by cell, vectorized over resamples and pairs.
+    """
+    levels, tables = data
+    rng = np.random.default_rng(seed)
+    P, L, _ = tables.shape
+    n = int(tables[0].sum())
+    rows = np.broadcast_to(tables.sum(axis=2), (n_resamples, P, L))
+    pool = np.broadcast_to(tables.sum(axis=1), (n_resamples, P, L)).copy()
+    cells = np.zeros((n_resamples, P, L, L), dtype=np.int64)
+    for a in range(L):
+        need = rows[:, :, a].copy()
+        left = pool.sum(axis=2)
+        for b in range(L - 1):
+            left = left - pool[:, :, b]
+            draw = rng.hypergeometric(pool[:, :, b], left, need)
+            cells[:, :, a, b] = draw
+            need -= draw
+        cells[:, :, a, L - 1] = need
+        pool -= cells[:, :, a, :]
+    return _table_corr(levels, cells, n)
+
+
+# ---- Generic path: batched resampling matrices over rows ----
 
-def main():
-    df = pd.read_csv(INPUT_CSV, index_col="model")
+def _bootstrap_chunk(X: np.ndarray, n_resamples: int, seed) -> np.ndarray:
+    """
+    n_resamples bootstrap correlation matrices in one batch: each resample is a
+    row of multiplicity counts W (B, n), so the moments are two matrix products.
+    """
+    rng = np.random.default_rng(seed)
+    n, p = X.shape
+    idx = rng.integers(0, n, size=(n_resamples, n))
+    offsets = (np.arange(n_resamples) * n)[:, None]
+    W = np.bincount((idx + offsets).ravel(), minlength=n_resamples * n).reshape(n_resamples, n) / n
+    XX = (X[:, :, None] * X[:, None, :]).reshape(n, p * p)
+    i, j = np.triu_indices(p, k=1)
+    return _corr_from_moments(W @ X, (W @ XX).reshape(n_resamples, p, p))[:, i, j]
+
+
+def _permutation_chunk(X: np.ndarray, n_resamples: int, seed) -> np.ndarray:
+    """
+    n_resamples null correlation matrices: every column is shuffled
+    independently, which breaks all pairwise associations at once.
+    """
+    rng = np.random.default_rng(seed)
+    n, p = X.shape
+    sd = np.sqrt(_variance(X.var(axis=0), (X * X).mean(axis=0)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Z = np.where(sd > 0, (X - X.mean(axis=0)) / sd, np.nan)
+    perm = np.argsort(rng.random((n_resamples, n, p)), axis=1)
+    Zp = np.take_along_axis(np.broadcast_to(Z, (n_resamples, n, p)), perm, axis=1)
+    i, j = np.triu_indices(p, k=1)
+    return (np.einsum("bni,bnj->bij", Zp, Zp, optimize=True) / n)[:, i, j]
+
+
+def _run_chunks(fn, data, n_resamples: int, chunk: int, seed: int, workers) -> np.ndarray:
+    sizes = [min(chunk, n_resamples - i) for i in range(0, n_resamples, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers and workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(fn, [data] * len(sizes), sizes, seeds))
+    else:
+        parts = [fn(data, size, s) for size, s in zip(sizes, seeds)]
+    return np.concatenate(parts, axis=0)
+
+
+def correlation_intervals(
+    df: pd.DataFrame,
+    n_resamples: int = 10000,
+    alpha: float = 0.05,
+    seed: int = 0,
+    workers=None,
+    chunk=None,
+) -> pd.DataFrame:
+    """
+    Pearson r for every criterion pair with a percentile bootstrap CI and a
+    permutation test (two-sided p-value and the null (1 - alpha) band).
+
+    Band data (a few integer levels) from a large corpus is resampled through
+    each pair's contingency table, so the cost does not grow with the number
+    of reports; anything else uses batched row resampling. Resamples run in batches
+    of `chunk` (sized from CHUNK_BYTES by default); `workers` > 1 spreads the
+    batches over processes.
+
+    Missing values are handled pairwise, as in correlation_matrix(): pairs
+    involving a column with gaps are resampled over the rows complete for
+    that pair, and "n" is that row count.
+    """
+    gappy = [c for c in df.columns if df[c].isna().any()]
+    if gappy:
+        return _pairwise_intervals(df, gappy, n_resamples, alpha, seed, workers, chunk)
+    X = df.to_numpy(dtype=float)
+    n, p = X.shape
+    P = p * (p - 1) // 2
+    i, j = np.triu_indices(p, k=1)
+    observed = _corr_from_moments(X.mean(axis=0)[None], (X.T @ X / n)[None])[0][i, j]
+
+    tables = _pair_tables(X)
+    # The table path draws P * L^2 variates per resample; small corpora are
+    # cheaper to resample row by row.
+    if tables is not None and n * p >= P * len(tables[0]) ** 2:
+        per_resample = 8 * P * len(tables[0]) ** 2 * 3
+        data, boot_fn, perm_fn = tables, _table_bootstrap, _table_permutation
+    else:
+        per_resample = 8 * max(n * p, p * p) * 3
+        data, boot_fn, perm_fn = X, _bootstrap_chunk, _permutation_chunk
+    if chunk is None:
+        chunk = max(1, CHUNK_BYTES // per_resample)
+
+    boot = _run_chunks(boot_fn, data, n_resamples, chunk, seed, workers)
+    null = _run_chunks(perm_fn, data, n_resamples, chunk, seed + 1, workers)
+
+    q = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+    with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN pairs (constant criteria)
+        boot_lo, boot_hi = np.nanpercentile(boot, q, axis=0)
+        null_lo, null_hi = np.nanpercentile(null, q, axis=0)
+        p_perm = (np.sum(np.abs(null) >= np.abs(observed) - 1e-12, axis=0) + 1) / (n_resamples + 1)
+    p_perm[np.isnan(observed)] = np.nan
+
+    cols = list(df.columns)
+    return pd.DataFrame({
+        "criterion_a": [cols[k] for k in i],
+        "criterion_b": [cols[k] for k in j],
+        "r": observed,
+        "boot_lo": boot_lo,
+        "boot_hi": boot_hi,
+        "perm_p": p_perm,
+        "null_lo": null_lo,
+        "null_hi": null_hi,
+        "n": n,
+    })
+
+
+def _pairwise_intervals(df, gappy, n_resamples, alpha, seed, workers, chunk) -> pd.DataFrame:
+    """correlation_intervals() for data with gaps: complete columns in one batch, the rest pair by pair."""
+    complete = [c for c in df.columns if c not in gappy]
+    parts = []
+    if len(complete) > 1:
+        parts.append(correlation_intervals(df[complete], n_resamples, alpha, seed, workers, chunk))
+    cols = list(df.columns)
+    for a, b in zip(*np.triu_indices(len(cols), k=1)):
+        pair = [cols[a], cols[b]]
+        if pair[0] not in gappy and pair[1] not in gappy:
+            continue
+        rows = df[pair].dropna()
+        if len(rows) < 2:
+            parts.append(pd.DataFrame({"criterion_a": [pair[0]], "criterion_b": [pair[1]], "n": [len(rows)]}))
+        else:
+            parts.append(correlation_intervals(rows, n_resamples, alpha, seed, workers, chunk))
+    order = {(cols[a], cols[b]): k for k, (a, b) in enumerate(zip(*np.triu_indices(len(cols), k=1)))}
+    out = pd.concat(parts, ignore_index=True)
+    out = out.iloc[sorted(range(len(out)), key=lambda k: order[(out["criterion_a"][k], out["criterion_b"][k])])]
+    return out.reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Criterion correlations with bootstrap/permutation intervals")
+    parser.add_argument("--input", default=INPUT_CSV, help="Band matrix CSV (e.g. all_reports_bands.csv)")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--ci-output", default=CI_OUTPUT_CSV)
+    parser.add_argument("--resamples", type=int, default=10000, help="Bootstrap/permutation resamples (0 = off)")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=None, help="Processes for resampling chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.input, index_col="model")
     print("Loaded band data:")
     print(df)
 
     # Pearson correlation between criteria
-    corr = df.corr(method="pearson")
+    corr = correlation_matrix(df)
     print("\nCorrelation matrix:")
     print(corr.round(3))
 
-    corr.to_csv(OUTPUT_CSV)
-    print(f"\nSaved correlation matrix to {OUTPUT_CSV}")
+    corr.to_csv(args.output)
+    print(f"\nSaved correlation matrix to {args.output}")
+
+    if args.resamples > 0:
+        ci = correlation_intervals(
+            df, n_resamples=args.resamples, alpha=args.alpha, seed=args.seed, workers=args.workers
+        )
+        print(f"\nStrongest pairs ({args.resamples} resamples, {1 - args.alpha:.0%} intervals):")
+        print(ci.reindex(ci["r"].abs().sort_values(ascending=False).index).head(15).round(3).to_string(index=False))
+        ci.to_csv(args.ci_output, index=False)
+        print(f"\nSaved correlation intervals to {args.ci_output}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
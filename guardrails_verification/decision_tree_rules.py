@@ -1,11 +1,26 @@
 # 04_decision_tree_rules.py
+import argparse
+import hashlib
+import itertools
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+from sklearn.model_selection import StratifiedKFold
 from sklearn.tree import DecisionTreeClassifier, export_text
 
 INPUT_CSV = "rubric_converted.csv"
+SUBSETS = ("all", "other-sections", "upstream")
 
-def main():
-    df = pd.read_csv(INPUT_CSV, index_col="model")
+def mine_rules(df: pd.DataFrame, max_depth: int = 3):
+    """
+    Fit a small decision tree separating good (mean band >= 2.5) from
+    needs-review reports. Returns (rules text, feature importances).
+    """
+    df = df.copy()
 
     # Simple overall score = mean band across all criteria
     df["overall_mean"] = df.mean(axis=1, numeric_only=True)
@@ -18,22 +33,259 @@ def main():
     y = df["label_good"]
 
     clf = DecisionTreeClassifier(
-        max_depth=3,  # keep the tree small / interpretable
+        max_depth=max_depth,  # keep the tree small / interpretable
         min_samples_split=2,
         random_state=42
     )
     clf.fit(X, y)
 
-    # Show the decision rules
     tree_rules = export_text(clf, feature_names=list(X.columns))
+    importances = pd.Series(clf.feature_importances_, index=X.columns)
+    return tree_rules, importances
+
+
+# ---- Rule mining: cross-validated search for apply_caps-style caps ----
+
+def _cache_dir() -> str:
+    base = os.environ.get("ULPR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ulpr")
+    return os.path.join(base, "rules")
+
+
+def feature_subset(columns, target: str, subset: str):
+    """Candidate trigger criteria for a target: all others, other sections, or earlier sections."""
+    others = [c for c in columns if c != target]
+    if subset == "other-sections":
+        return [c for c in others if c[0] != target[0]]
+    if subset == "upstream":
+        return [c for c in others if c[0] < target[0]]
+    return others
+
+
+def tree_caps(clf: DecisionTreeClassifier, features):
+    """
+    Leaves predicting "target is capped" whose path only uses upper bounds,
+    as {feature: max band} conjunctions (thresholds like 1.5 become <= 1).
+    """
+    t = clf.tree_
+    rules = []
+
+    def walk(node, bounds):
+        if t.children_left[node] == -1:
+            if len(clf.classes_) == 2 and clf.classes_[np.argmax(t.value[node][0])] == 1 and bounds:
+                rules.append(dict(bounds))
+            return
+        name = features[t.feature[node]]
+        left = dict(bounds)
+        left[name] = min(left.get(name, 4), int(np.floor(t.threshold[node])))
+        walk(t.children_left[node], left)
+        # Lower bounds ("X > t") don't fit the cap form, so they are dropped;
+        # the resulting broader rule is re-scored on the data by rule_stats().
+        walk(t.children_right[node], bounds)
+
+    walk(0, {})
+    return rules
+
+
+def rule_stats(X: pd.DataFrame, y: np.ndarray, bounds):
+    mask = np.ones(len(X), dtype=bool)
+    for name, limit in bounds.items():
+        mask &= X[name].to_numpy() <= limit
+    n = int(mask.sum())
+    return n, (float(y[mask].mean()) if n else float("nan"))
+
+
+_DATA = None
+
+
+def _init_worker(df, data_key, use_cache):
+    global _DATA
+    _DATA = (df, data_key, use_cache)
+
+
+def _fit_fold(X, y, train, depth, path):
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    clf = DecisionTreeClassifier(max_depth=depth, min_samples_leaf=2, random_state=42)
+    clf.fit(X.iloc[train], y[train])
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(clf, f)
+        os.replace(tmp, path)
+    return clf
+
+
+def _evaluate_config(config):
+    """Cross-validate one (target, cap, depth, subset); return candidate rule rows."""
+    df, data_key, use_cache = _DATA
+    target, cap, depth, subset, folds = config
+    features = feature_subset(df.columns, target, subset)
+    y = (df[target].to_numpy() <= cap).astype(int)
+    minority = int(min(y.sum(), len(y) - y.sum()))
+    if not features or minority < 2:
+        return []
+    X = df[features]
+    splitter = StratifiedKFold(n_splits=min(folds, minority), shuffle=True, random_state=42)
+
+    found = {}
+    for k, (train, test) in enumerate(splitter.split(X, y)):
+        path = None
+        if use_cache:
+            ident = f"{data_key}|{target}|{cap}|{depth}|{subset}|{folds}|{k}"
+            path = os.path.join(_cache_dir(), hashlib.sha1(ident.encode()).hexdigest() + ".pkl")
+        clf = _fit_fold(X, y, train, depth, path)
+        for bounds in tree_caps(clf, features):
+            key = tuple(sorted(bounds.items()))
+            n_test, prec_test = rule_stats(X.iloc[test], y[test], bounds)
+            hits = found.setdefault(key, [])
+            if n_test:
+                hits.append(prec_test)
+
+    rows = []
+    base_rate = float(y.mean())
+    for key, test_precisions in found.items():
+        bounds = dict(key)
+        n, precision = rule_stats(X, y, bounds)
+        rows.append({
+            "trigger": " and ".join(f"{f}<={v}" for f, v in key),
+            "target": target,
+            "cap": cap,
+            "support": n / len(X),
+            "n": n,
+            "precision": precision,
+            "cv_precision": float(np.mean(test_precisions)) if test_precisions else float("nan"),
+            "folds_found": len(test_precisions),
+            "base_rate": base_rate,
+            "lift": precision / base_rate if base_rate else float("nan"),
+            "depth": depth,
+            "subset": subset,
+        })
+    return rows
+
+
+def mine_caps(
+    df: pd.DataFrame,
+    depths=(1, 2, 3),
+    caps=(1, 2, 3),
+    subsets=("all", "other-sections"),
+    folds: int = 5,
+    n_jobs=None,
+    min_support: float = 0.02,
+    min_precision: float = 0.9,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Search depth × cap label (target <= cap) × trigger subset with
+    cross-validated trees and return candidate caps in apply_caps form
+    ("if TRIGGER <= t: cap TARGET at c"), with support and precision on the
+    full data and mean held-out precision across folds. Configurations run
+    in a process pool (`n_jobs`); fitted folds are cached on disk. Reports
+    with a missing or non-numeric band are left out. Only rules found in at
+    least one held-out fold are returned.
+    """
+    bands = df[[c for c in df.columns if c[:1] in "ABCDEF" and c[1:].isdigit()]].apply(pd.to_numeric, errors="coerce")
+    complete = bands.notna().all(axis=1)
+    if not complete.all():
+        print(f"mine_caps: skipping {int((~complete).sum())} report(s) with missing bands", file=sys.stderr)
+    bands = bands[complete].astype(np.int8)
+    data_key = hashlib.sha1(pd.util.hash_pandas_object(bands, index=False).values.tobytes()).hexdigest()
+    configs = [
+        (target, cap, depth, subset, folds)
+        for target, cap, depth, subset in itertools.product(bands.columns, caps, depths, subsets)
+    ]
+
+    if n_jobs and n_jobs > 1:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker, initargs=(bands, data_key, use_cache)
+        ) as pool:
+            results = list(pool.map(_evaluate_config, configs, chunksize=4))
+    else:
+        _init_worker(bands, data_key, use_cache)
+        results = [_evaluate_config(c) for c in configs]
+
+    rows = [r for rs in results for r in rs]
+    columns = ["rule", "trigger", "target", "cap", "support", "n", "precision", "cv_precision",
+               "folds_found", "base_rate", "lift", "depth", "subset"]
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    out = pd.DataFrame(rows)
+    out = out[
+        (out["support"] >= min_support) & (out["precision"] >= min_precision) & (out["lift"] > 1)
+        & (out["folds_found"] > 0)
+    ]
+    # Same rule found by several configurations: keep the best-validated one.
+    out = out.sort_values(["cv_precision", "folds_found", "support"], ascending=False)
+    out = out.drop_duplicates(["trigger", "target", "cap"])
+    out.insert(0, "rule", [f"if {t}: cap {g} at {c}" for t, g, c in zip(out["trigger"], out["target"], out["cap"])])
+    return out[columns].reset_index(drop=True)
+
+
+def format_caps(rules: pd.DataFrame) -> str:
+    """Render mined caps as apply_caps() code for review."""
+    blocks = []
+    for r in rules.itertuples():
+        conds = [tuple(part.split("<=")) for part in r.trigger.split(" and ")]
+        test = " and ".join(f'ratings.get("{f}") and ratings["{f}"].band <= {v}' for f, v in conds)
+        blocks.append(
+            f"    # mined: support {r.support:.1%} (n={r.n}), precision {r.precision:.2f}, cv {r.cv_precision:.2f}\n"
+            f'    if {test} and "{r.target}" in ratings and ratings["{r.target}"].band > {r.cap}:\n'
+            f'        old = ratings["{r.target}"].band\n'
+            f'        ratings["{r.target}"].band = {r.cap}\n'
+            f'        ratings["{r.target}"].points = ratings["{r.target}"].weight * ratings["{r.target}"].band / 4.0\n'
+            f'        notes.append(f"Cap applied: {r.target} reduced from {{old}} to {r.cap} ({r.trigger}).")'
+        )
+    return "\n\n".join(blocks)
+
+
+def _ints(spec: str):
+    return tuple(int(x) for x in spec.split(",") if x.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decision-tree guardrail rules")
+    parser.add_argument("--input", default=INPUT_CSV, help="Band matrix CSV (e.g. all_reports_bands.csv)")
+    parser.add_argument("--mine", action="store_true", help="Cross-validated search for apply_caps-style caps")
+    parser.add_argument("--depths", default="1,2,3")
+    parser.add_argument("--caps", default="1,2,3", help="Cap levels to try (label: target <= cap)")
+    parser.add_argument("--subsets", default="all,other-sections", help=f"Trigger subsets: {', '.join(SUBSETS)}")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=None, help="Worker processes")
+    parser.add_argument("--min-support", type=float, default=0.02)
+    parser.add_argument("--min-precision", type=float, default=0.9)
+    parser.add_argument("--out", default=None, help="Write mined caps to this CSV")
+    parser.add_argument("--no-cache", action="store_true", help="Refit every fold")
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.input, index_col="model")
+
+    if args.mine:
+        rules = mine_caps(
+            df, depths=_ints(args.depths), caps=_ints(args.caps),
+            subsets=tuple(s for s in args.subsets.split(",") if s), folds=args.folds, n_jobs=args.n_jobs,
+            min_support=args.min_support, min_precision=args.min_precision, use_cache=not args.no_cache,
+        )
+        print(f"=== Candidate caps ({len(rules)}) ===")
+        print(rules.round(3).to_string(index=False))
+        if len(rules):
+            print("\n=== As apply_caps() code ===")
+            print(format_caps(rules))
+        if args.out:
+            rules.to_csv(args.out, index=False)
+            print(f"\nSaved candidate caps to {args.out}")
+        return
+
+    tree_rules, importances = mine_rules(df)
+
+    # Show the decision rules
     print("=== Decision tree rules (candidate guardrails) ===")
     print(tree_rules)
 
     # Optional: inspect feature importances
-    importances = pd.Series(clf.feature_importances_, index=X.columns)
     print("\nFeature importances:")
     print(importances[importances > 0].sort_values(ascending=False))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
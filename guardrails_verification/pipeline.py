@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+pipeline.py
+
+One-pass, in-memory guardrails analysis over the ULPR band matrix.
+
+What it does
+------------
+- Loads the band matrix once (report JSONs via 01_loader_reports, or an
+  existing band CSV), then runs in memory:
+    correlation (+ bootstrap/permutation intervals) → threshold summary
+    cube (every criterion × band threshold) → decision-tree rules → guardrails.
+- Caches every intermediate as Parquet (pyarrow) or, without pyarrow, as a
+  pickle, keyed by a hash of the inputs, the stage parameters and the
+  stage's code (the source files of the modules it runs). An unchanged
+  corpus is answered from the cache; changing one report invalidates the
+  stages downstream of the band matrix, and editing e.g. correlation.py
+  only the correlation stages.
+- Writes the usual CSV outputs to --out-dir.
+
+The cache lives in $ULPR_CACHE_DIR/analysis (default ~/.cache/ulpr/analysis).
+
+Usage
+-----
+python guardrails_verification/pipeline.py --reports reports_json --out-dir analysis_out
+python guardrails_verification/pipeline.py --bands guardrails_verification/all_reports_bands.csv --no-cache
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from apply_guardrails import apply_guardrails
+from correlation import correlation_intervals, correlation_matrix
+from threshold_analysis import summary_cube
+
+PIPELINE_VERSION = "2"
+
+# The repo's reports, found from this file rather than the working directory.
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reports_json")
+
+try:
+    import pyarrow  # noqa: F401
+    _CACHE_EXT = ".parquet"
+except Exception:
+    _CACHE_EXT = ".pkl"
+
+
+# ---- Cache ----
+
+def cache_dir() -> str:
+    base = os.environ.get("ULPR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ulpr")
+    return os.path.join(base, "analysis")
+
+
+def input_hash(paths: List[str]) -> str:
+    """Hash of file names and contents (order-independent)."""
+    h = hashlib.sha1(PIPELINE_VERSION.encode())
+    for path in sorted(paths):
+        h.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            h.update(hashlib.sha1(f.read()).digest())
+    return h.hexdigest()
+
+
+def code_hash(*deps) -> str:
+    """
+    Hash of the code a stage runs: module names contribute their source
+    file, functions their own source (for stage glue defined here).
+    """
+    h = hashlib.sha1()
+    for dep in deps:
+        if callable(dep):
+            h.update(inspect.getsource(dep).encode("utf-8"))
+            continue
+        spec = importlib.util.find_spec(dep)
+        if spec is None or not spec.origin:
+            raise ImportError(f"No module named {dep!r}")
+        with open(spec.origin, "rb") as f:
+            h.update(hashlib.sha1(f.read()).digest())
+    return h.hexdigest()
+
+
+def _read_cached(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+
+
+def _write_cached(df: pd.DataFrame, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if path.endswith(".parquet"):
+        df.to_parquet(tmp)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+class StageCache:
+    """Run-or-load DataFrame stages; records per-stage timings and hits."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.log: List[Tuple[str, str, float]] = []
+
+    def get(self, stage: str, key: str, compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        t0 = time.perf_counter()
+        path = os.path.join(cache_dir(), f"{stage}-{hashlib.sha1(key.encode()).hexdigest()}{_CACHE_EXT}")
+        if self.enabled and os.path.exists(path):
+            try:
+                df = _read_cached(path)
+                self.log.append((stage, "cache", time.perf_counter() - t0))
+                return df
+            except Exception:
+                pass
+        df = compute()
+        if self.enabled:
+            _write_cached(df, path)
+        self.log.append((stage, "computed", time.perf_counter() - t0))
+        return df
+
+
+# ---- Stages ----
+
+def load_bands(reports_dir: Optional[str], bands_csv: Optional[str]) -> Tuple[Callable[[], pd.DataFrame], str]:
+    """(loader, input key) for the band matrix."""
+    if bands_csv:
+        return (lambda: pd.read_csv(bands_csv, index_col="model")), input_hash([bands_csv])
+    loader_code = code_hash("01_loader_reports")
+    # The loader's module name starts with a digit, so it can't be a plain import.
+    loader = importlib.import_module("01_loader_reports")
+    paths = glob.glob(os.path.join(reports_dir, "*.json"))
+    if not paths:
+        raise FileNotFoundError(f"No JSON files found in {reports_dir}")
+    return (lambda: loader.load_reports_to_df(reports_dir)), f"{input_hash(paths)}|{loader_code}"
+
+
+def tree_tables(df: pd.DataFrame) -> pd.DataFrame:
+    """Decision-tree rules (one row per line) plus importances, as one frame."""
+    from decision_tree_rules import mine_rules
+
+    rules, importances = mine_rules(df)
+    lines = rules.rstrip("\n").splitlines()
+    return pd.DataFrame({
+        "kind": ["rule"] * len(lines) + ["importance"] * len(importances),
+        "text": lines + list(importances.index),
+        "value": [float("nan")] * len(lines) + [float(v) for v in importances.values],
+    })
+
+
+def run_pipeline(
+    reports_dir: Optional[str] = REPORTS_DIR,
+    bands_csv: Optional[str] = None,
+    use_cache: bool = True,
+    resamples: int = 2000,
+    workers: Optional[int] = None,
+) -> Tuple[Dict[str, pd.DataFrame], StageCache]:
+    cache = StageCache(enabled=use_cache)
+    compute_bands, key = load_bands(reports_dir, bands_csv)
+
+    out: Dict[str, pd.DataFrame] = {}
+    out["bands"] = bands = cache.get("bands", key, compute_bands)
+    corr_code = code_hash("correlation")
+    out["correlations"] = cache.get("correlations", f"{key}|{corr_code}", lambda: correlation_matrix(bands))
+    if resamples > 0:
+        out["correlation_ci"] = cache.get(
+            "correlation_ci", f"{key}|{corr_code}|{resamples}",
+            lambda: correlation_intervals(bands, n_resamples=resamples, workers=workers),
+        )
+    out["thresholds"] = cache.get(
+        "thresholds", f"{key}|{code_hash('threshold_analysis')}", lambda: summary_cube(bands)
+    )
+    try:
+        out["tree"] = cache.get(
+            "tree", f"{key}|{code_hash('decision_tree_rules', tree_tables)}", lambda: tree_tables(bands)
+        )
+    except ImportError as e:
+        print(f"Skipping decision-tree rules ({e}); `pip install scikit-learn`.", file=sys.stderr)
+    out["guardrailed"] = cache.get(
+        "guardrailed", f"{key}|{code_hash('apply_guardrails')}", lambda: apply_guardrails(bands)
+    )
+    return out, cache
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="In-memory guardrails analysis pipeline")
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("--reports", default=REPORTS_DIR, help="Directory of report JSON files (default: the repo's reports_json)")
+    src.add_argument("--bands", default=None, help="Existing band matrix CSV (index column 'model')")
+    p.add_argument("--resamples", type=int, default=2000, help="Bootstrap/permutation resamples (0 = off)")
+    p.add_argument("--workers", type=int, default=None, help="Processes for correlation resampling")
+    p.add_argument("--out-dir", default="analysis_out")
+    p.add_argument("--no-cache", action="store_true", help="Recompute every stage")
+    args = p.parse_args(argv)
+
+    t0 = time.perf_counter()
+    results, cache = run_pipeline(
+        reports_dir=args.reports, bands_csv=args.bands,
+        use_cache=not args.no_cache,
+        resamples=args.resamples, workers=args.workers,
+    )
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    names = {
+        "bands": "all_reports_bands.csv",
+        "correlations": "criteria_correlations.csv",
+        "correlation_ci": "criteria_correlations_ci.csv",
+        "thresholds": "threshold_summary.csv",
+        "tree": "decision_tree_rules.csv",
+        "guardrailed": "all_reports_bands_guardrailed.csv",
+    }
+    for stage, df in results.items():
+        tidy = stage in ("correlation_ci", "thresholds", "tree")
+        df.to_csv(os.path.join(args.out_dir, names[stage]), index=not tidy)
+
+    for stage, source, seconds in cache.log:
+        print(f"{stage:<15} {source:<9} {seconds * 1000:8.1f}ms", file=sys.stderr)
+    print(f"Analysed {len(results['bands'])} reports in {time.perf_counter() - t0:.2f}s → {args.out_dir}")
+    if "tree" in results:
+        print("\n".join(results["tree"].query("kind == 'rule'")["text"]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
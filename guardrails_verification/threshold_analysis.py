@@ -1,9 +1,12 @@
 # 03_threshold_analysis.py
+import argparse
+
+import numpy as np
 import pandas as pd
 
-INPUT_CSV = "rubric_converted.csv"
+INPUT_CSV = "all_reports_bands.csv"
 
-def conditional_summary(df: pd.DataFrame, focus_criterion: str, threshold: float):
+def conditional_summary(df: pd.DataFrame, focus_criterion: str, threshold: float, verbose: bool = True):
     """
     Compare mean scores of other criteria when focus_criterion < threshold
     vs. >= threshold.
@@ -12,11 +15,12 @@ def conditional_summary(df: pd.DataFrame, focus_criterion: str, threshold: float
         raise ValueError(f"{focus_criterion} not in columns: {df.columns.tolist()}")
 
     low_mask = df[focus_criterion] < threshold
-    high_mask = ~low_mask
+    high_mask = df[focus_criterion] >= threshold  # rows with no focus band are in neither group
 
-    print(f"\n=== Threshold analysis for {focus_criterion} at {threshold} ===")
-    print(f"Rows with {focus_criterion} < {threshold}: {low_mask.sum()}")
-    print(f"Rows with {focus_criterion} >= {threshold}: {high_mask.sum()}")
+    if verbose:
+        print(f"\n=== Threshold analysis for {focus_criterion} at {threshold} ===")
+        print(f"Rows with {focus_criterion} < {threshold}: {low_mask.sum()}")
+        print(f"Rows with {focus_criterion} >= {threshold}: {high_mask.sum()}")
 
     low_mean = df[low_mask].mean(numeric_only=True)
     high_mean = df[high_mask].mean(numeric_only=True)
@@ -26,20 +30,92 @@ def conditional_summary(df: pd.DataFrame, focus_criterion: str, threshold: float
         f"{focus_criterion} >= {threshold}": high_mean
     })
 
-    print("\nMean bands of other criteria by group:")
-    print(summary.round(2))
+    if verbose:
+        print("\nMean bands of other criteria by group:")
+        print(summary.round(2))
 
     return summary
 
 
-def main():
-    df = pd.read_csv(INPUT_CSV, index_col="model")
-    # Example: investigate C3 as a spacing/robustness criterion
-    _ = conditional_summary(df, focus_criterion="C", threshold=2)
-    # You can add more calls, e.g.:
-    _ = conditional_summary(df, focus_criterion="A", threshold=3)
-    _ = conditional_summary(df, focus_criterion="F", threshold=3)
+def summary_cube(df: pd.DataFrame, thresholds=(0, 1, 2, 3, 4)) -> pd.DataFrame:
+    """
+    conditional_summary() for every focus criterion × threshold × other
+    criterion in one pass. Group sums come from a single matrix product of
+    the (rows × focus·threshold) "focus < threshold" indicator with the band
+    matrix, so the cost is one BLAS call regardless of how many summaries.
+
+    Missing bands are skipped as in conditional_summary(): a row without a
+    focus band is in neither group, and each cell's counts (n_low, n_high),
+    means and SDs use only the rows that have that criterion's band.
+
+    Returns one tidy row per (focus, threshold, criterion) with group counts,
+    means, the difference (high − low) and Cohen's d (pooled SD; NaN when a
+    group has fewer than two rows, ±inf when both groups are constant).
+    """
+    cols = list(df.select_dtypes("number").columns)
+    X = df[cols].to_numpy(dtype=float)
+    n, p = X.shape
+    T = np.asarray(thresholds, dtype=float)
+    k = len(T)
+
+    valid = (~np.isnan(X)).astype(float)
+    X0 = np.nan_to_num(X)
+    low = (X[:, :, None] < T[None, None, :]).reshape(n, p * k).astype(float)  # False for NaN
+    high = (X[:, :, None] >= T[None, None, :]).reshape(n, p * k).astype(float)
+    n_low = low.T @ valid  # (p*k, p): rows in the group that have the criterion's band
+    n_high = high.T @ valid
+    sum_low, sum_high = low.T @ X0, high.T @ X0
+    sq_low, sq_high = low.T @ (X0 * X0), high.T @ (X0 * X0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_low = sum_low / n_low
+        mean_high = sum_high / n_high
+        var_low = np.maximum(sq_low - n_low * mean_low**2, 0) / (n_low - 1)
+        var_high = np.maximum(sq_high - n_high * mean_high**2, 0) / (n_high - 1)
+        pooled = np.sqrt(((n_low - 1) * var_low + (n_high - 1) * var_high) / (n_low + n_high - 2))
+        diff = mean_high - mean_low
+        d = diff / pooled
+    d[(n_low < 2) | (n_high < 2)] = np.nan
+
+    focus = np.repeat(cols, k)  # row order of the (p*k) axis: focus-major
+    thr = np.tile(T, p)
+    f_idx, c_idx = np.meshgrid(np.arange(p * k), np.arange(p), indexing="ij")
+    keep = np.repeat(np.arange(p), k)[:, None] != c_idx  # drop focus == criterion
+    f_idx, c_idx = f_idx[keep], c_idx[keep]
+    return pd.DataFrame({
+        "focus": focus[f_idx],
+        "threshold": thr[f_idx],
+        "criterion": np.asarray(cols)[c_idx],
+        "n_low": n_low[f_idx, c_idx].astype(int),
+        "n_high": n_high[f_idx, c_idx].astype(int),
+        "mean_low": mean_low[f_idx, c_idx],
+        "mean_high": mean_high[f_idx, c_idx],
+        "diff": diff[f_idx, c_idx],
+        "cohens_d": d[f_idx, c_idx],
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conditional band summaries for every criterion and threshold")
+    parser.add_argument("--input", default=INPUT_CSV, help="Band matrix CSV (one row per model, one column per criterion)")
+    parser.add_argument("--out", default=None, help="Write the full summary cube to this CSV")
+    parser.add_argument("--top", type=int, default=20, help="Show the N largest effects")
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.input, index_col="model")
+    cube = summary_cube(df)
+    print(f"Summary cube: {len(cube)} rows "
+          f"({cube['focus'].nunique()} focus criteria × {cube['threshold'].nunique()} thresholds)")
+
+    strongest = cube.dropna(subset=["cohens_d"])
+    strongest = strongest.reindex(strongest["cohens_d"].abs().sort_values(ascending=False).index)
+    print(f"\nLargest effects (|Cohen's d|), top {args.top}:")
+    print(strongest.head(args.top).round(2).to_string(index=False))
+
+    if args.out:
+        cube.to_csv(args.out, index=False)
+        print(f"\nSaved summary cube to {args.out}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+hedging.py
+
+Hedged backend requests for ULPR: cut tail latency from stalled model calls.
+
+What it does
+------------
+- HedgedBackend wraps any LLMBackend. Each generate() call starts the
+  request; if it has not finished after the `percentile` latency of recent
+  calls, a duplicate is issued and whichever finishes first wins.
+- With a multi-host OllamaBackend the duplicate goes to the endpoint with
+  the fewest requests in flight, so it lands on a different host than the
+  stalled original whenever one is free.
+- The losing request is abandoned: its result is discarded and it is
+  not awaited (a blocking HTTP call cannot be interrupted mid-read; the
+  server finishes it). If the winner fails, the other request is still
+  awaited, so hedging never turns a success into an error.
+- `max_hedge_rate` caps the share of requests that may be duplicated, and
+  no hedging happens until `min_samples` latencies have been observed.
+- Duplicates run on their own small pool, and at most `max_hedges` hedged
+  calls may be unfinished at once (the slot is held until both the winner
+  and the abandoned loser are done), so losers can never fill the pool that
+  serves first attempts.
+- metrics(): requests, hedges, hedge rate, hedge wins and the time saved
+  (loser finish − winner finish, summed over hedged calls that completed).
+
+Usage
+-----
+python lesson_plan_evaluator.py --lesson lessons/ --backend ollama \
+    --ollama-url "http://gpu1:11434,http://gpu2:11434" --hedge-percentile 95
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from lesson_plan_evaluator import LLMBackend, percentile
+
+
+class HedgedBackend(LLMBackend):
+    def __init__(
+        self,
+        backend: LLMBackend,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        max_hedge_rate: float = 0.1,
+        window: int = 200,
+        min_delay: float = 0.05,
+        max_workers: int = 32,
+        max_hedges: int = 4,
+    ):
+        self.backend = backend
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.min_delay = min_delay
+        self.max_hedges = max_hedges
+        self._latencies: Deque[float] = deque(maxlen=window)
+        # First attempts get max_workers threads plus one per hedge slot, since
+        # an abandoned primary keeps its thread until the server answers.
+        self._pool = ThreadPoolExecutor(max_workers=max_workers + max_hedges, thread_name_prefix="ulpr-primary")
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max_hedges, thread_name_prefix="ulpr-hedge")
+        self._lock = threading.Lock()
+        self._hedging = 0  # hedged calls whose primary or duplicate is still running
+        self._local = threading.local()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.saved_s = 0.0
+
+    # ------------------------------------------------------------------ #
+
+    def hedge_delay(self) -> Optional[float]:
+        """Current hedge trigger (seconds), or None while warming up."""
+        with self._lock:
+            if not self._latencies or len(self._latencies) < self.min_samples:
+                return None
+            return max(self.min_delay, percentile(list(self._latencies), self.percentile))
+
+    def _call(self, system_prompt: str, user_prompt: str) -> Tuple[str, Optional[Dict[str, Any]], float, float]:
+        t0 = time.perf_counter()
+        text = self.backend.generate(system_prompt, user_prompt)
+        t1 = time.perf_counter()
+        with self._lock:
+            self._latencies.append(t1 - t0)
+        return text, self.backend.last_usage(), t0, t1
+
+    def _reserve_hedge(self) -> bool:
+        """Claim a hedge slot if the rate cap and the outstanding-hedge cap allow one."""
+        with self._lock:
+            if self._hedging >= self.max_hedges or self.hedges + 1 > self.max_hedge_rate * self.requests + 1e-9:
+                return False
+            self.hedges += 1
+            self._hedging += 1
+            return True
+
+    def _release_when_done(self, *futures: Future):
+        remaining = [len(futures)]
+
+        def done(_):
+            with self._lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    self._hedging -= 1
+
+        for fut in futures:
+            fut.add_done_callback(done)
+
+    def generate(self, system_prompt: str, user_prompt: str) -> str:
+        with self._lock:
+            self.requests += 1
+        delay = self.hedge_delay()
+        primary = self._pool.submit(self._call, system_prompt, user_prompt)
+        if delay is None:
+            return self._finish(primary.result())
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._reserve_hedge():
+            return self._finish(primary.result())
+
+        hedge = self._hedge_pool.submit(self._call, system_prompt, user_prompt)
+        self._release_when_done(primary, hedge)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is not None:
+                    error = fut.exception()
+                    continue
+                result = fut.result()
+                if fut is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                for other in pending:
+                    other.cancel()
+                    other.add_done_callback(lambda f, won_at=result[3]: self._record_saving(f, won_at))
+                return self._finish(result)
+        raise error
+
+    def _record_saving(self, loser: Future, won_at: float):
+        if loser.cancelled() or loser.exception() is not None:
+            return
+        with self._lock:
+            self.saved_s += max(0.0, loser.result()[3] - won_at)
+
+    def _finish(self, result) -> str:
+        text, usage, _, _ = result
+        self._local.usage = usage
+        return text
+
+    def last_usage(self) -> Optional[Dict[str, Any]]:
+        return getattr(self._local, "usage", None)
+
+    def metrics(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        with self._lock:
+            out = {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "hedges_in_flight": self._hedging,
+                "saved_s": round(self.saved_s, 3),
+                "hedge_delay_s": delay,
+            }
+        if hasattr(self.backend, "metrics"):
+            out["inner"] = self.backend.metrics()
+        return out
+
+
+def format_metrics(m: Dict[str, Any]) -> str:
+    delay = m.get("hedge_delay_s")
+    return (
+        f"hedged {m['hedges']}/{m['requests']} ({m['hedge_rate']:.1%}), "
+        f"hedge won {m['hedge_wins']}, saved {m['saved_s']:.1f}s, "
+        f"trigger {'warming up' if delay is None else f'{delay:.1f}s'}"
+    )
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+job_queue.py
+
+Durable, resumable SQLite job queue for large ULPR evaluation runs.
+
+What it does
+------------
+- Records one row per lesson file with its state (pending / running / done /
+  failed), attempt count, last error and final total.
+- Workers claim jobs atomically (BEGIN IMMEDIATE), so several worker
+  processes can drain the same queue file.
+- A claimed job carries a lease, renewed while the lesson is being
+  evaluated; if its worker dies (crash, Ctrl-C, Ollama restart) the job
+  becomes claimable again once the lease expires. A worker whose lease was
+  taken over can no longer complete or fail the job. Failed attempts are
+  retried up to --max-attempts.
+
+Usage
+-----
+python job_queue.py enqueue --db runs/corpus.sqlite lessons/
+python job_queue.py work    --db runs/corpus.sqlite --out-dir reports_out \
+                            --backend ollama --model llama3.1
+python job_queue.py status  --db runs/corpus.sqlite
+python job_queue.py retry-failed --db runs/corpus.sqlite
+
+Re-running `work` after an interruption resumes exactly where it stopped:
+done jobs are never re-evaluated.
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+STATES = ("pending", "running", "done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    path         TEXT NOT NULL UNIQUE,
+    state        TEXT NOT NULL DEFAULT 'pending',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    claimed_by   TEXT,
+    lease_until  REAL,
+    last_error   TEXT,
+    total        REAL,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, id);
+"""
+
+
+@dataclasses.dataclass
+class QueuedJob:
+    id: int
+    path: str
+    attempts: int
+    max_attempts: int
+
+
+class JobQueue:
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        d = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(d, exist_ok=True)
+        self.db_path = db_path
+        # isolation_level=None: we issue BEGIN/COMMIT ourselves.
+        self.conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, paths: List[str], max_attempts: int = 3) -> int:
+        """Add lesson paths (absolute); already-known paths are left untouched."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs(path, max_attempts, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                [(os.path.abspath(p), max_attempts, now, now) for p in paths],
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def claim(self, worker_id: str, lease_seconds: float = 600.0) -> Optional[QueuedJob]:
+        """Atomically move the next claimable job to 'running' and return it."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Abandoned claims that already used their last attempt are final.
+            self.conn.execute(
+                "UPDATE jobs SET state='failed', last_error=COALESCE(last_error, 'lease expired'), updated_at=? "
+                "WHERE state='running' AND lease_until < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = self.conn.execute(
+                """
+                SELECT id, path, attempts, max_attempts FROM jobs
+                WHERE attempts < max_attempts
+                  AND (state = 'pending' OR (state = 'running' AND lease_until < ?))
+                ORDER BY id LIMIT 1
+                """,
+                (now,),
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET state='running', attempts=attempts+1, claimed_by=?, lease_until=?, updated_at=? WHERE id=?",
+                (worker_id, now + lease_seconds, now, row[0]),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return QueuedJob(id=row[0], path=row[1], attempts=row[2] + 1, max_attempts=row[3])
+
+    # complete/fail/renew/release only touch a job this worker still holds:
+    # once its lease expired and another worker claimed it, they return False.
+
+    def complete(self, job_id: int, worker_id: str, total: Optional[float] = None) -> bool:
+        cur = self.conn.execute(
+            "UPDATE jobs SET state='done', total=?, last_error=NULL, lease_until=NULL, updated_at=? "
+            "WHERE id=? AND claimed_by=? AND state='running'",
+            (total, time.time(), job_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Record a failed attempt; the job is retried until max_attempts is reached."""
+        cur = self.conn.execute(
+            """
+            UPDATE jobs SET
+                state = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END,
+                last_error=?, lease_until=NULL, updated_at=?
+            WHERE id=? AND claimed_by=? AND state='running'
+            """,
+            (error[:2000], time.time(), job_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def renew(self, job_id: int, worker_id: str, lease_seconds: float = 600.0) -> bool:
+        """Extend the lease on a running job."""
+        now = time.time()
+        cur = self.conn.execute(
+            "UPDATE jobs SET lease_until=?, updated_at=? WHERE id=? AND claimed_by=? AND state='running'",
+            (now + lease_seconds, now, job_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def release(self, job_id: int, worker_id: str) -> bool:
+        """Give a claimed job back without counting the attempt (e.g. on Ctrl-C)."""
+        cur = self.conn.execute(
+            "UPDATE jobs SET state='pending', attempts=MAX(attempts-1, 0), claimed_by=NULL, lease_until=NULL, "
+            "updated_at=? WHERE id=? AND claimed_by=? AND state='running'",
+            (time.time(), job_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def retry_failed(self) -> int:
+        cur = self.conn.execute(
+            "UPDATE jobs SET state='pending', attempts=0, updated_at=? WHERE state='failed'",
+            (time.time(),),
+        )
+        return cur.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        out = {s: 0 for s in STATES}
+        for state, n in self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+            out[state] = n
+        return out
+
+    def failures(self, limit: int = 20) -> List[tuple]:
+        return self.conn.execute(
+            "SELECT path, attempts, last_error FROM jobs WHERE state='failed' ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+
+
+# --------------------------------- Worker ----------------------------------- #
+
+class LeaseKeeper:
+    """
+    Renews a job's lease every lease/3 seconds from a background thread (with
+    its own connection), so a generation that outlasts --lease isn't handed
+    to another worker while it is still running.
+    """
+
+    def __init__(self, db_path: str, job_id: int, worker_id: str, lease_seconds: float):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        queue = JobQueue(self.db_path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                if not queue.renew(self.job_id, self.worker_id, self.lease_seconds):
+                    return
+        except sqlite3.Error as e:
+            print(f"   lease renewal for job {self.job_id} failed: {e}", file=sys.stderr)
+        finally:
+            queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(
+    queue: JobQueue,
+    backend,
+    out_dir: str,
+    lease_seconds: float = 600.0,
+    stop: Optional[threading.Event] = None,
+    prompt_mode: str = "full",
+    sink=None,
+    claims: Optional[Dict[int, str]] = None,
+) -> int:
+    """
+    Drain the queue one lesson at a time. Returns the number of jobs completed.
+    Each scored report is also appended to `sink` (a JsonlSink) when given,
+    after complete() confirms this worker still held the job.
+    The job being evaluated is kept in `claims` ({job id: worker id}) so the
+    caller can release it if the worker is abandoned.
+    """
+    from lesson_plan_evaluator import (
+        backend_meta, build_scored_report, evaluate_lesson, lesson_label, read_lesson_text, totals,
+        write_lesson_outputs,
+    )
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    os.makedirs(out_dir, exist_ok=True)
+    done = 0
+    while stop is None or not stop.is_set():
+        job = queue.claim(worker_id, lease_seconds=lease_seconds)
+        if job is None:
+            return done
+        if claims is not None:
+            claims[job.id] = worker_id
+        label = lesson_label(job.path)
+        print(f"→ [{worker_id}] {label} (attempt {job.attempts}/{job.max_attempts})", file=sys.stderr)
+        try:
+            with LeaseKeeper(queue.db_path, job.id, worker_id, lease_seconds):
+                lesson_text = read_lesson_text(job.path)
+                timings: Dict[str, float] = {}
+                model_json, ratings, cap_notes, report_md = evaluate_lesson(
+                    backend, lesson_text, timings=timings, prompt_mode=prompt_mode
+                )
+                scored = build_scored_report(
+                    ratings, cap_notes, model_json, lesson=label,
+                    meta={**backend_meta(backend), "timings": timings}, prompt_mode=prompt_mode,
+                )
+            # Only the lease holder writes: a worker whose lease was taken over
+            # must not overwrite the reports of the worker that now holds it.
+            held = queue.renew(job.id, worker_id, lease_seconds)
+            if held:
+                write_lesson_outputs(out_dir, label, model_json, report_md, scored)
+        except KeyboardInterrupt:
+            queue.release(job.id, worker_id)
+            raise
+        except Exception as e:
+            if not queue.fail(job.id, worker_id, f"{type(e).__name__}: {e}"):
+                print("   lease lost; another worker holds this job", file=sys.stderr)
+            print(f"   failed: {e}", file=sys.stderr)
+            _drop_claim(claims, job.id)
+            continue
+        total, _ = totals(ratings)
+        recorded = held and queue.complete(job.id, worker_id, total)
+        _drop_claim(claims, job.id)
+        if not recorded:
+            print(f"   {label}: lease lost before completion; result not recorded", file=sys.stderr)
+            continue
+        # Appended only once the job is confirmed done, so a JSONL line is never
+        # duplicated by a worker that lost the job to another.
+        if sink is not None:
+            sink.write(scored)
+        done += 1
+        print(f"{label}: ULPR Total {round(total)} / 100")
+        if hasattr(backend, "metrics"):
+            print(f"   backend: {format_backend_metrics(backend.metrics())}", file=sys.stderr)
+    return done
+
+
+def _drop_claim(claims: Optional[Dict[int, str]], job_id: int):
+    if claims is not None:
+        claims.pop(job_id, None)
+
+
+def format_backend_metrics(m: Optional[Dict[str, Any]]) -> str:
+    """One line per wrapper layer (adaptive limit, hedging), outermost first."""
+    parts = []
+    while m:
+        if "limit" in m:
+            from adaptive_limit import format_metrics
+            parts.append(format_metrics(m))
+        elif "hedges" in m:
+            from hedging import format_metrics
+            parts.append(format_metrics(m))
+        m = m.get("inner")
+    return "; ".join(parts)
+
+
+def run_workers(
+    db_path: str,
+    backend,
+    out_dir: str,
+    threads: int = 1,
+    lease_seconds: float = 600.0,
+    prompt_mode: str = "full",
+) -> int:
+    """
+    Run `threads` workers (one SQLite connection each) against a shared backend.
+    Scored reports stream to <out_dir>/scored_reports.jsonl; the file is only
+    ever appended to, so resumed runs extend it rather than replacing it.
+    """
+    from lesson_plan_evaluator import JsonlSink
+
+    os.makedirs(out_dir, exist_ok=True)
+    with JsonlSink(os.path.join(out_dir, "scored_reports.jsonl")) as sink:
+        return _run_workers(db_path, backend, out_dir, threads, lease_seconds, prompt_mode, sink)
+
+
+def _run_workers(db_path, backend, out_dir, threads, lease_seconds, prompt_mode, sink) -> int:
+    if threads <= 1:
+        queue = JobQueue(db_path)
+        try:
+            return run_worker(queue, backend, out_dir, lease_seconds=lease_seconds, prompt_mode=prompt_mode,
+                              sink=sink)
+        finally:
+            queue.close()
+
+    stop = threading.Event()
+    results: List[int] = []
+    claims: Dict[int, str] = {}
+
+    def _target():
+        queue = JobQueue(db_path)
+        try:
+            results.append(
+                run_worker(queue, backend, out_dir, lease_seconds=lease_seconds, stop=stop, prompt_mode=prompt_mode,
+                           sink=sink, claims=claims)
+            )
+        finally:
+            queue.close()
+
+    pool = [threading.Thread(target=_target, daemon=True) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    try:
+        for t in pool:
+            while t.is_alive():
+                t.join(0.5)
+    except KeyboardInterrupt:
+        # Finish in-flight lessons, claim nothing new; a second Ctrl-C
+        # abandons them and gives their claims back to the queue.
+        stop.set()
+        print("\nStopping after in-flight jobs (Ctrl-C again to abort)…", file=sys.stderr)
+        try:
+            for t in pool:
+                t.join()
+        except KeyboardInterrupt:
+            _release_claims(db_path, claims)
+        raise
+    return sum(results)
+
+
+def _release_claims(db_path: str, claims: Dict[int, str]):
+    queue = JobQueue(db_path)
+    try:
+        for job_id, worker_id in list(claims.items()):
+            queue.release(job_id, worker_id)
+    finally:
+        queue.close()
+
+
+# ---------------------------------- CLI ------------------------------------- #
+
+def lesson_paths(paths: List[str]) -> List[str]:
+    """Expand directories to their lesson files; skip missing or unsupported files with a warning."""
+    from lesson_ingest import is_supported, list_lesson_files
+
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(list_lesson_files(p))
+        elif not os.path.isfile(p):
+            print(f"Skipping {p}: no such file", file=sys.stderr)
+        elif not is_supported(p):
+            print(f"Skipping {p}: unsupported lesson format", file=sys.stderr)
+        else:
+            out.append(p)
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from lesson_plan_evaluator import add_backend_args
+
+    parser = argparse.ArgumentParser(description="Durable SQLite job queue for ULPR batch runs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_enq = sub.add_parser("enqueue", help="Add lesson files/directories to the queue")
+    p_enq.add_argument("paths", nargs="+")
+    p_enq.add_argument("--max-attempts", type=int, default=3)
+
+    p_work = sub.add_parser("work", help="Claim and evaluate jobs until the queue is empty")
+    add_backend_args(p_work)
+    p_work.add_argument("--out-dir", default="reports_out")
+    p_work.add_argument("--lease", type=float, default=600.0, help="Seconds before an unfinished claim can be retaken")
+    p_work.add_argument("--threads", type=int, default=1, help="Worker threads in this process")
+    p_work.add_argument("--adaptive", action="store_true",
+                        help="Gate backend calls with an adaptive (AIMD) concurrency limit up to --threads")
+
+    sub.add_parser("status", help="Show job counts and recent failures")
+    sub.add_parser("retry-failed", help="Reset failed jobs to pending")
+
+    for sp in sub.choices.values():
+        sp.add_argument("--db", required=True, help="SQLite queue file")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db)
+    try:
+        if args.cmd == "enqueue":
+            paths = lesson_paths(args.paths)
+            added = queue.enqueue(paths, max_attempts=args.max_attempts)
+            print(f"Enqueued {added} new job(s) ({len(paths) - added} already known)")
+        elif args.cmd == "work":
+            from lesson_plan_evaluator import make_backend
+
+            backend = make_backend(args)
+            if args.adaptive:
+                from adaptive_limit import AdaptiveLimiter, LimitedBackend
+                backend = LimitedBackend(backend, AdaptiveLimiter(initial_limit=1, max_limit=max(1, args.threads)))
+            try:
+                done = run_workers(
+                    args.db, backend, args.out_dir,
+                    threads=args.threads, lease_seconds=args.lease, prompt_mode=args.prompt_mode,
+                )
+            except KeyboardInterrupt:
+                print("\nInterrupted; unfinished jobs were returned to the queue.", file=sys.stderr)
+                return 130
+            print(f"Completed {done} job(s). Queue: {queue.counts()}")
+        elif args.cmd == "retry-failed":
+            print(f"Reset {queue.retry_failed()} failed job(s) to pending")
+        else:
+            counts = queue.counts()
+            print("  ".join(f"{k}={v}" for k, v in counts.items()))
+            for path, attempts, err in queue.failures():
+                print(f" - {path} (attempts={attempts}): {err}")
+    finally:
+        queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
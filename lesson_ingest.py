@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+lesson_ingest.py
+
+Lesson ingestion for the ULPR evaluator.
+
+What it does
+------------
+- Extracts plain text from .txt / .md / .docx / .pdf lesson files.
+- For directory inputs, extracts all supported files in a process pool.
+- Caches extracted text on disk keyed by (absolute path, size, mtime), so
+  repeat runs never re-parse unchanged documents.
+
+Requirements
+------------
+- Python 3.8+
+- .docx is parsed with the standard library (zipfile + ElementTree).
+- .pdf needs `pypdf` (or the older `PyPDF2`): `pip install pypdf`.
+
+Usage
+-----
+python lesson_ingest.py lessons/ "ai unveiled- navigating the future with intelligence.docx"
+
+The cache lives in $ULPR_CACHE_DIR/ingest (default ~/.cache/ulpr/ingest).
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from xml.etree import ElementTree
+
+SUPPORTED_EXTS = (".txt", ".md", ".docx", ".pdf")
+
+# Bump when extraction output changes so stale cache entries are ignored.
+INGEST_VERSION = 2
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# Text boxes are stored twice: the DrawingML copy in mc:Choice and a legacy
+# VML copy in mc:Fallback. Only the first is read.
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+
+# ------------------------------- Extraction --------------------------------- #
+
+def _extract_plain(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _docx_runs(node, parts: List[str], boxes: list):
+    """A paragraph's own text; text boxes anchored in it are collected, not inlined."""
+    for child in node:
+        if child.tag == _MC_FALLBACK:
+            continue
+        if child.tag == f"{_W_NS}txbxContent":
+            boxes.append(child)
+        elif child.tag == f"{_W_NS}t":
+            parts.append(child.text or "")
+        elif child.tag == f"{_W_NS}tab":
+            parts.append("\t")
+        elif child.tag in (f"{_W_NS}br", f"{_W_NS}cr"):
+            parts.append("\n")
+        else:
+            _docx_runs(child, parts, boxes)
+
+
+def _docx_lines(node, lines: List[str]):
+    for child in node:
+        if child.tag == _MC_FALLBACK:
+            continue
+        if child.tag == f"{_W_NS}p":
+            parts: List[str] = []
+            boxes: list = []
+            _docx_runs(child, parts, boxes)
+            lines.append("".join(parts))
+            for box in boxes:  # text-box paragraphs follow their anchor
+                _docx_lines(box, lines)
+        else:
+            _docx_lines(child, lines)
+
+
+def _extract_docx(path: str) -> str:
+    """Paragraph text from word/document.xml; table cells and text boxes become their own lines."""
+    with zipfile.ZipFile(path) as z:
+        root = ElementTree.fromstring(z.read("word/document.xml"))
+
+    lines: List[str] = []
+    _docx_lines(root, lines)
+    return "\n".join(lines)
+
+
+def _extract_pdf(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+    except Exception:
+        try:
+            from PyPDF2 import PdfReader
+        except Exception as e:
+            raise RuntimeError("PDF lessons require pypdf. Install with `pip install pypdf`.") from e
+    reader = PdfReader(path)
+    return "\n\n".join((page.extract_text() or "") for page in reader.pages)
+
+
+_EXTRACTORS = {
+    ".txt": _extract_plain,
+    ".md": _extract_plain,
+    ".docx": _extract_docx,
+    ".pdf": _extract_pdf,
+}
+
+
+def is_supported(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in SUPPORTED_EXTS
+
+
+def extract_text(path: str) -> str:
+    """Extract text from a single lesson file (no caching)."""
+    ext = os.path.splitext(path)[1].lower()
+    extractor = _EXTRACTORS.get(ext)
+    if extractor is None:
+        raise ValueError(f"Unsupported lesson format: {path} (expected one of {', '.join(SUPPORTED_EXTS)})")
+    return extractor(path)
+
+
+# --------------------------------- Cache ------------------------------------ #
+
+def cache_dir() -> str:
+    base = os.environ.get("ULPR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ulpr")
+    return os.path.join(base, "ingest")
+
+
+def _cache_key(path: str) -> str:
+    st = os.stat(path)
+    ident = f"{INGEST_VERSION}\0{os.path.abspath(path)}\0{st.st_size}\0{st.st_mtime_ns}"
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(cache_dir(), key[:2], key + ".json")
+
+
+def _cache_get(key: str) -> Optional[str]:
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)["text"]
+    except Exception:
+        return None
+
+
+def _cache_put(key: str, path: str, text: str):
+    target = _cache_path(key)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"path": os.path.abspath(path), "text": text}, f, ensure_ascii=False)
+    os.replace(tmp, target)
+
+
+# -------------------------------- Ingestion --------------------------------- #
+
+def list_lesson_files(directory: str) -> List[str]:
+    """Supported lesson files directly inside `directory`, sorted by name."""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if is_supported(name) and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def ingest_files(paths: List[str], workers: Optional[int] = None, use_cache: bool = True) -> Dict[str, str]:
+    """
+    Return {path: text} for every path. Cached entries are read directly;
+    the rest are extracted in a process pool (inline when only one is missing).
+    """
+    out: Dict[str, str] = {}
+    todo: Dict[str, str] = {}  # path -> cache key
+    for p in paths:
+        key = _cache_key(p)
+        text = _cache_get(key) if use_cache else None
+        if text is None:
+            todo[p] = key
+        else:
+            out[p] = text
+
+    if len(todo) == 1 or workers == 1:
+        extracted = {p: extract_text(p) for p in todo}
+    elif todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            extracted = dict(zip(todo, pool.map(extract_text, list(todo))))
+    else:
+        extracted = {}
+
+    for p, text in extracted.items():
+        if use_cache:
+            _cache_put(todo[p], p, text)
+        out[p] = text
+
+    return {p: out[p] for p in paths}
+
+
+def ingest_path(path: str, workers: Optional[int] = None, use_cache: bool = True) -> Dict[str, str]:
+    """Ingest a single lesson file or every supported file in a directory."""
+    if os.path.isdir(path):
+        return ingest_files(list_lesson_files(path), workers=workers, use_cache=use_cache)
+    return ingest_files([path], workers=workers, use_cache=use_cache)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract (and cache) lesson text from .txt/.md/.docx/.pdf files.")
+    parser.add_argument("paths", nargs="+", help="Lesson files or directories")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not write the extraction cache")
+    parser.add_argument("-o", "--output_dir", default=None, help="Write extracted text as <name>.txt here")
+    args = parser.parse_args(argv)
+
+    for target in args.paths:
+        texts = ingest_path(target, workers=args.workers, use_cache=not args.no_cache)
+        for p, text in texts.items():
+            print(f"{p}: {len(text)} chars", file=sys.stderr)
+            if args.output_dir:
+                os.makedirs(args.output_dir, exist_ok=True)
+                stem = os.path.splitext(os.path.basename(p))[0]
+                with open(os.path.join(args.output_dir, stem + ".txt"), "w", encoding="utf-8") as f:
+                    f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+lesson_packing.py
+
+Score several short lessons in one request.
+
+What it does
+------------
+- Short plans (the eduaide and slidesgo samples are about 3 KB, ~950
+  tokens) pay for the ~4k-token rubric prefix once per lesson. Packing puts
+  up to `max_lessons` of them, each under a "=== Lesson L1 ===" delimiter,
+  after one copy of the rubric and asks for a keyed response:
+  {"reports": {"L1": {"criteria": {...}, "global_notes": ""}, "L2": ...}}.
+- plan_packs() picks which lessons share a request: only lessons up to
+  `max_lesson_tokens` are packed, first-fit by size, so that prefix + lessons
+  + `output_tokens` reserved per lesson stay within `budget_tokens`.
+  Longer lessons, and packs that end up with a single lesson, go through
+  evaluate_lesson() as before.
+- evaluate_pack() splits the response by key and runs rate_from_model (with
+  apply_caps), totals and the Markdown report per lesson, exactly as for a
+  single-lesson response. A lesson whose report is missing, not an object,
+  or lacks a band for any of the 17 codes is re-evaluated on its own, as is
+  the whole pack if the response isn't valid JSON.
+- Each model JSON carries a "packing" block (pack size, key, prompt tokens,
+  or the reason it fell back); the pack's generate time is split evenly
+  across its lessons in the timings.
+
+Usage
+-----
+python lesson_plan_evaluator.py --lesson lessons/ --pack-tokens 16384 --backend ollama --model llama3.1
+python lesson_packing.py lessons/ --pack-tokens 16384   # show the packs without calling a model
+
+The budget must fit the model's context window: with packing on, the Ollama
+backend raises num_ctx to --pack-tokens, the GGUF backend raises n_ctx, and
+the HF backend's generation budget defaults to one report per packed lesson.
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from lesson_plan_evaluator import (
+    SYSTEM_PROMPT,
+    ULPR_CRITERIA,
+    LLMBackend,
+    RatedCriterion,
+    _crit_block_compact,
+    _crit_block_full,
+    default_max_new_tokens,
+    estimate_tokens,
+    evaluate_lesson,
+    extract_json,
+    format_markdown_report,
+    normalize_lesson_text,
+    rate_from_model,
+)
+from lesson_timing import format_prompt_block, parse_timing
+from profiling import span
+
+Result = Tuple[Dict[str, Any], Dict[str, RatedCriterion], List[str], str]
+
+
+@dataclasses.dataclass
+class PackConfig:
+    budget_tokens: int = 16384  # prompt + reserved output per packed request
+    max_lesson_tokens: int = 1200  # only lessons up to this size are packed
+    max_lessons: int = 4
+    output_tokens: int = dataclasses.field(default_factory=default_max_new_tokens)  # reserved per lesson
+
+
+def pack_keys(n: int) -> List[str]:
+    return [f"L{i}" for i in range(1, n + 1)]
+
+
+def packed_system_prompt(keys: List[str]) -> str:
+    return SYSTEM_PROMPT.replace(
+        "Return ONLY a single valid JSON object (no prose, no markdown). ",
+        f"Several lesson plans are given, keyed {', '.join(keys)}; score each one independently. "
+        'Return ONLY a single valid JSON object {"reports": {<key>: <report>}} with one report per key '
+        "(no prose, no markdown). ",
+    ).replace("You MUST include", "Every report MUST include")
+
+
+_PACK_PREFIX: Dict[Tuple[str, int], str] = {}
+
+
+def packed_prompt_prefix(n: int, mode: str = "full") -> str:
+    """Instructions, rubric and the keyed skeleton for `n` lessons."""
+    if (mode, n) in _PACK_PREFIX:
+        return _PACK_PREFIX[(mode, n)]
+    report = {"criteria": {c.code: {"band": 0, "evidence": "", "notes": ""} for c in ULPR_CRITERIA}, "global_notes": ""}
+    skeleton = {"reports": {key: report for key in pack_keys(n)}}
+    keys = ", ".join(pack_keys(n))
+    if mode == "compact":
+        text = (
+            f"Score each of the {n} lesson plans below ({keys}) separately with the ULPR rubric. For every code "
+            "choose ONE integer band 0–4 and give 1–3 sentences of evidence from THAT plan. Claims not "
+            "operationalized with routines/tools/timing, or without explicit artifacts (items, prompts, rubrics, "
+            "timings, roles), score LOWER.\n"
+            "Return ONLY this JSON object with ALL keys filled for every lesson:\n"
+            f"{json.dumps(skeleton, ensure_ascii=False, separators=(',', ':'))}\n\n"
+            f"Rubric:\n{chr(10).join(_crit_block_compact(c) for c in ULPR_CRITERIA)}\n\n"
+            "Lesson Plans:"
+        )
+    else:
+        text = (
+            f"Score each of the following {n} lesson plans ({keys}) separately using the Unified Lesson Plan "
+            "Rubric (ULPR) with bands 0–4.\n"
+            "For each lesson and each criterion code (A1..F2), choose ONE band (0–4) and provide 1–3 sentences "
+            "of evidence quoted or paraphrased from that lesson's plan. Never use evidence from another lesson.\n"
+            "If a claim (e.g., 'interactive' or 'alignment') is asserted but not operationalized with "
+            "routines/tools/timing, score lower.\n\n"
+            "Ties go LOWER if the plan does not include explicit artifacts (items, prompts, rubrics, timings, roles, etc.).\n\n"
+            "Return ONLY valid JSON with one report per lesson key and ALL codes in each. "
+            "Use exactly this object structure:\n"
+            f"{json.dumps(skeleton, indent=2)}\n\n"
+            f"Rubric (condensed):\n{chr(10).join(_crit_block_full(c) for c in ULPR_CRITERIA)}\n"
+            "Lesson Plans:"
+        )
+    _PACK_PREFIX[(mode, n)] = text
+    return text
+
+
+def build_packed_prompt(lessons: List[Tuple[str, str]], mode: str = "full", facts_blocks: Optional[List[str]] = None) -> str:
+    """[(key, lesson text)] → one user prompt; a lesson's timing facts go inside its own block."""
+    parts = [packed_prompt_prefix(len(lessons), mode)]
+    for i, (key, text) in enumerate(lessons):
+        body = normalize_lesson_text(text) if mode == "compact" else text.strip()
+        if facts_blocks and facts_blocks[i]:
+            body += "\n\n" + facts_blocks[i]
+        parts.append(f"=== Lesson {key} ===\n{body}")
+    return "\n\n".join(parts)
+
+
+# ------------------------------- Planning ----------------------------------- #
+
+def plan_packs(
+    lessons: Dict[str, str], config: PackConfig, prompt_mode: str = "full", tokenizer: Any = None
+) -> Tuple[List[List[str]], List[str]]:
+    """
+    (packs, singles): lists of keys of `lessons`. Packs hold 2+ lessons in
+    their input order; everything else is evaluated individually.
+    """
+    sizes = {label: estimate_tokens(text, tokenizer) + 8 for label, text in lessons.items()}  # + delimiter
+    prefix = {n: estimate_tokens(packed_prompt_prefix(n, prompt_mode), tokenizer) for n in range(1, config.max_lessons + 1)}
+    cost = lambda labels: prefix[len(labels)] + sum(sizes[x] + config.output_tokens for x in labels)  # noqa: E731
+
+    packs: List[List[str]] = []
+    short = [label for label in lessons if sizes[label] <= config.max_lesson_tokens]
+    for label in sorted(short, key=lambda x: -sizes[x]):
+        for pack in packs:
+            if len(pack) < config.max_lessons and cost(pack + [label]) <= config.budget_tokens:
+                pack.append(label)
+                break
+        else:
+            packs.append([label])
+    order = {label: i for i, label in enumerate(lessons)}
+    packs = [sorted(p, key=order.get) for p in packs if len(p) > 1]
+    packed = {label for p in packs for label in p}
+    return sorted(packs, key=lambda p: order[p[0]]), [label for label in lessons if label not in packed]
+
+
+# ------------------------------- Evaluation --------------------------------- #
+
+def _incomplete(report: Any) -> Optional[str]:
+    """Why a lesson's report can't be used as is, or None."""
+    if not isinstance(report, dict) or not isinstance(report.get("criteria"), dict):
+        return "no report for this lesson"
+    missing = [
+        c.code for c in ULPR_CRITERIA
+        if not isinstance(report["criteria"].get(c.code), dict) or report["criteria"][c.code].get("band") is None
+    ]
+    return f"missing {', '.join(missing)}" if missing else None
+
+
+def evaluate_pack(
+    backend: LLMBackend,
+    lessons: Dict[str, str],
+    timings: Optional[Dict[str, Dict[str, float]]] = None,
+    prompt_mode: str = "full",
+    timing_facts: bool = False,
+) -> Dict[str, Result]:
+    """
+    evaluate_lesson() for several lessons in one request: {label: (model_json,
+    ratings, cap_notes, report_md)} in input order. Lessons the response
+    doesn't fully cover are re-evaluated individually.
+    """
+    labels = list(lessons)
+    keys = pack_keys(len(labels))
+    t0 = time.perf_counter()
+    with span("timing_facts"):
+        facts = {label: parse_timing(lessons[label]).to_dict() for label in labels}
+    blocks = [format_prompt_block(facts[label]) if timing_facts else "" for label in labels]
+    with span("prompt"):
+        user_prompt = build_packed_prompt(list(zip(keys, (lessons[x] for x in labels))), prompt_mode, blocks)
+    t1 = time.perf_counter()
+    with span("generate"):
+        raw_text = backend.generate(packed_system_prompt(keys), user_prompt)
+    t2 = time.perf_counter()
+    reports: Dict[str, Any] = {}
+    with span("parse_json"):
+        try:
+            raw = extract_json(raw_text)
+            reports = raw.get("reports", {}) if isinstance(raw, dict) else {}
+        except Exception as e:
+            print(f"Packed response was not valid JSON ({e}); evaluating the lessons individually", file=sys.stderr)
+    if not isinstance(reports, dict):
+        reports = {}
+    prompt_tokens = estimate_tokens(user_prompt, getattr(backend, "tokenizer", None))
+
+    out: Dict[str, Result] = {}
+    for label, key, block in zip(labels, keys, blocks):
+        report = reports.get(key)
+        reason = _incomplete(report)
+        if reason is not None:
+            print(f"   {label}: packed report incomplete ({reason}); re-evaluating individually", file=sys.stderr)
+            lesson_timings: Dict[str, float] = {}
+            model_json, ratings, cap_notes, report_md = evaluate_lesson(
+                backend, lessons[label], timings=lesson_timings, prompt_mode=prompt_mode, timing_facts=timing_facts
+            )
+            model_json["packing"] = {"pack_size": len(labels), "key": key, "fallback": reason}
+            lesson_timings["pack_generate_s"] = round((t2 - t1) / len(labels), 4)  # this lesson's share of the failed pack
+        else:
+            t3 = time.perf_counter()
+            model_json = dict(report)
+            model_json["lesson_facts"] = {**facts[label], "in_prompt": bool(block)}
+            model_json["packing"] = {
+                "pack_size": len(labels), "key": key, "lessons": labels, "prompt_tokens": prompt_tokens,
+            }
+            with span("rate"):
+                ratings, cap_notes = rate_from_model(model_json)
+            t4 = time.perf_counter()
+            with span("render"):
+                report_md = format_markdown_report(ratings, cap_notes, model_json, lesson_excerpt=lessons[label][:3000])
+            t5 = time.perf_counter()
+            # The prompt and the model call are shared; each lesson is charged an equal part.
+            lesson_timings = {
+                "prompt_s": round((t1 - t0) / len(labels), 4),
+                "generate_s": round((t2 - t1) / len(labels), 4),
+                "rate_s": round(t4 - t3, 4),
+                "render_s": round(t5 - t4, 4),
+            }
+            lesson_timings["total_s"] = round(sum(lesson_timings.values()), 4)
+        if timings is not None:
+            timings[label] = lesson_timings
+        out[label] = (model_json, ratings, cap_notes, report_md)
+    return out
+
+
+def format_pack_summary(packs: List[List[str]], singles: List[str]) -> str:
+    n = sum(len(p) for p in packs)
+    return (
+        f"Packing: {n} lessons in {len(packs)} packed requests "
+        f"({'; '.join(', '.join(p) for p in packs) or 'none'}), {len(singles)} evaluated individually"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from lesson_ingest import ingest_path
+    from lesson_plan_evaluator import PROMPT_MODES, build_user_prompt, lesson_label
+
+    p = argparse.ArgumentParser(description="Show how lessons would be packed into shared requests")
+    p.add_argument("lessons", help="Directory of lesson files")
+    p.add_argument("--pack-tokens", type=int, default=PackConfig.budget_tokens)
+    p.add_argument("--pack-max-lesson-tokens", type=int, default=PackConfig.max_lesson_tokens)
+    p.add_argument("--pack-max", type=int, default=PackConfig.max_lessons)
+    p.add_argument("--prompt-mode", choices=PROMPT_MODES, default="full")
+    args = p.parse_args(argv)
+
+    texts = {lesson_label(path): text for path, text in ingest_path(args.lessons).items()}
+    config = PackConfig(args.pack_tokens, args.pack_max_lesson_tokens, args.pack_max)
+    packs, singles = plan_packs(texts, config, args.prompt_mode)
+    for pack in packs:
+        prompt = build_packed_prompt([(k, texts[x]) for k, x in zip(pack_keys(len(pack)), pack)], args.prompt_mode)
+        alone = sum(estimate_tokens(build_user_prompt(texts[x], args.prompt_mode)) for x in pack)
+        print(f"pack {', '.join(pack)}: {estimate_tokens(prompt)} prompt tokens vs ~{alone} one by one")
+    for label in singles:
+        print(f"single {label}: {estimate_tokens(texts[label])} lesson tokens")
+    print(format_pack_summary(packs, singles))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,10 +10,21 @@ rate a lesson plan and produce a structured report.
 Backends supported (choose one):
   1) Ollama (default): requires `ollama` running locally.
      Example model: `llama3.1`, `qwen2.5:7b-instruct`, `mistral`.
+     Several hosts can share the load: --ollama-url "http://gpu1:11434,http://gpu2:11434".
+     A --lesson <dir> batch sends one request at a time; to keep several
+     hosts busy, run `job_queue.py work --threads N` or the service.
 
   2) Hugging Face Transformers (optional, offline/local):
      Set --backend hf and provide --model (e.g., "Qwen/Qwen2.5-7B-Instruct").
      Requires `transformers` + `torch` installed. Uses a simple chat prompt.
+     On CPU-only servers: --hf-device cpu --hf-quant dynamic --hf-threads N
+     (greedy decoding; output budget sized to the 17-criterion report).
+     The system prompt + rubric prefix is encoded once and its KV cache reused
+     (--hf-prefix-cache memory|disk|off).
+
+  3) GGUF via llama-cpp-python (optional, fully offline, in-process):
+     Set --backend gguf and --model path/to/model.gguf. The rubric prefix is
+     evaluated once and its state saved to disk for later runs.
 
 Quick start (Ollama):
   1) Install & run Ollama: https://ollama.com
@@ -23,11 +34,16 @@ Quick start (Ollama):
             --backend ollama --model llama3.1 \
             --md-out report.md --json-out report.json
 
-Input can be a file path or raw text via --lesson "...".
+Input can be a file path (.txt, .md, .docx, .pdf), a directory of lesson
+files, or raw text via --lesson "...". Directories are evaluated one lesson
+at a time and written to --out-dir as report(<name>).md / .json; extracted
+document text is cached (see lesson_ingest.py).
 
 Output:
   - Markdown report (optional)
   - JSON breakdown (optional)
+  - Scored report JSON (optional): raw + capped bands, points, totals, cap
+    notes, versions, timings; batches also get scored_reports.jsonl
   - Console summary
 
 © 2025 — Released for your own use. No warranty.
@@ -36,16 +52,31 @@ from __future__ import annotations
 
 import argparse
 import dataclasses
+import hashlib
 import json
 import os
 import re
 import sys
+import threading
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
-try:
-    import requests  # for Ollama HTTP
-except Exception:
-    requests = None  # only needed for ollama backend
+from profiling import add_profile_args, profiled, span
+
+# `requests` is only needed by the Ollama backend; it is imported on first use
+# so --help, HF runs and batch tooling don't pay for it at start-up.
+requests = None
+
+
+def _load_requests():
+    global requests
+    if requests is None:
+        try:
+            import requests as _requests
+        except Exception:
+            return None
+        requests = _requests
+    return requests
 
 # Optional HF imports will be attempted only if backend=="hf"
 
@@ -367,6 +398,12 @@ ULPR_CRITERIA: List[Criterion] = [
 # LLM Prompt & Backends
 # -------------------------
 
+# Recorded in scored reports; bump when the rubric text or prompt wording changes.
+RUBRIC_VERSION = "ulpr-1.0"
+PROMPT_VERSIONS = {"full": "full-1", "compact": "compact-1"}
+PROMPT_VERSION = PROMPT_VERSIONS["full"]
+PROMPT_MODES = tuple(PROMPT_VERSIONS)
+
 SYSTEM_PROMPT = (
     "You are an expert rater of lesson plans. Score using the Unified Lesson Plan Rubric (ULPR) with bands 0–4. "
     "Use only evidence visible in the plan. If evidence is missing or vague, choose the lower band. "
@@ -395,16 +432,22 @@ SCHEMA_SPEC = {
 }
 
 
-def build_user_prompt(lesson_text: str) -> str:
-    def crit_block(c: Criterion) -> str:
-        notes = "\n".join([f"  {i}: {c.band_notes[i]}" for i in range(5)])
-        return (
-            f"{c.code} — {c.name} (weight {c.weight})\n"
-            f"What to look for: {c.description}\n"
-            f"Bands:\n{notes}\n"
-        )
+def _crit_block_full(c: Criterion) -> str:
+    notes = "\n".join([f"  {i}: {c.band_notes[i]}" for i in range(5)])
+    return (
+        f"{c.code} — {c.name} (weight {c.weight})\n"
+        f"What to look for: {c.description}\n"
+        f"Bands:\n{notes}\n"
+    )
+
 
-    rubric_text = "\n".join(crit_block(c) for c in ULPR_CRITERIA)
+def _crit_block_compact(c: Criterion) -> str:
+    bands = " | ".join(f"{i}: {c.band_notes[i]}" for i in range(5))
+    return f"{c.code} {c.name} (w{c.weight}): {c.description}\n  {bands}"
+
+
+def _render_prompt_prefix() -> str:
+    rubric_text = "\n".join(_crit_block_full(c) for c in ULPR_CRITERIA)
 
     schema_text = json.dumps(SCHEMA_SPEC, indent=2)
 
@@ -433,7 +476,170 @@ Rubric (condensed):
 
 Lesson Plan:
 """.strip()
-    return prompt + "\n\n" + lesson_text.strip()
+    return prompt
+
+
+def _render_compact_prefix() -> str:
+    """
+    Same rubric and output contract as the full prompt, minified: one line per
+    band, a compact JSON skeleton, and no separate schema (the skeleton plus
+    the band range already say everything SCHEMA_SPEC does).
+    """
+    rubric_text = "\n".join(_crit_block_compact(c) for c in ULPR_CRITERIA)
+    skeleton = {
+        "criteria": {c.code: {"band": 0, "evidence": "", "notes": ""} for c in ULPR_CRITERIA},
+        "global_notes": "",
+    }
+    skeleton_text = json.dumps(skeleton, ensure_ascii=False, separators=(",", ":"))
+
+    return (
+        "Score the lesson plan below with the ULPR rubric. For every code choose ONE integer band 0–4 "
+        "and give 1–3 sentences of evidence from the plan. Claims not operationalized with routines/tools/timing, "
+        "or without explicit artifacts (items, prompts, rubrics, timings, roles), score LOWER.\n"
+        f"Return ONLY this JSON object with ALL keys filled:\n{skeleton_text}\n\n"
+        f"Rubric:\n{rubric_text}\n\n"
+        "Lesson Plan:"
+    )
+
+
+def normalize_lesson_text(text: str) -> str:
+    """
+    Whitespace/boilerplate normalization for compact prompts: trims trailing
+    spaces, collapses runs of spaces/tabs and blank lines, and drops
+    separator-only lines (---, ***, ===, ___).
+    """
+    lines = []
+    for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        line = re.sub(r"[ \t\u00a0]+", " ", line).strip()
+        if re.fullmatch(r"[-*=_~#|: ]{3,}", line):
+            continue
+        lines.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def estimate_tokens(text: str, tokenizer: Any = None) -> int:
+    """
+    Token count for `text`: exact with a tokenizer exposing encode(), otherwise
+    a BPE-like estimate (word pieces of ≤4 chars, punctuation, and one token
+    per newline/indentation run).
+    """
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+    return sum(
+        -(-len(piece) // 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in re.findall(r"\w+|[^\w\s]|\n\s*|  +", text)
+    )
+
+
+_PROMPT_PREFIX: Dict[str, str] = {}
+
+
+def prompt_prefix(variant: str = "full") -> str:
+    """
+    The static part of the user prompt (instructions, skeleton, schema, rubric),
+    rendered once per process and reused for every lesson.
+    """
+    if variant not in _PROMPT_PREFIX:
+        renderers = {"full": _render_prompt_prefix, "compact": _render_compact_prefix}
+        _PROMPT_PREFIX[variant] = renderers[variant]()
+    return _PROMPT_PREFIX[variant]
+
+
+def split_prompt_prefix(user_prompt: str) -> Tuple[str, str]:
+    """
+    Split a build_user_prompt() result into (static rubric prefix, lesson part),
+    for backends that cache the prefix. Unknown prompts give ("", user_prompt).
+    """
+    for mode in PROMPT_MODES:
+        prefix = prompt_prefix(mode)
+        if user_prompt.startswith(prefix):
+            return prefix, user_prompt[len(prefix):]
+    return "", user_prompt
+
+
+def build_user_prompt(lesson_text: str, mode: str = "full") -> str:
+    """Full prompt (default) or the compact variant with a normalized lesson."""
+    if mode == "compact":
+        return prompt_prefix("compact") + "\n" + normalize_lesson_text(lesson_text)
+    return prompt_prefix() + "\n\n" + lesson_text.strip()
+
+
+# Criterion-focused prompting: the rubric, skeleton and system prompt cover
+# only a subset of codes, so one lesson is scored in several smaller requests.
+FOCUS_PROMPT_VERSION = "focus-1"
+FOCUS_SCOPES = ("section", "criterion")
+# Several short lessons in one request with a keyed response (lesson_packing).
+PACK_PROMPT_VERSION = "pack-1"
+
+
+@dataclasses.dataclass
+class FocusConfig:
+    scope: str = "section"  # one request per rubric section (A–F) or per criterion
+    retrieve: bool = False  # send only the lesson excerpts retrieved for the group's criteria
+    top_k: int = 3  # sections kept per criterion
+    min_confidence: float = 0.5  # below this, a criterion falls back to the full lesson
+
+
+def focus_groups(scope: str = "section") -> List[List[str]]:
+    codes = [c.code for c in ULPR_CRITERIA]
+    if scope == "criterion":
+        return [[code] for code in codes]
+    return [[code for code in codes if code[0] == sec] for sec in dict.fromkeys(code[0] for code in codes)]
+
+
+def criteria_system_prompt(codes: List[str]) -> str:
+    return SYSTEM_PROMPT.replace(
+        "You MUST include ALL criterion codes exactly once: A1, A2, A3, B1, B2, B3, C1, C2, C3, D1, D2, D3, E1, E2, E3, F1, F2.",
+        f"Score ONLY these criterion codes, each exactly once: {', '.join(codes)}.",
+    )
+
+
+_CRITERIA_PREFIX: Dict[Tuple[str, ...], str] = {}
+
+
+def criteria_prompt_prefix(codes: List[str], mode: str = "full", excerpt: bool = False) -> str:
+    """Rubric + skeleton for a subset of criteria, in the style of the full or compact prompt."""
+    key = (mode, str(excerpt), *codes)
+    if key in _CRITERIA_PREFIX:
+        return _CRITERIA_PREFIX[key]
+    by_code = {c.code: c for c in ULPR_CRITERIA}
+    crits = [by_code[code] for code in codes]
+    skeleton = {"criteria": {c.code: {"band": 0, "evidence": "", "notes": ""} for c in crits}, "global_notes": ""}
+    lesson_head = (
+        "Lesson Plan (excerpts selected for these criteria; […] marks omitted parts):" if excerpt else "Lesson Plan:"
+    )
+    if mode == "compact":
+        text = (
+            f"Score the lesson plan below on ULPR criteria {', '.join(codes)} only. For each choose ONE integer "
+            "band 0–4 and give 1–3 sentences of evidence from the plan. Claims not operationalized with "
+            "routines/tools/timing, or without explicit artifacts, score LOWER.\n"
+            "Return ONLY this JSON object with ALL keys filled:\n"
+            f"{json.dumps(skeleton, ensure_ascii=False, separators=(',', ':'))}\n\n"
+            f"Rubric:\n{chr(10).join(_crit_block_compact(c) for c in crits)}\n\n"
+            f"{lesson_head}"
+        )
+    else:
+        text = (
+            f"Score the following lesson plan on these ULPR criteria only: {', '.join(codes)} (bands 0–4).\n"
+            "For each listed code choose ONE band (0–4) and provide 1–3 sentences of evidence quoted or "
+            "paraphrased from the plan.\n"
+            "If a claim (e.g., 'interactive' or 'alignment') is asserted but not operationalized with "
+            "routines/tools/timing, score lower.\n\n"
+            "Ties go LOWER if the plan does not include explicit artifacts (items, prompts, rubrics, timings, roles, etc.).\n\n"
+            "Return ONLY valid JSON and include ALL listed codes. Use exactly this object structure:\n"
+            f"{json.dumps(skeleton, indent=2)}\n\n"
+            f"Rubric (condensed):\n{chr(10).join(_crit_block_full(c) for c in crits)}\n"
+            f"{lesson_head}"
+        )
+    _CRITERIA_PREFIX[key] = text
+    return text
+
+
+def build_criteria_prompt(lesson_text: str, codes: List[str], mode: str = "full", excerpt: bool = False) -> str:
+    """User prompt scoring only `codes`; `excerpt` marks `lesson_text` as retrieved excerpts."""
+    if mode == "compact":
+        return criteria_prompt_prefix(codes, mode, excerpt) + "\n" + normalize_lesson_text(lesson_text)
+    return criteria_prompt_prefix(codes, mode, excerpt) + "\n\n" + lesson_text.strip()
 
 
 # -------------------------
@@ -444,13 +650,115 @@ class LLMBackend:
     def generate(self, system_prompt: str, user_prompt: str) -> str:
         raise NotImplementedError
 
+    def last_usage(self) -> Optional[Dict[str, Any]]:
+        """Token usage of this thread's last generate() call, if the backend reports it."""
+        return None
+
+
+@dataclasses.dataclass
+class OllamaEndpoint:
+    url: str
+    inflight: int = 0
+    healthy: bool = True
+    failures: int = 0  # consecutive
+    down_until: float = 0.0
+    requests: int = 0
+    errors: int = 0
+
+
+def _normalize_ollama_url(url: str) -> str:
+    url = url.strip().rstrip("/")
+    return url if "/api/" in url else url + "/api/chat"
+
+
+def _ollama_host_error(e: Exception) -> bool:
+    """True for failures that say the host is unwell: no connection, timeout, 5xx."""
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(e, requests.HTTPError):
+        status = getattr(e.response, "status_code", None)
+        return status is None or status >= 500
+    return False
+
 
 class OllamaBackend(LLMBackend):
-    def __init__(self, model: str = "llama3.1", url: str = "http://localhost:11434/api/chat"):
-        if requests is None:
+    """
+    Ollama chat backend over one or more hosts.
+
+    `url` may be a single chat endpoint, a comma-separated string or a list.
+    Each request goes to the healthy endpoint with the fewest requests in
+    flight; on a connection error, timeout or 5xx response the endpoint is
+    put on a cooldown and the request fails over to the next one, so a job is
+    only lost if every host fails. 4xx responses and unparseable bodies are
+    raised as-is, as is the original error when there is only one host.
+    """
+
+    def __init__(
+        self,
+        model: str = "llama3.1",
+        url: Any = "http://localhost:11434/api/chat",
+        cooldown: float = 30.0,
+        timeout: float = 120,
+        num_ctx: int = 8192,
+    ):
+        if _load_requests() is None:
             raise RuntimeError("requests is required for Ollama backend. Install with `pip install requests`. ")
+        urls = url.split(",") if isinstance(url, str) else list(url)
         self.model = model
-        self.url = url
+        self.endpoints = [OllamaEndpoint(_normalize_ollama_url(u)) for u in urls if u.strip()]
+        if not self.endpoints:
+            raise ValueError("OllamaBackend needs at least one endpoint URL")
+        self.url = self.endpoints[0].url
+        self.cooldown = cooldown
+        self.timeout = timeout
+        self.num_ctx = num_ctx
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def last_usage(self) -> Optional[Dict[str, Any]]:
+        return getattr(self._local, "usage", None)
+
+    def check_health(self, timeout: float = 3.0) -> Dict[str, bool]:
+        """Probe every endpoint's /api/tags; mark it healthy or down."""
+        out = {}
+        for ep in self.endpoints:
+            tags_url = ep.url.rsplit("/api/", 1)[0] + "/api/tags"
+            try:
+                requests.get(tags_url, timeout=timeout).raise_for_status()
+                ok = True
+            except Exception:
+                ok = False
+            with self._lock:
+                self._mark(ep, ok)
+            out[ep.url] = ok
+        return out
+
+    def _mark(self, ep: OllamaEndpoint, ok: bool):
+        if ok:
+            ep.healthy, ep.failures, ep.down_until = True, 0, 0.0
+        else:
+            ep.failures += 1
+            ep.healthy = False
+            # Back off longer for hosts that keep failing.
+            ep.down_until = time.time() + self.cooldown * min(ep.failures, 10)
+
+    def _pick(self, exclude: List[OllamaEndpoint]) -> Optional[OllamaEndpoint]:
+        with self._lock:
+            now = time.time()
+            candidates = [ep for ep in self.endpoints if ep not in exclude]
+            # Endpoints whose cooldown has elapsed get another chance.
+            live = [ep for ep in candidates if ep.healthy or ep.down_until <= now]
+            pool = live or candidates
+            if not pool:
+                return None
+            ep = min(pool, key=lambda e: (e.inflight, e.requests))
+            ep.inflight += 1
+            ep.requests += 1
+            return ep
+
+    def endpoint_stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dataclasses.asdict(ep) for ep in self.endpoints]
 
     def generate(self, system_prompt: str, user_prompt: str) -> str:
         payload = {
@@ -461,11 +769,50 @@ class OllamaBackend(LLMBackend):
             ],
             "stream": False,
             "format": "json",
-            "options": {"temperature": 0.1, "num_ctx": 8192},
+            "options": {"temperature": 0.1, "num_ctx": self.num_ctx},
         }
-        r = requests.post(self.url, json=payload, timeout=120)
-        r.raise_for_status()
-        data = r.json()
+        tried: List[OllamaEndpoint] = []
+        last_error: Optional[Exception] = None
+        while True:
+            ep = self._pick(tried)
+            if ep is None:
+                if len(self.endpoints) == 1:
+                    raise last_error
+                raise RuntimeError(f"All Ollama endpoints failed; last error: {last_error}") from last_error
+            tried.append(ep)
+            try:
+                r = requests.post(ep.url, json=payload, timeout=self.timeout)
+                r.raise_for_status()
+                data = r.json()
+            except Exception as e:
+                host_down = _ollama_host_error(e)
+                with self._lock:
+                    ep.inflight -= 1
+                    ep.errors += 1
+                    if host_down:
+                        self._mark(ep, False)
+                if not host_down:
+                    # A 4xx or an unparseable body is about this request, not
+                    # the host; another host would answer the same way.
+                    raise
+                last_error = e
+                if len(self.endpoints) > 1:
+                    print(f"Ollama endpoint {ep.url} failed ({e}); failing over", file=sys.stderr)
+                continue
+            with self._lock:
+                ep.inflight -= 1
+                self._mark(ep, True)
+            break
+
+        if isinstance(data, dict):
+            self._local.usage = {
+                "prompt_tokens": data.get("prompt_eval_count"),
+                "completion_tokens": data.get("eval_count"),
+                "prompt_eval_s": (data.get("prompt_eval_duration") or 0) / 1e9,
+                "eval_s": (data.get("eval_duration") or 0) / 1e9,
+                "endpoint": ep.url,
+            }
+
         # Ollama may return either {"message": {"content": "..."}} or aggregate messages
         if isinstance(data, dict) and "message" in data and isinstance(data["message"], dict):
             return data["message"].get("content", "")
@@ -477,36 +824,359 @@ class OllamaBackend(LLMBackend):
         return json.dumps({"error": "Unexpected Ollama response", "raw": data})
 
 
+def default_max_new_tokens() -> int:
+    """
+    Output ceiling for one full report: ~120 tokens per criterion (band,
+    1–3 sentences of evidence, notes, indentation) + the wrapper/global notes.
+    The reports in reports_json/ run 1.2k–1.8k tokens.
+    """
+    return len(ULPR_CRITERIA) * 120 + 160
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
 class HFBackend(LLMBackend):
-    def __init__(self, model: str = "Qwen/Qwen2.5-7B-Instruct", device: Optional[str] = None):
+    """
+    Local Transformers backend.
+
+    CPU options (all optional):
+      device="cpu"        load on CPU instead of device_map="auto"
+      quantize="dynamic"  torch dynamic int8 quantization of Linear layers; CPU
+                          only, so the model is loaded on CPU
+      quantize="int8"/"4bit"  bitsandbytes weight quantization
+      threads=N           intra-op threads (torch.set_num_threads)
+      sample=False        greedy, deterministic decoding (default)
+      max_new_tokens      defaults to default_max_new_tokens()
+      prefix_cache="memory"  reuse the KV cache of the system prompt + rubric
+                          prefix across lessons ("disk" also saves it under
+                          $ULPR_CACHE_DIR/hf_prefix; "off" re-encodes everything)
+    A load report (seconds, weight MB, peak RSS MB) is kept in `load_report`.
+    """
+
+    def __init__(
+        self,
+        model: str = "Qwen/Qwen2.5-7B-Instruct",
+        device: Optional[str] = None,
+        quantize: Optional[str] = None,
+        threads: Optional[int] = None,
+        sample: bool = False,
+        max_new_tokens: Optional[int] = None,
+        dtype: Optional[str] = None,
+        prefix_cache: str = "memory",
+    ):
         try:
-            from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
+            from transformers import AutoModelForCausalLM, AutoTokenizer
             import torch
         except Exception as e:
             raise RuntimeError(
                 "Hugging Face backend requires transformers+torch installed."
             ) from e
-        from transformers import AutoModelForCausalLM, AutoTokenizer
+        if quantize == "dynamic":
+            # quantize_dynamic only has CPU kernels.
+            if device not in (None, "cpu"):
+                raise ValueError(f"--hf-quant dynamic runs on CPU only; got --hf-device {device}")
+            device = "cpu"
+        if threads:
+            torch.set_num_threads(threads)
+
+        t0 = time.perf_counter()
+        load_kwargs: Dict[str, Any] = {}
+        if dtype:
+            load_kwargs["torch_dtype"] = getattr(torch, dtype)
+        if quantize in ("int8", "4bit"):
+            try:
+                from transformers import BitsAndBytesConfig
+            except Exception as e:
+                raise RuntimeError("--hf-quant int8/4bit requires bitsandbytes: `pip install bitsandbytes`.") from e
+            load_kwargs["quantization_config"] = (
+                BitsAndBytesConfig(load_in_8bit=True) if quantize == "int8"
+                else BitsAndBytesConfig(load_in_4bit=True, bnb_4bit_compute_dtype=torch.bfloat16)
+            )
+        if device != "cpu":
+            load_kwargs["device_map"] = "auto"
+
+        self.model_name = model
         self.tokenizer = AutoTokenizer.from_pretrained(model)
-        self.model = AutoModelForCausalLM.from_pretrained(model, device_map="auto")
+        self.model = AutoModelForCausalLM.from_pretrained(model, **load_kwargs)
+        if device == "cpu":
+            self.model.to("cpu")
+        if quantize == "dynamic":
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
         self.device = device
+        self.sample = sample
+        self.max_new_tokens = max_new_tokens or default_max_new_tokens()
+        self.prefix_cache = prefix_cache
+        self.quantize = quantize
+        self.dtype = dtype
+        self._prefix_kv: Dict[str, Tuple[Any, Any]] = {}
+        self._prefix_lock = threading.Lock()
+        self._local = threading.local()  # per-thread usage of the last generate()
+
+        weight_bytes = sum(p.numel() * p.element_size() for p in self.model.parameters())
+        weight_bytes += sum(b.numel() * b.element_size() for b in self.model.buffers())
+        self.load_report = {
+            "load_s": round(time.perf_counter() - t0, 2),
+            "weights_mb": round(weight_bytes / 2**20, 1),
+            "peak_rss_mb": _rss_mb(),
+            "threads": torch.get_num_threads(),
+            "quantize": quantize,
+            "device": device or "auto",
+        }
+        print(f"HF model loaded: {self.load_report}", file=sys.stderr)
+
+    def _prefix_path(self, head_text: str) -> str:
+        base = os.environ.get("ULPR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ulpr")
+        ident = f"{self.model_name}\0{self.quantize}\0{self.dtype}\0{self.model.device}\0{head_text}"
+        return os.path.join(base, "hf_prefix", hashlib.sha1(ident.encode("utf-8")).hexdigest() + ".pt")
+
+    def _prefix_state(self, head_text: str) -> Tuple[Any, Any]:
+        """(head input_ids, legacy past_key_values) for the shared prefix, computed once."""
+        import torch
+
+        with self._prefix_lock:
+            if head_text in self._prefix_kv:
+                return self._prefix_kv[head_text]
+            path = self._prefix_path(head_text) if self.prefix_cache == "disk" else None
+            state = None
+            if path and os.path.exists(path):
+                try:
+                    state = torch.load(path, map_location=self.model.device)
+                except Exception:
+                    state = None
+            if state is None:
+                head_ids = self.tokenizer([head_text], return_tensors="pt")["input_ids"].to(self.model.device)
+                with torch.inference_mode():
+                    out = self.model(input_ids=head_ids, use_cache=True)
+                past = out.past_key_values
+                if hasattr(past, "to_legacy_cache"):
+                    past = past.to_legacy_cache()
+                state = (head_ids, past)
+                if path:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    torch.save(state, tmp)
+                    os.replace(tmp, path)
+            self._prefix_kv[head_text] = state
+            return state
+
+    def _cached_inputs(self, system_prompt: str, user_prompt: str) -> Tuple[Dict[str, Any], int]:
+        """generate() kwargs that resume from the cached rubric prefix; (kwargs, cached tokens)."""
+        import torch
+
+        prefix, rest = split_prompt_prefix(user_prompt)
+        head_text = f"<|system|>\n{system_prompt}\n<|user|>\n{prefix}"
+        head_ids, past = self._prefix_state(head_text)
+        tail_ids = self.tokenizer(
+            [f"{rest}\n<|assistant|>"], return_tensors="pt", add_special_tokens=False
+        )["input_ids"].to(self.model.device)
+        input_ids = torch.cat([head_ids, tail_ids], dim=-1)
+        try:
+            from transformers import DynamicCache
+            # generate() extends the cache in place, so every call gets its own copy.
+            cache = DynamicCache.from_legacy_cache(past)
+        except Exception:
+            cache = past
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": cache,
+        }, head_ids.shape[-1]
 
     def generate(self, system_prompt: str, user_prompt: str) -> str:
-        # Simple chat-style prompt
-        prompt = f"<|system|>\n{system_prompt}\n<|user|>\n{user_prompt}\n<|assistant|>"
-        inputs = self.tokenizer([prompt], return_tensors="pt")
-        outputs = self.model.generate(
-            **inputs,
-            max_new_tokens=2048,
-            do_sample=True,
-            temperature=0.2,
-            top_p=0.9,
-        )
-        text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        # Return assistant slice (naive)
+        import torch
+
+        gen_kwargs: Dict[str, Any] = {"max_new_tokens": self.max_new_tokens}
+        if self.sample:
+            gen_kwargs.update(do_sample=True, temperature=0.2, top_p=0.9)
+        else:
+            gen_kwargs.update(do_sample=False)
+
+        t0 = time.perf_counter()
+        cached = 0
+        if self.prefix_cache != "off":
+            inputs, cached = self._cached_inputs(system_prompt, user_prompt)
+        else:
+            # Simple chat-style prompt
+            prompt = f"<|system|>\n{system_prompt}\n<|user|>\n{user_prompt}\n<|assistant|>"
+            inputs = self.tokenizer([prompt], return_tensors="pt").to(self.model.device)
+        with torch.inference_mode():
+            outputs = self.model.generate(**inputs, **gen_kwargs)
+        elapsed = time.perf_counter() - t0
+
+        n_prompt = inputs["input_ids"].shape[-1]
+        n_new = outputs.shape[-1] - n_prompt
+        self._local.usage = {
+            "prompt_tokens": n_prompt,
+            "cached_prefix_tokens": cached,
+            "completion_tokens": n_new,
+            "eval_s": elapsed,
+            "tokens_per_s": n_new / elapsed if elapsed > 0 else None,
+        }
+        # Decode only the generated continuation.
+        text = self.tokenizer.decode(outputs[0][n_prompt:], skip_special_tokens=True)
         parts = text.split("<|assistant|>")
         return parts[-1].strip()
 
+    def last_usage(self) -> Optional[Dict[str, Any]]:
+        return getattr(self._local, "usage", None)
+
+
+class LlamaCppBackend(LLMBackend):
+    """
+    In-process GGUF backend (llama-cpp-python), fully offline.
+
+    The static part of the prompt (system prompt + rubric prefix) is evaluated
+    once and its KV state saved under `state_dir`, keyed by the model file and
+    the prefix text. Later runs restore that state instead of re-evaluating the
+    rubric; within a process, llama.cpp's prefix matching reuses the cached
+    prefix so each lesson only processes its own tokens (plus the output).
+    A state that can't be written (read-only cache dir, full disk) is just
+    not cached.
+
+    chat_format="auto" renders prompts with the chat template stored in the
+    GGUF file (tokenizer.chat_template) and falls back to ChatML when the
+    file has none; "chatml" always uses ChatML (Qwen, many Llama/Mistral
+    fine-tunes).
+    """
+
+    _SPLIT = "\x00ULPR-LESSON\x00"
+
+    def __init__(
+        self,
+        model: str,
+        n_ctx: int = 8192,
+        threads: Optional[int] = None,
+        state_dir: Optional[str] = None,
+        max_new_tokens: Optional[int] = None,
+        chat_format: str = "auto",
+    ):
+        if chat_format not in ("auto", "chatml"):
+            raise ValueError(f"chat_format must be 'auto' or 'chatml', got {chat_format!r}")
+        try:
+            from llama_cpp import Llama
+        except Exception as e:
+            raise RuntimeError("GGUF backend requires llama-cpp-python: `pip install llama-cpp-python`.") from e
+        if not os.path.isfile(model):
+            raise FileNotFoundError(f"GGUF model file not found: {model}")
+        self.model = model
+        self.n_ctx = n_ctx
+        self.max_new_tokens = max_new_tokens or default_max_new_tokens()
+        base = os.environ.get("ULPR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ulpr")
+        self.state_dir = state_dir or os.path.join(base, "gguf_state")
+        self.llm = Llama(model_path=model, n_ctx=n_ctx, n_threads=threads, verbose=False)
+        self._lock = threading.Lock()
+        self._prefix_tokens: Dict[str, List[int]] = {}
+        self._local = threading.local()  # per-thread usage of the last generate()
+        self._formatter = self._gguf_formatter() if chat_format == "auto" else None
+        self.chat_format = "gguf" if self._formatter is not None else "chatml"
+
+    def _token_text(self, token_id: int) -> str:
+        if token_id < 0:
+            return ""
+        return self.llm.detokenize([token_id], special=True).decode("utf-8", errors="ignore")
+
+    def _gguf_formatter(self):
+        """Jinja formatter for the model's own chat template, or None (→ ChatML)."""
+        template = (getattr(self.llm, "metadata", None) or {}).get("tokenizer.chat_template")
+        if not template:
+            return None
+        from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+        self._bos = self._token_text(self.llm.token_bos())
+        formatter = Jinja2ChatFormatter(template=template, eos_token=self._token_text(self.llm.token_eos()),
+                                        bos_token=self._bos)
+        try:
+            # Some templates reject a system turn; find out now, not per lesson.
+            formatter(messages=[{"role": "system", "content": "s"}, {"role": "user", "content": "u"}])
+        except Exception as e:
+            print(f"GGUF chat template unusable ({e}); using ChatML", file=sys.stderr)
+            return None
+        return formatter
+
+    def _chat_prompt(self, system_prompt: str, prefix: str, rest: str) -> Tuple[str, str, List[str]]:
+        """(static head, per-lesson tail, stop strings) of the chat-formatted prompt."""
+        if self._formatter is None:
+            head = f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\n{prefix}"
+            return head, rest + "<|im_end|>\n<|im_start|>assistant\n", ["<|im_end|>"]
+        # Render once with a marker between the rubric prefix and the lesson,
+        # then cut there: everything before it is identical for every lesson.
+        out = self._formatter(messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prefix + self._SPLIT + rest},
+        ])
+        head, tail = out.prompt.split(self._SPLIT, 1)
+        if self._bos and head.startswith(self._bos):
+            head = head[len(self._bos):]  # tokenize() adds BOS itself
+        stop = out.stop if isinstance(out.stop, list) else [out.stop] if out.stop else []
+        return head, tail, stop
+
+    def _state_path(self, head_text: str) -> str:
+        st = os.stat(self.model)
+        ident = f"{os.path.abspath(self.model)}\0{st.st_size}\0{st.st_mtime_ns}\0{self.n_ctx}\0{head_text}"
+        return os.path.join(self.state_dir, hashlib.sha1(ident.encode("utf-8")).hexdigest() + ".state")
+
+    def _ensure_prefix(self, head_text: str) -> List[int]:
+        """Tokens of the static head; its KV state is loaded from disk or computed and saved."""
+        tokens = self._prefix_tokens.get(head_text)
+        if tokens is not None:
+            return tokens
+        import pickle
+
+        tokens = self.llm.tokenize(head_text.encode("utf-8"), add_bos=True, special=True)
+        path = self._state_path(head_text)
+        try:
+            with open(path, "rb") as f:
+                self.llm.load_state(pickle.load(f))
+        except Exception:
+            self.llm.reset()
+            self.llm.eval(tokens)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(self.state_dir, exist_ok=True)
+                with open(tmp, "wb") as f:
+                    pickle.dump(self.llm.save_state(), f)
+                os.replace(tmp, path)
+            except (OSError, pickle.PicklingError) as e:
+                print(f"GGUF prefix state not cached ({e})", file=sys.stderr)
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        self._prefix_tokens[head_text] = tokens
+        return tokens
+
+    def generate(self, system_prompt: str, user_prompt: str) -> str:
+        prefix, rest = split_prompt_prefix(user_prompt)
+        head_text, tail_text, stop = self._chat_prompt(system_prompt, prefix, rest)
+        with self._lock:
+            head = self._ensure_prefix(head_text)
+            tail = self.llm.tokenize(tail_text.encode("utf-8"), add_bos=False, special=True)
+            t0 = time.perf_counter()
+            out = self.llm.create_completion(
+                prompt=head + tail,
+                max_tokens=self.max_new_tokens,
+                temperature=0.0,
+                stop=stop,
+            )
+            elapsed = time.perf_counter() - t0
+        usage = out.get("usage", {})
+        self._local.usage = {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "cached_prefix_tokens": len(head),
+            "eval_s": elapsed,
+        }
+        return out["choices"][0]["text"].strip()
+
+    def last_usage(self) -> Optional[Dict[str, Any]]:
+        return getattr(self._local, "usage", None)
+
 
 # -------------------------
 # Scoring & Post-processing
@@ -543,6 +1213,8 @@ class RatedCriterion:
     points: float
     evidence: str
     notes: str
+    raw_band: Optional[int] = None  # model's band before apply_caps
+    missing: bool = False  # code absent from the model JSON
 
 
 def clamp_band(x: Any) -> int:
@@ -612,6 +1284,8 @@ def rate_from_model(raw: Dict[str, Any]) -> Tuple[Dict[str, RatedCriterion], Lis
             points=points,
             evidence=evidence,
             notes=notes,
+            raw_band=band,
+            missing=c.code not in got,
         )
         if c.code not in got:
             missing_codes.append(c.code)
@@ -629,6 +1303,63 @@ def totals(ratings: Dict[str, RatedCriterion]) -> Tuple[float, Dict[str, float]]
     return total, by_section
 
 
+SCORED_REPORT_SCHEMA = "ulpr.scored_report/1"
+
+
+def build_scored_report(
+    ratings: Dict[str, RatedCriterion],
+    cap_notes: List[str],
+    model_json: Dict[str, Any],
+    lesson: str = "",
+    meta: Optional[Dict[str, Any]] = None,
+    prompt_mode: str = "full",
+) -> Dict[str, Any]:
+    """
+    Machine-readable report: raw and capped bands, points, section totals,
+    total, cap notes, versions and timings. `criteria` keeps the same
+    {code: {"band": ...}} shape as the raw model JSON, so existing loaders work.
+    """
+    total, by_section = totals(ratings)
+    meta = dict(meta or {})
+    timings = meta.pop("timings", {})
+    report = {
+        "schema": SCORED_REPORT_SCHEMA,
+        "lesson": lesson,
+        "total": round(total, 2),
+        "by_section": {k: round(v, 2) for k, v in by_section.items()},
+        "criteria": {
+            code: {
+                "name": r.name,
+                "weight": r.weight,
+                "raw_band": r.raw_band,
+                "band": r.band,
+                "points": round(r.points, 3),
+                "capped": r.raw_band is not None and r.raw_band != r.band,
+                "evidence": r.evidence,
+                "notes": r.notes,
+            }
+            for code, r in ratings.items()
+        },
+        "missing_codes": [code for code, r in ratings.items() if r.missing],
+        "cap_notes": cap_notes,
+        "global_notes": str(model_json.get("global_notes", "")) if isinstance(model_json, dict) else "",
+        "versions": {"rubric": RUBRIC_VERSION, "prompt": PROMPT_VERSIONS[prompt_mode], **meta},
+        "timings": timings,
+    }
+    if isinstance(model_json, dict) and model_json.get("focus"):
+        report["focus"] = model_json["focus"]
+        report["versions"]["focus_prompt"] = FOCUS_PROMPT_VERSION
+    if isinstance(model_json, dict) and model_json.get("lesson_facts"):
+        report["lesson_facts"] = model_json["lesson_facts"]
+    if isinstance(model_json, dict) and model_json.get("revision"):
+        report["revision"] = model_json["revision"]
+    if isinstance(model_json, dict) and model_json.get("packing"):
+        report["packing"] = model_json["packing"]
+        if "fallback" not in model_json["packing"]:
+            report["versions"]["pack_prompt"] = PACK_PROMPT_VERSION
+    return report
+
+
 def format_markdown_report(
     ratings: Dict[str, RatedCriterion],
     cap_notes: List[str],
@@ -670,6 +1401,21 @@ def format_markdown_report(
     if model_json.get("global_notes"):
         lines.append("---\n\n### Rater Global Notes\n" + model_json["global_notes"] + "\n")
 
+    revision = model_json.get("revision") or {}
+    if revision.get("mode") in ("partial", "unchanged"):
+        lines.append(
+            "---\n\n### Revision\n\n"
+            f"- Re-scored: {', '.join(revision['rescored']) or 'none'}\n"
+            f"- Carried over from the previous version ({revision.get('previous')}): "
+            f"{', '.join(revision['carried_over']) or 'none'}\n"
+        )
+
+    facts = model_json.get("lesson_facts") or {}
+    if facts.get("segments"):
+        from lesson_timing import format_prompt_block
+        parsed = format_prompt_block(facts).split("\n")[1:]
+        lines.append("---\n\n### Lesson Timing (parsed from the plan)\n\n" + "\n".join(parsed) + "\n")
+
     # Optional: embed a small excerpt of the plan for context
     excerpt = (lesson_excerpt or "").strip()
     if excerpt:
@@ -679,61 +1425,607 @@ def format_markdown_report(
     return "\n".join(lines)
 
 
+# -------------------------
+# Output writing
+# -------------------------
+def atomic_write_text(path: str, text: str):
+    """Write via a temp file in the same directory + rename, so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, obj: Any):
+    atomic_write_text(path, json.dumps(obj, ensure_ascii=False, indent=2))
+
+
+class JsonlSink:
+    """
+    Append-only JSONL stream: one record per line, flushed as soon as it is
+    written, so the file can be tailed while a run is in progress. Each
+    record is a single write() under a lock (safe across threads); a crash
+    can at worst leave one incomplete last line, which readers skip.
+    """
+
+    def __init__(self, path: str, truncate: bool = False):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._f = open(path, "w" if truncate else "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._f.write(line)
+            self._f.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+    def __enter__(self) -> "JsonlSink":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# Blocks the pipeline adds to the model JSON in memory (timing facts, focus,
+# revision and packing info). build_scored_report copies them into the
+# scored report; raw JSON files keep only what the model returned.
+DERIVED_BLOCKS = ("lesson_facts", "focus", "revision", "packing")
+
+
+def raw_model_json(model_json: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(model_json, dict):
+        return model_json
+    return {k: v for k, v in model_json.items() if k not in DERIVED_BLOCKS}
+
+
+def write_lesson_outputs(
+    out_dir: str,
+    label: str,
+    model_json: Dict[str, Any],
+    report_md: str,
+    scored: Optional[Dict[str, Any]] = None,
+):
+    """report(<label>).json / .scored.json / .md, each written atomically."""
+    atomic_write_json(os.path.join(out_dir, f"report({label}).json"), raw_model_json(model_json))
+    if scored is not None:
+        atomic_write_json(os.path.join(out_dir, f"report({label}).scored.json"), scored)
+    atomic_write_text(os.path.join(out_dir, f"report({label}).md"), report_md)
+
+
 # -------------------------
 # CLI
 # -------------------------
 
 def read_lesson_text(arg: str) -> str:
     if os.path.exists(arg) and os.path.isfile(arg):
+        from lesson_ingest import ingest_path, is_supported
+        if is_supported(arg):
+            return ingest_path(arg)[arg]
         with open(arg, "r", encoding="utf-8") as f:
             return f.read()
     return arg  # treat as raw text
 
 
+def lesson_label(path: str) -> str:
+    """`lessons/lesson_plan(brisk).txt` -> `brisk`; otherwise the file stem."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    m = re.fullmatch(r"lesson_plan\((.+)\)", stem)
+    return m.group(1) if m else stem
+
+
+def _parse_model_output(raw_text: str) -> Dict[str, Any]:
+    with span("parse_json"):
+        try:
+            return extract_json(raw_text)
+        except Exception:
+            print("Model output was not valid JSON. Raw output:\n", raw_text, file=sys.stderr)
+            raise
+
+
+def _focused_prompts(
+    lesson_text: str, focus: FocusConfig, prompt_mode: str = "full", facts_block: str = ""
+) -> Tuple[List[Tuple[List[str], str]], Dict[str, Any]]:
+    """
+    ([(codes, user prompt)] per group, focus info). With retrieval on, each
+    group gets the union of its criteria's excerpts, or the full lesson if
+    any of them fell back. `facts_block` goes to the groups scoring pacing,
+    ICAP mix or retrieval.
+    """
+    from lesson_timing import TIMING_CODES
+
+    info: Dict[str, Any] = {"scope": focus.scope, "retrieve": focus.retrieve, "groups": []}
+    index = None
+    if focus.retrieve:
+        from lesson_retrieval import LessonIndex
+        index = LessonIndex(lesson_text)
+        info["retrieval"] = {}
+    prompts = []
+    for codes in focus_groups(focus.scope):
+        text, excerpt = lesson_text, False
+        if index is not None:
+            hits = [index.retrieve(code, top_k=focus.top_k, min_confidence=focus.min_confidence) for code in codes]
+            for r in hits:
+                info["retrieval"][r.code] = {
+                    "sections": r.sections, "confidence": round(r.confidence, 3), "fallback": r.fallback,
+                }
+            if not any(r.fallback for r in hits):
+                text = index.excerpt(sorted({i for r in hits for i in r.sections}))
+                excerpt = len(text) < len(lesson_text)
+        prompt = build_criteria_prompt(text, codes, mode=prompt_mode, excerpt=excerpt)
+        if facts_block and set(codes) & set(TIMING_CODES):
+            prompt += "\n\n" + facts_block
+        info["groups"].append({"codes": codes, "excerpt": excerpt, "lesson_chars": len(text)})
+        prompts.append((codes, prompt))
+    return prompts, info
+
+
+def evaluate_lesson(
+    backend: LLMBackend,
+    lesson_text: str,
+    timings: Optional[Dict[str, float]] = None,
+    prompt_mode: str = "full",
+    focus: Optional[FocusConfig] = None,
+    timing_facts: bool = False,
+) -> Tuple[Dict[str, Any], Dict[str, RatedCriterion], List[str], str]:
+    """
+    Prompt → model → JSON → ratings/caps → Markdown for one lesson.
+    If `timings` is given, per-stage wall times (seconds) are stored in it.
+    With `focus`, the criteria are scored in groups (one request each) and the
+    group answers are merged into one model JSON carrying a "focus" block.
+    The lesson's timing facts (lesson_timing) are always parsed and stored
+    under "lesson_facts"; `timing_facts` also adds them to the prompt.
+    """
+    from lesson_timing import format_prompt_block, parse_timing
+
+    t0 = time.perf_counter()
+    with span("timing_facts"):
+        facts = parse_timing(lesson_text).to_dict()
+        facts_block = format_prompt_block(facts) if timing_facts else ""
+        facts["in_prompt"] = bool(facts_block)
+    if focus is None:
+        with span("prompt"):
+            user_prompt = build_user_prompt(lesson_text, mode=prompt_mode)
+            if facts_block:
+                user_prompt += "\n\n" + facts_block
+        t1 = time.perf_counter()
+        with span("generate"):
+            raw_text = backend.generate(SYSTEM_PROMPT, user_prompt)
+        t2 = time.perf_counter()
+        model_json = _parse_model_output(raw_text)
+    else:
+        with span("prompt"):
+            prompts, info = _focused_prompts(lesson_text, focus, prompt_mode, facts_block)
+        t1 = time.perf_counter()
+        model_json = {"criteria": {}, "global_notes": ""}
+        notes = []
+        for (codes, user_prompt), group in zip(prompts, info["groups"]):
+            with span("generate"):
+                raw_text = backend.generate(criteria_system_prompt(codes), user_prompt)
+            part = _parse_model_output(raw_text)
+            got = part.get("criteria", {}) if isinstance(part, dict) else {}
+            if isinstance(got, dict):
+                model_json["criteria"].update({code: got[code] for code in codes if code in got})
+            if isinstance(part, dict) and part.get("global_notes"):
+                notes.append(str(part["global_notes"]))
+            group["prompt_tokens"] = estimate_tokens(user_prompt, getattr(backend, "tokenizer", None))
+        t2 = time.perf_counter()
+        model_json["global_notes"] = " ".join(notes)
+        model_json["focus"] = info
+    if isinstance(model_json, dict):
+        model_json["lesson_facts"] = facts
+
+    with span("rate"):
+        ratings, cap_notes = rate_from_model(model_json)
+    t3 = time.perf_counter()
+    with span("render"):
+        report_md = format_markdown_report(ratings, cap_notes, model_json, lesson_excerpt=lesson_text[:3000])
+    t4 = time.perf_counter()
+
+    if timings is not None:
+        timings.update(
+            prompt_s=round(t1 - t0, 4),
+            generate_s=round(t2 - t1, 4),
+            rate_s=round(t3 - t2, 4),
+            render_s=round(t4 - t3, 4),
+            total_s=round(t4 - t0, 4),
+        )
+    return model_json, ratings, cap_notes, report_md
+
+
+def backend_meta(backend: LLMBackend) -> Dict[str, Any]:
+    """Backend/model identifiers for scored reports."""
+    model = getattr(backend, "model", None)
+    return {
+        "backend": type(backend).__name__,
+        "model": model if isinstance(model, str) else getattr(backend, "model_name", None),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]; NaN for no values."""
+    if not values:
+        return float("nan")
+    xs = sorted(values)
+    k = (len(xs) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def band_agreement(a: Dict[str, RatedCriterion], b: Dict[str, RatedCriterion]) -> Dict[str, Any]:
+    """Per-criterion band agreement between two ratings of the same lesson."""
+    codes = [c.code for c in ULPR_CRITERIA if c.code in a and c.code in b]
+    diffs = {code: b[code].band - a[code].band for code in codes}
+    n = max(len(codes), 1)
+    return {
+        "exact": sum(1 for d in diffs.values() if d == 0) / n,
+        "adjacent": sum(1 for d in diffs.values() if abs(d) <= 1) / n,
+        "total_delta": totals(b)[0] - totals(a)[0],
+        "disagreements": {code: (a[code].band, b[code].band) for code, d in diffs.items() if d},
+    }
+
+
+def prompt_token_report(lesson_text: str, tokenizer: Any = None) -> Dict[str, int]:
+    """Estimated prompt tokens (system + user) for each prompt mode."""
+    return {
+        mode: estimate_tokens(SYSTEM_PROMPT, tokenizer) + estimate_tokens(build_user_prompt(lesson_text, mode), tokenizer)
+        for mode in PROMPT_MODES
+    }
+
+
+def compare_prompt_modes(backend: LLMBackend, lesson_text: str) -> Dict[str, Any]:
+    """Score one lesson with the full and the compact prompt; report tokens, agreement and time."""
+    runs = {}
+    for mode in PROMPT_MODES:
+        timings: Dict[str, float] = {}
+        _, ratings, _, _ = evaluate_lesson(backend, lesson_text, timings=timings, prompt_mode=mode)
+        runs[mode] = (ratings, timings)
+    return {
+        "prompt_tokens": prompt_token_report(lesson_text, getattr(backend, "tokenizer", None)),
+        "generate_s": {mode: runs[mode][1]["generate_s"] for mode in PROMPT_MODES},
+        "agreement": band_agreement(runs["full"][0], runs["compact"][0]),
+    }
+
+
+def add_backend_args(p: argparse.ArgumentParser):
+    """Backend and prompt flags shared by the CLI, the service and batch workers."""
+    p.add_argument("--backend", choices=["ollama", "hf", "gguf"], default="ollama")
+    p.add_argument("--model", default="llama3.1",
+                   help="Model name (e.g., ollama: llama3.1; HF: Qwen/Qwen2.5-7B-Instruct; gguf: path/to/model.gguf)")
+    p.add_argument("--ollama-url", default="http://localhost:11434/api/chat",
+                   help="Ollama chat endpoint; comma-separate several hosts to load-balance across them "
+                        "(a --lesson <dir> batch is sequential: use job_queue.py work --threads N to fill them)")
+    p.add_argument("--hf-device", default=None, help="HF: 'cpu' to load on CPU (default: device_map=auto)")
+    p.add_argument("--hf-quant", choices=["dynamic", "int8", "4bit"], default=None,
+                   help="HF: weight quantization ('dynamic' = torch int8 Linear layers; loads on CPU)")
+    p.add_argument("--hf-dtype", default=None, help="HF: torch dtype for weights, e.g. bfloat16")
+    p.add_argument("--hf-threads", type=int, default=None, help="HF: intra-op CPU threads")
+    p.add_argument("--hf-max-new-tokens", type=int, default=None,
+                   help="HF: generation budget (default sized to the 17-criterion report)")
+    p.add_argument("--hf-sample", action="store_true", help="HF: sample (temperature 0.2) instead of greedy decoding")
+    p.add_argument("--hf-prefix-cache", choices=["memory", "disk", "off"], default="memory",
+                   help="HF: reuse the rubric-prefix KV cache across lessons (disk also persists it)")
+    p.add_argument("--gguf-ctx", type=int, default=8192, help="GGUF: context window")
+    p.add_argument("--gguf-threads", type=int, default=None, help="GGUF: CPU threads")
+    p.add_argument("--gguf-state-dir", default=None, help="GGUF: where saved rubric-prefix states are kept")
+    p.add_argument("--gguf-chat-format", choices=["auto", "chatml"], default="auto",
+                   help="GGUF: 'auto' uses the chat template stored in the model file (ChatML if it has none)")
+    p.add_argument("--hedge-percentile", type=float, default=0,
+                   help="Duplicate a request still running after this latency percentile (e.g. 95; 0 = off)")
+    p.add_argument("--hedge-max-rate", type=float, default=0.1, help="Max share of requests that may be hedged")
+    p.add_argument("--prompt-mode", choices=PROMPT_MODES, default="full",
+                   help="'compact' minifies the rubric/skeleton, drops the redundant schema and normalizes lesson whitespace")
+
+
+def make_backend(args: argparse.Namespace) -> LLMBackend:
+    backend = _make_base_backend(args)
+    if getattr(args, "hedge_percentile", 0):
+        from hedging import HedgedBackend
+        backend = HedgedBackend(
+            backend, percentile=args.hedge_percentile, max_hedge_rate=getattr(args, "hedge_max_rate", 0.1)
+        )
+    return backend
+
+
+def _make_base_backend(args: argparse.Namespace) -> LLMBackend:
+    # Packed requests (--pack-tokens) need a context window and an output
+    # budget sized for several lessons.
+    pack_tokens = getattr(args, "pack_tokens", 0)
+    pack_new_tokens = default_max_new_tokens() * getattr(args, "pack_max", 1) if pack_tokens else None
+    if args.backend == "ollama":
+        backend = OllamaBackend(model=args.model, url=args.ollama_url, num_ctx=max(8192, pack_tokens))
+        if len(backend.endpoints) > 1:
+            health = backend.check_health()
+            print(f"Ollama endpoints healthy: {sum(health.values())}/{len(health)}", file=sys.stderr)
+        return backend
+    if args.backend == "gguf":
+        return LlamaCppBackend(
+            model=args.model,
+            n_ctx=max(getattr(args, "gguf_ctx", 8192), pack_tokens),
+            threads=getattr(args, "gguf_threads", None),
+            state_dir=getattr(args, "gguf_state_dir", None),
+            max_new_tokens=pack_new_tokens,
+            chat_format=getattr(args, "gguf_chat_format", "auto"),
+        )
+    return HFBackend(
+        model=args.model,
+        device=getattr(args, "hf_device", None),
+        quantize=getattr(args, "hf_quant", None),
+        threads=getattr(args, "hf_threads", None),
+        sample=getattr(args, "hf_sample", False),
+        max_new_tokens=getattr(args, "hf_max_new_tokens", None) or pack_new_tokens,
+        dtype=getattr(args, "hf_dtype", None),
+        prefix_cache=getattr(args, "hf_prefix_cache", "memory"),
+    )
+
+
+def focus_from_args(args: argparse.Namespace) -> Optional[FocusConfig]:
+    scope = getattr(args, "focus", None)
+    retrieve = getattr(args, "retrieve", False)
+    if scope is None and not retrieve:
+        return None
+    return FocusConfig(
+        scope=scope or "section",
+        retrieve=retrieve,
+        top_k=getattr(args, "retrieve_top_k", 3),
+        min_confidence=getattr(args, "retrieve_min_confidence", 0.5),
+    )
+
+
+def format_focus_summary(info: Dict[str, Any], lesson_chars: int) -> str:
+    groups = info["groups"]
+    sent = sum(g["lesson_chars"] for g in groups)
+    line = (
+        f"Focused prompting: {len(groups)} requests ({info['scope']}), "
+        f"{sum(g.get('prompt_tokens', 0) for g in groups)} prompt tokens, "
+        f"lesson text sent {sent} chars vs {lesson_chars * len(groups)} unretrieved"
+    )
+    fallbacks = {code: r["fallback"] for code, r in info.get("retrieval", {}).items() if r["fallback"]}
+    if fallbacks:
+        line += "\n  full-text fallback: " + ", ".join(f"{code} ({why})" for code, why in fallbacks.items())
+    return line
+
+
+def _history_from_args(args: argparse.Namespace):
+    if not getattr(args, "revise", False):
+        return None
+    from lesson_revision import RevisionStore
+    return RevisionStore(args.history_dir)
+
+
+def _pack_from_args(args: argparse.Namespace):
+    if not getattr(args, "pack_tokens", 0):
+        return None
+    from lesson_packing import PackConfig
+    return PackConfig(
+        budget_tokens=args.pack_tokens, max_lesson_tokens=args.pack_max_lesson_tokens, max_lessons=args.pack_max
+    )
+
+
+def run_batch(
+    backend: LLMBackend,
+    lesson_dir: str,
+    out_dir: str,
+    workers: Optional[int] = None,
+    prompt_mode: str = "full",
+    focus: Optional[FocusConfig] = None,
+    timing_facts: bool = False,
+    history=None,
+    pack=None,
+) -> int:
+    """
+    Evaluate every lesson file in `lesson_dir`; write report(<name>).md/.json to `out_dir`.
+    With `pack` (a lesson_packing.PackConfig), short lessons share requests.
+    Units are scored one at a time, so only one backend request is in flight;
+    parallel scoring across several Ollama hosts is job_queue.py's job.
+    """
+    from lesson_ingest import ingest_path
+
+    with span("ingest"):
+        lessons = ingest_path(lesson_dir, workers=workers)
+    if not lessons:
+        print(f"No lesson files found in {lesson_dir}", file=sys.stderr)
+        return 1
+
+    # Work units: one lesson each, or several short lessons packed into one request.
+    units: List[List[str]] = [[path] for path in lessons]
+    if pack is not None:
+        from lesson_packing import evaluate_pack, format_pack_summary, plan_packs
+        packs, singles = plan_packs(lessons, pack, prompt_mode, getattr(backend, "tokenizer", None))
+        print(format_pack_summary([[lesson_label(x) for x in p] for p in packs], [lesson_label(x) for x in singles]),
+              file=sys.stderr)
+        order = {path: i for i, path in enumerate(lessons)}
+        units = sorted(packs + [[path] for path in singles], key=lambda u: order[u[0]])
+
+    os.makedirs(out_dir, exist_ok=True)
+    jsonl_path = os.path.join(out_dir, "scored_reports.jsonl")
+    done = 0
+    with JsonlSink(jsonl_path, truncate=True) as jsonl:
+        for unit in units:
+            labels = [lesson_label(path) for path in unit]
+            print(f"→ [{done + 1}{f'–{done + len(unit)}' if len(unit) > 1 else ''}/{len(lessons)}] "
+                  f"Querying model for {', '.join(labels)}{' (packed)' if len(unit) > 1 else ''}…", file=sys.stderr)
+            done += len(unit)
+            unit_timings: Dict[str, Dict[str, float]] = {path: {} for path in unit}
+            if len(unit) > 1:
+                by_label = evaluate_pack(
+                    backend, {label: lessons[path] for path, label in zip(unit, labels)},
+                    timings=unit_timings, prompt_mode=prompt_mode, timing_facts=timing_facts,
+                )
+                results = {path: by_label[label] for path, label in zip(unit, labels)}
+                unit_timings = {path: unit_timings[label] for path, label in zip(unit, labels)}
+            elif history is not None:
+                results = {unit[0]: history.evaluate(
+                    backend, labels[0], lessons[unit[0]], timings=unit_timings[unit[0]], prompt_mode=prompt_mode,
+                    focus=focus, timing_facts=timing_facts,
+                )}
+            else:
+                results = {unit[0]: evaluate_lesson(
+                    backend, lessons[unit[0]], timings=unit_timings[unit[0]], prompt_mode=prompt_mode, focus=focus,
+                    timing_facts=timing_facts,
+                )}
+
+            for path, label in zip(unit, labels):
+                model_json, ratings, cap_notes, report_md = results[path]
+                total, _ = totals(ratings)
+                print(f"{label}: ULPR Total {round(total)} / 100")
+                if history is not None:
+                    from lesson_revision import format_revision
+                    print(f"   {format_revision(model_json['revision'])}", file=sys.stderr)
+
+                with span("write_outputs"):
+                    scored = build_scored_report(
+                        ratings, cap_notes, model_json, lesson=label,
+                        meta={**backend_meta(backend), "timings": unit_timings[path]}, prompt_mode=prompt_mode,
+                    )
+                    write_lesson_outputs(out_dir, label, model_json, report_md, scored)
+                    jsonl.write(scored)
+
+    print(f"Saved {len(lessons)} reports → {out_dir} (scored records: {jsonl_path})")
+    metrics = backend.metrics() if hasattr(backend, "metrics") else None
+    if metrics and "hedges" in metrics:
+        from hedging import format_metrics
+        print(f"Hedging: {format_metrics(metrics)}", file=sys.stderr)
+    return 0
+
+
 def main(argv: Optional[List[str]] = None) -> int:
     p = argparse.ArgumentParser(description="Unified Lesson Plan Evaluator (ULPR)")
-    p.add_argument("--lesson", required=True, help="Path to lesson plan text/markdown OR raw text")
-    p.add_argument("--backend", choices=["ollama", "hf"], default="ollama")
-    p.add_argument("--model", default="llama3.1", help="Model name (e.g., ollama: llama3.1; HF: Qwen/Qwen2.5-7B-Instruct)")
+    p.add_argument("--lesson", required=True, help="Path to lesson file (.txt/.md/.docx/.pdf), a directory of lessons, OR raw text")
+    add_backend_args(p)
     p.add_argument("--md-out", default=None, help="Write Markdown report to this path")
     p.add_argument("--json-out", default=None, help="Write raw model JSON to this path")
-    p.add_argument("--ollama-url", default="http://localhost:11434/api/chat", help="Ollama chat endpoint")
+    p.add_argument("--scored-out", default=None,
+                   help="Write the scored report (capped bands, points, totals, cap notes, versions, timings) as JSON")
+    p.add_argument("--out-dir", default="reports_out", help="Output directory when --lesson is a directory")
+    p.add_argument("--ingest-workers", type=int, default=None, help="Processes for document extraction (directory input)")
+    p.add_argument("--prompt-check", action="store_true",
+                   help="Score the lesson with both prompt modes and report token savings and band agreement")
+    p.add_argument("--focus", choices=FOCUS_SCOPES, default=None,
+                   help="Criterion-focused prompting: one request per rubric section or per criterion")
+    p.add_argument("--retrieve", action="store_true",
+                   help="With --focus (default 'section'): send each request only the lesson excerpts "
+                        "retrieved for its criteria")
+    p.add_argument("--retrieve-top-k", type=int, default=3, help="Lesson sections kept per criterion")
+    p.add_argument("--retrieve-min-confidence", type=float, default=0.5,
+                   help="Below this retrieval confidence a criterion gets the full lesson")
+    p.add_argument("--timing-facts", action="store_true",
+                   help="Add the parsed timing table (minutes, ICAP time shares, retrieval positions) to the prompt")
+    p.add_argument("--revise", action="store_true",
+                   help="Diff each lesson against its previously evaluated version and re-score only the "
+                        "criteria whose sections changed")
+    p.add_argument("--history-dir", default=None,
+                   help="With --revise: where previous versions are kept (default $ULPR_CACHE_DIR/history)")
+    p.add_argument("--pack-tokens", type=int, default=0,
+                   help="Directory input: score short lessons several to a request, keeping prompt + expected "
+                        "output within this many tokens (e.g. 16384; 0 = off)")
+    p.add_argument("--pack-max-lesson-tokens", type=int, default=1200, help="Only lessons up to this size are packed")
+    p.add_argument("--pack-max", type=int, default=4, help="Most lessons per packed request")
+    add_profile_args(p)
     args = p.parse_args(argv)
 
-    lesson_text = read_lesson_text(args.lesson)
-
-    # Build prompts
-    user_prompt = build_user_prompt(lesson_text)
+    with profiled(args):
+        return _run(args)
+
+
+def _run(args: argparse.Namespace) -> int:
+    pack = _pack_from_args(args)
+    if pack is not None and (not os.path.isdir(args.lesson) or args.focus or args.retrieve or args.revise):
+        print("--pack-tokens needs a lesson directory and can't be combined with --focus/--retrieve/--revise",
+              file=sys.stderr)
+        return 2
+    if os.path.isdir(args.lesson):
+        with span("backend_init"):
+            backend = make_backend(args)
+        return run_batch(backend, args.lesson, args.out_dir, workers=args.ingest_workers, prompt_mode=args.prompt_mode,
+                         focus=focus_from_args(args), timing_facts=args.timing_facts,
+                         history=_history_from_args(args), pack=pack)
+
+    with span("ingest"):
+        lesson_text = read_lesson_text(args.lesson)
+    with span("backend_init"):
+        backend = make_backend(args)
+
+    if args.prompt_check:
+        print("→ Querying model with full and compact prompts…", file=sys.stderr)
+        check = compare_prompt_modes(backend, lesson_text)
+        tok, agr = check["prompt_tokens"], check["agreement"]
+        saved = 1 - tok["compact"] / max(tok["full"], 1)
+        print(f"Prompt tokens: full {tok['full']} → compact {tok['compact']} ({saved:.0%} fewer)")
+        print(f"Generate time: full {check['generate_s']['full']:.1f}s → compact {check['generate_s']['compact']:.1f}s")
+        print(f"Band agreement: exact {agr['exact']:.0%}, within one band {agr['adjacent']:.0%}; "
+              f"total delta {agr['total_delta']:+.1f}")
+        for code, (full_band, compact_band) in agr["disagreements"].items():
+            print(f"  {code}: full {full_band} vs compact {compact_band}")
+        return 0
 
-    if args.backend == "ollama":
-        backend = OllamaBackend(model=args.model, url=args.ollama_url)
-    else:
-        backend = HFBackend(model=args.model)
+    if args.prompt_mode != "full":
+        tok = prompt_token_report(lesson_text, getattr(backend, "tokenizer", None))
+        print(f"Prompt tokens: {tok[args.prompt_mode]} ({args.prompt_mode}) vs {tok['full']} (full)", file=sys.stderr)
 
+    focus = focus_from_args(args)
+    history = _history_from_args(args)
     print("→ Querying model…", file=sys.stderr)
-    raw_text = backend.generate(SYSTEM_PROMPT, user_prompt)
-
-    try:
-        model_json = extract_json(raw_text)
-    except Exception as e:
-        print("Model output was not valid JSON. Raw output:\n", raw_text, file=sys.stderr)
-        raise
-
-    ratings, cap_notes = rate_from_model(model_json)
-    report_md = format_markdown_report(ratings, cap_notes, model_json, lesson_excerpt=lesson_text[:3000])
+    timings: Dict[str, float] = {}
+    if history is not None:
+        if not os.path.isfile(args.lesson):
+            print("--revise needs a lesson file (its name keys the stored versions)", file=sys.stderr)
+            return 2
+        from lesson_revision import format_revision
+        model_json, ratings, cap_notes, report_md = history.evaluate(
+            backend, lesson_label(args.lesson), lesson_text, timings=timings, prompt_mode=args.prompt_mode,
+            focus=focus, timing_facts=args.timing_facts,
+        )
+        print(format_revision(model_json["revision"]), file=sys.stderr)
+    else:
+        model_json, ratings, cap_notes, report_md = evaluate_lesson(
+            backend, lesson_text, timings=timings, prompt_mode=args.prompt_mode, focus=focus,
+            timing_facts=args.timing_facts,
+        )
 
     total, _ = totals(ratings)
     print(f"\nULPR Total: {round(total)} / 100\n")
+    if focus is not None:
+        print(format_focus_summary(model_json["focus"], len(lesson_text)), file=sys.stderr)
+
+    with span("write_outputs"):
+        if args.json_out:
+            atomic_write_json(args.json_out, raw_model_json(model_json))
+            print(f"Saved JSON → {args.json_out}")
+
+        if args.scored_out:
+            label = lesson_label(args.lesson) if os.path.isfile(args.lesson) else ""
+            scored = build_scored_report(
+                ratings, cap_notes, model_json, lesson=label,
+                meta={**backend_meta(backend), "timings": timings}, prompt_mode=args.prompt_mode,
+            )
+            atomic_write_json(args.scored_out, scored)
+            print(f"Saved scored report → {args.scored_out}")
 
-    if args.json_out:
-        with open(args.json_out, "w", encoding="utf-8") as f:
-            json.dump(model_json, f, ensure_ascii=False, indent=2)
-        print(f"Saved JSON → {args.json_out}")
-
-    if args.md_out:
-        with open(args.md_out, "w", encoding="utf-8") as f:
-            f.write(report_md)
-        print(f"Saved Markdown report → {args.md_out}")
+        if args.md_out:
+            atomic_write_text(args.md_out, report_md)
+            print(f"Saved Markdown report → {args.md_out}")
 
     # Console preview
     print("\n=== Report Preview ===\n")
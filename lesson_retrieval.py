@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+lesson_retrieval.py
+
+Per-criterion retrieval of lesson excerpts for criterion-focused prompting.
+
+What it does
+------------
+- Splits a lesson into sections at its headings (Markdown `#`, numbered
+  headings, `Label:` lines, `Activity (10 minutes)` time boxes), merging
+  fragments and splitting very long sections at paragraph breaks.
+- Builds a small BM25 index over the sections once per lesson.
+- Queries it for each criterion with the criterion's name, description and
+  band notes (plus a few plan-vocabulary hints, e.g. "objectives" for A1,
+  "exit ticket" / "homework" for C2 and C3), and keeps the top sections.
+- Scores retrieval confidence as the share of the lesson's matching query
+  vocabulary (IDF-weighted) that the kept sections cover. Low confidence,
+  an unstructured lesson, or excerpts nearly as long as the lesson fall
+  back to the full text.
+
+Usage
+-----
+python lesson_retrieval.py "lessons/lesson_plan(brisk).txt" [--top-k 3] [--codes A1,A3,C2]
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from lesson_plan_evaluator import ULPR_CRITERIA, Criterion, read_lesson_text
+
+# Plan vocabulary the rubric text doesn't use (lessons say "objectives",
+# the rubric says "outcomes").
+CRITERION_HINTS: Dict[str, str] = {
+    "A1": "learning objectives goals students will be able to",
+    "A2": "objectives activities assessment rubric",
+    "A3": "lesson flow agenda minutes time duration introduction wrap-up closure",
+    "B1": "minutes discussion group pairs lecture activity",
+    "B2": "questions prompts explain justify analyze evaluate",
+    "B3": "discussion pairs groups roles share present poll",
+    "C1": "quiz recall retrieval review questions",
+    "C2": "exit ticket check for understanding quiz feedback assessment",
+    "C3": "homework review next lesson follow-up quiz cumulative",
+    "D1": "demonstration model example guided practice",
+    "D2": "worksheet template graphic organizer guided notes",
+    "D3": "independent practice circulate monitor",
+    "E1": "introduction build basic complex sequence",
+    "E2": "slides video visuals handout",
+    "E3": "differentiation support extension struggling advanced",
+    "F1": "accommodations accessibility differentiation options",
+    "F2": "reflection norms mistakes",
+}
+
+_STOP = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their them then there these"
+    " they this to with within without e.g i.e etc vs not no only all any each every some more most less".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ations", "ation", "ments", "ment", "ings", "ing", "ies", "ed", "es", "ly", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(w) for w in _TOKEN.findall(text.lower()) if len(w) > 1 and w not in _STOP]
+
+
+# ------------------------------- Sectioning --------------------------------- #
+
+@dataclasses.dataclass
+class Section:
+    index: int
+    title: str
+    text: str  # including the heading line
+
+
+_MD_HEADING = re.compile(r"^#{1,6}\s+(.+)$")
+_NUMBERED = re.compile(r"^(?:\d+[.)]|[IVX]+\.|Step \d+[:.]?)\s+([A-Z].{0,70})$")
+_LABEL = re.compile(r"^([A-Z][\w &/’'()-]{1,40}):(?:\s|$)")
+_TIME_BOX = re.compile(r"\(\s*\d+\s*(?:[-–]\s*\d+\s*)?min", re.I)
+_BULLET = re.compile(r"^(?:[-*•●▪◦]|\d+[.)])\s")
+
+
+def _heading(line: str) -> Optional[str]:
+    s = line.strip().strip("*").strip()
+    if not s or len(s) > 90:
+        return None
+    m = _MD_HEADING.match(s)
+    if m:
+        return m.group(1).strip("* ")
+    m = _NUMBERED.match(s)
+    if m and not s.endswith((".", ",", ";")):
+        return m.group(1).rstrip(":")
+    if _BULLET.match(s):
+        return None
+    m = _LABEL.match(s)
+    if m:
+        return m.group(1)
+    if _TIME_BOX.search(s) and not s.endswith("."):
+        return s
+    return None
+
+
+def section_lesson(text: str, min_chars: int = 160, max_chars: int = 1500) -> List[Section]:
+    """Split at headings; merge fragments < min_chars, split sections > max_chars at blank lines."""
+    raw: List[List[str]] = []
+    titles: List[str] = []
+    for line in text.replace("\r\n", "\n").split("\n"):
+        title = _heading(line)
+        if title is not None or not raw:
+            raw.append([])
+            titles.append(title or "")
+        raw[-1].append(line)
+
+    merged: List[List] = []
+    for title, lines in zip(titles, raw):
+        body = "\n".join(lines).strip()
+        if not body:
+            continue
+        if merged and len(merged[-1][1]) < min_chars:
+            merged[-1][1] += "\n" + body
+        else:
+            merged.append([title, body])
+    if len(merged) > 1 and len(merged[-1][1]) < min_chars:
+        merged[-2][1] += "\n" + merged.pop()[1]
+
+    sections: List[Section] = []
+    for title, body in merged:
+        chunk = ""
+        for para in re.split(r"\n\s*\n", body):
+            if chunk and len(chunk) + len(para) > max_chars:
+                sections.append(Section(len(sections), title, chunk.strip()))
+                chunk = ""
+            chunk += para + "\n\n"
+        if chunk.strip():
+            sections.append(Section(len(sections), title, chunk.strip()))
+    return sections
+
+
+# ------------------------------- Index -------------------------------------- #
+
+class BM25:
+    def __init__(self, docs: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tf = [Counter(d) for d in docs]
+        self.len = [len(d) for d in docs]
+        self.avg_len = sum(self.len) / max(len(docs), 1) or 1.0
+        df = Counter(t for d in self.tf for t in d)
+        n = len(docs)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def scores(self, query: List[str]) -> List[float]:
+        terms = Counter(t for t in query if t in self.idf)
+        out = []
+        for tf, dl in zip(self.tf, self.len):
+            norm = self.k1 * (1 - self.b + self.b * dl / self.avg_len)
+            out.append(sum(
+                self.idf[t] * qf * tf[t] * (self.k1 + 1) / (tf[t] + norm)
+                for t, qf in terms.items() if t in tf
+            ))
+        return out
+
+
+@dataclasses.dataclass
+class Retrieval:
+    code: str
+    sections: List[int]  # document order
+    confidence: float
+    fallback: Optional[str] = None  # why the full text is used instead, if it is
+
+
+def criterion_query(c: Criterion) -> List[str]:
+    """Name, description and hints count double; band notes are long and generic."""
+    focus = " ".join([c.name, c.description, CRITERION_HINTS.get(c.code, "")])
+    return tokenize(" ".join([focus, focus, *c.band_notes]))
+
+
+class LessonIndex:
+    """Sections + BM25 for one lesson; build once, query per criterion."""
+
+    def __init__(self, lesson_text: str, min_chars: int = 160, max_chars: int = 1500):
+        self.text = lesson_text
+        self.sections = section_lesson(lesson_text, min_chars=min_chars, max_chars=max_chars)
+        # The heading counts twice: "Exit Ticket" says more than the lines under it.
+        self.bm25 = BM25([tokenize(f"{s.title} {s.title} {s.text}") for s in self.sections])
+
+    def retrieve(
+        self,
+        code: str,
+        top_k: int = 3,
+        min_confidence: float = 0.5,
+        max_share: float = 0.8,
+    ) -> Retrieval:
+        criterion = next(c for c in ULPR_CRITERIA if c.code == code)
+        everything = list(range(len(self.sections)))
+        if len(self.sections) <= top_k:
+            return Retrieval(code, everything, 0.0, fallback="too few sections")
+
+        query = criterion_query(criterion)
+        scores = self.bm25.scores(query)
+        ranked = sorted(everything, key=lambda i: -scores[i])
+        keep = sorted(i for i in ranked[:top_k] if scores[i] > 0)
+        if not keep:
+            return Retrieval(code, everything, 0.0, fallback="no matching sections")
+
+        terms = set(query)
+        weight = lambda toks: sum(self.bm25.idf[t] for t in toks)  # noqa: E731
+        matched = [terms & set(self.bm25.tf[i]) for i in everything]
+        covered = weight(set().union(*(matched[i] for i in keep)))
+        confidence = covered / (weight(set().union(*matched)) or 1.0)
+        if confidence < min_confidence:
+            return Retrieval(code, everything, confidence, fallback="low confidence")
+        if sum(len(self.sections[i].text) for i in keep) > max_share * len(self.text):
+            return Retrieval(code, everything, confidence, fallback="excerpts ≈ full text")
+        return Retrieval(code, keep, confidence)
+
+    def excerpt(self, sections: List[int]) -> str:
+        """Sections in document order; skipped stretches are marked with […]."""
+        if len(sections) == len(self.sections):
+            return self.text
+        parts, last = [], -1
+        for i in sorted(set(sections)):
+            if i != last + 1:
+                parts.append("[…]")
+            parts.append(self.sections[i].text)
+            last = i
+        if last != len(self.sections) - 1:
+            parts.append("[…]")
+        return "\n\n".join(parts)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Show the lesson excerpts retrieved for each ULPR criterion")
+    p.add_argument("lesson", help="Lesson file or raw text")
+    p.add_argument("--top-k", type=int, default=3)
+    p.add_argument("--min-confidence", type=float, default=0.5)
+    p.add_argument("--codes", default=None, help="Comma-separated criterion codes (default: all)")
+    args = p.parse_args(argv)
+
+    index = LessonIndex(read_lesson_text(args.lesson))
+    print(f"{len(index.sections)} sections:")
+    for s in index.sections:
+        print(f"  [{s.index}] {s.title or '(untitled)'} — {len(s.text)} chars")
+    codes = args.codes.split(",") if args.codes else [c.code for c in ULPR_CRITERIA]
+    for code in codes:
+        r = index.retrieve(code.strip(), top_k=args.top_k, min_confidence=args.min_confidence)
+        chars = len(index.excerpt(r.sections))
+        how = f"full text ({r.fallback})" if r.fallback else f"sections {r.sections}"
+        print(f"{r.code}: {how}, confidence {r.confidence:.2f}, {chars}/{len(index.text)} chars")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
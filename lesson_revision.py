@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+lesson_revision.py
+
+Section-level diff re-evaluation for edited lessons.
+
+What it does
+------------
+- Keeps the last evaluated version of each lesson (text + raw model JSON +
+  versions) in a history directory; older versions are archived next to it.
+- When a lesson is resubmitted, splits old and new text into sections
+  (lesson_retrieval.section_lesson) and diffs them. Whitespace-only edits
+  don't count.
+- Maps changed sections to criteria: a criterion is affected when one of the
+  sections retrieved for it (BM25, as in focused prompting) changed in the
+  new version or was removed from the old one, when its retrieval falls back
+  to the full text, or, for A3/B1/C1/C3, when the parsed timing facts changed.
+- Re-queries only the affected criteria in one criterion-subset request and
+  carries the other raw bands and evidence over. rate_from_model (with
+  apply_caps) and totals run afresh on the merged JSON. The result records
+  which criteria were re-scored.
+- Falls back to a full evaluation when there is no previous version, the
+  rubric/prompt/model changed, or most of the lesson changed.
+
+Usage
+-----
+python lesson_plan_evaluator.py --lesson "lessons/lesson_plan(brisk).txt" --revise --backend ollama --model llama3.1
+python lesson_revision.py old_plan.txt new_plan.txt   # show which criteria an edit affects
+
+History lives in $ULPR_CACHE_DIR/history (default ~/.cache/ulpr/history),
+or --history-dir.
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import difflib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from lesson_plan_evaluator import (
+    PROMPT_VERSIONS,
+    RUBRIC_VERSION,
+    ULPR_CRITERIA,
+    LLMBackend,
+    RatedCriterion,
+    atomic_write_json,
+    backend_meta,
+    build_criteria_prompt,
+    criteria_system_prompt,
+    evaluate_lesson,
+    extract_json,
+    format_markdown_report,
+    rate_from_model,
+    read_lesson_text,
+)
+from lesson_retrieval import LessonIndex
+from lesson_timing import TIMING_CODES, format_prompt_block, parse_timing
+
+
+@dataclasses.dataclass
+class RevisionPlan:
+    affected: List[str]  # rubric order
+    changes: List[Dict[str, Any]]  # {"change": "added"|"removed"|"modified", "title": ...}
+    changed_share: float  # share of new-version sections that changed
+    timing_changed: bool
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _squeeze(text: str) -> str:
+    """Collapse runs of spaces/tabs inside lines: sectioning counts characters."""
+    return "\n".join(re.sub(r"(?<=\S)[ \t]+", " ", line).rstrip() for line in text.split("\n"))
+
+
+def _timing_key(lesson_text: str) -> Dict[str, Any]:
+    """Timing facts without segment line numbers, which any edit above a segment shifts."""
+    facts = parse_timing(lesson_text).to_dict()
+    facts["segments"] = [{k: v for k, v in seg.items() if k != "line"} for seg in facts["segments"]]
+    return facts
+
+
+def plan_revision(old_text: str, new_text: str, top_k: int = 3, min_confidence: float = 0.5) -> RevisionPlan:
+    old, new = LessonIndex(_squeeze(old_text)), LessonIndex(_squeeze(new_text))
+    matcher = difflib.SequenceMatcher(
+        a=[_norm(s.text) for s in old.sections], b=[_norm(s.text) for s in new.sections], autojunk=False
+    )
+    changed_old, changed_new = set(), set()
+    changes: List[Dict[str, Any]] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        changed_old.update(range(i1, i2))
+        changed_new.update(range(j1, j2))
+        if tag in ("replace", "insert"):
+            kind = "modified" if tag == "replace" else "added"
+            changes += [{"change": kind, "title": new.sections[j].title} for j in range(j1, j2)]
+        if tag == "delete" or (tag == "replace" and i2 - i1 > j2 - j1):
+            changes += [{"change": "removed", "title": old.sections[i].title} for i in range(i1 + (j2 - j1), i2)]
+
+    timing_changed = _timing_key(old_text) != _timing_key(new_text)
+    affected: List[str] = []
+    if changed_old or changed_new or timing_changed:
+        for c in ULPR_CRITERIA:
+            hit = timing_changed and c.code in TIMING_CODES
+            for index, changed in ((new, changed_new), (old, changed_old)):
+                if hit or not changed:
+                    continue
+                r = index.retrieve(c.code, top_k=top_k, min_confidence=min_confidence)
+                hit = bool(r.fallback) or bool(changed & set(r.sections))
+            if hit:
+                affected.append(c.code)
+    return RevisionPlan(
+        affected=affected,
+        changes=changes,
+        changed_share=len(changed_new) / max(len(new.sections), 1),
+        timing_changed=timing_changed,
+    )
+
+
+def _full(backend, lesson_text, reason: str, **kwargs):
+    model_json, ratings, cap_notes, _ = evaluate_lesson(backend, lesson_text, **kwargs)
+    model_json["revision"] = {"mode": "full", "reason": reason, "rescored": [c.code for c in ULPR_CRITERIA]}
+    report_md = format_markdown_report(ratings, cap_notes, model_json, lesson_excerpt=lesson_text[:3000])
+    return model_json, ratings, cap_notes, report_md
+
+
+def reevaluate_lesson(
+    backend: LLMBackend,
+    lesson_text: str,
+    previous: Optional[Dict[str, Any]],
+    timings: Optional[Dict[str, float]] = None,
+    prompt_mode: str = "full",
+    timing_facts: bool = False,
+    focus=None,
+    max_changed_share: float = 0.6,
+) -> Tuple[Dict[str, Any], Dict[str, RatedCriterion], List[str], str]:
+    """
+    evaluate_lesson() for a revised lesson: re-scores only the criteria the
+    edit affects. The model JSON carries a "revision" block with the mode
+    ("full" | "partial" | "unchanged"), the re-scored codes and the changes.
+    """
+    kwargs = dict(timings=timings, prompt_mode=prompt_mode, timing_facts=timing_facts, focus=focus)
+    if previous is None:
+        return _full(backend, lesson_text, "no previous version", **kwargs)
+    versions = {"rubric": RUBRIC_VERSION, "prompt": PROMPT_VERSIONS[prompt_mode], "model": backend_meta(backend)["model"]}
+    stale = [k for k, v in versions.items() if previous.get("versions", {}).get(k) != v]
+    if stale:
+        return _full(backend, lesson_text, f"{', '.join(stale)} changed since the previous version", **kwargs)
+
+    t0 = time.perf_counter()
+    plan = plan_revision(previous["lesson_text"], lesson_text)
+    if plan.changed_share > max_changed_share:
+        return _full(backend, lesson_text, f"{plan.changed_share:.0%} of sections changed", **kwargs)
+
+    facts = parse_timing(lesson_text).to_dict()
+    facts_block = format_prompt_block(facts) if timing_facts else ""
+    facts["in_prompt"] = bool(facts_block)
+    model_json = json.loads(json.dumps(previous["model_json"]))  # deep copy
+    model_json.pop("focus", None)
+    t1 = time.perf_counter()
+    if plan.affected:
+        user_prompt = build_criteria_prompt(lesson_text, plan.affected, mode=prompt_mode)
+        if facts_block and set(plan.affected) & set(TIMING_CODES):
+            user_prompt += "\n\n" + facts_block
+        raw_text = backend.generate(criteria_system_prompt(plan.affected), user_prompt)
+        try:
+            part = extract_json(raw_text)
+        except Exception:
+            print("Model output was not valid JSON. Raw output:\n", raw_text, file=sys.stderr)
+            raise
+        got = part.get("criteria", {}) if isinstance(part, dict) else {}
+        criteria = model_json.setdefault("criteria", {})
+        for code in plan.affected:
+            if isinstance(got, dict) and code in got:
+                criteria[code] = got[code]
+            else:
+                criteria.pop(code, None)  # reported as missing rather than silently carried over
+    t2 = time.perf_counter()
+
+    model_json["lesson_facts"] = facts
+    model_json["revision"] = {
+        "mode": "partial" if plan.affected else "unchanged",
+        "previous": previous.get("saved_at"),
+        "rescored": plan.affected,
+        "carried_over": [c.code for c in ULPR_CRITERIA if c.code not in plan.affected],
+        "changes": plan.changes,
+        "timing_changed": plan.timing_changed,
+    }
+    ratings, cap_notes = rate_from_model(model_json)
+    t3 = time.perf_counter()
+    report_md = format_markdown_report(ratings, cap_notes, model_json, lesson_excerpt=lesson_text[:3000])
+    t4 = time.perf_counter()
+    if timings is not None:
+        timings.update(
+            prompt_s=round(t1 - t0, 4),
+            generate_s=round(t2 - t1, 4),
+            rate_s=round(t3 - t2, 4),
+            render_s=round(t4 - t3, 4),
+            total_s=round(t4 - t0, 4),
+        )
+    return model_json, ratings, cap_notes, report_md
+
+
+# ------------------------------- History ------------------------------------ #
+
+def default_history_dir() -> str:
+    base = os.environ.get("ULPR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ulpr")
+    return os.path.join(base, "history")
+
+
+class RevisionStore:
+    """<root>/<label>/latest.json plus <saved_at>.json for each superseded version."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or default_history_dir()
+
+    def _dir(self, label: str) -> str:
+        return os.path.join(self.root, "".join(c if c.isalnum() or c in "-_.()" else "_" for c in label))
+
+    def load(self, label: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._dir(label), "latest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, label: str, lesson_text: str, model_json: Dict[str, Any], backend, prompt_mode: str = "full"):
+        directory = self._dir(label)
+        os.makedirs(directory, exist_ok=True)
+        latest = os.path.join(directory, "latest.json")
+        previous = self.load(label)
+        if previous is not None:
+            os.replace(latest, os.path.join(directory, f"{previous.get('saved_at', 'previous')}.json"))
+        atomic_write_json(latest, {
+            "lesson": label,
+            "saved_at": datetime.now().strftime("%Y%m%dT%H%M%S.%f"),
+            "versions": {
+                "rubric": RUBRIC_VERSION, "prompt": PROMPT_VERSIONS[prompt_mode], "model": backend_meta(backend)["model"],
+            },
+            "lesson_text": lesson_text,
+            "model_json": model_json,
+        })
+
+    def evaluate(self, backend: LLMBackend, label: str, lesson_text: str, **kwargs):
+        """reevaluate_lesson() against the stored version, then store the result as the new latest."""
+        result = reevaluate_lesson(backend, lesson_text, self.load(label), **kwargs)
+        self.save(label, lesson_text, result[0], backend, prompt_mode=kwargs.get("prompt_mode", "full"))
+        return result
+
+
+def format_revision(info: Dict[str, Any]) -> str:
+    if info["mode"] == "full":
+        return f"Revision: full evaluation ({info['reason']})"
+    changes = ", ".join(f"{c['change']} '{c['title'] or '(untitled)'}'" for c in info["changes"]) or "none"
+    return (
+        f"Revision: re-scored {len(info['rescored'])}/{len(ULPR_CRITERIA)} "
+        f"({', '.join(info['rescored']) or 'none'}); section changes: {changes}"
+        + ("; timing table changed" if info["timing_changed"] else "")
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Show which ULPR criteria an edit to a lesson affects")
+    p.add_argument("old", help="Previous lesson version (file or raw text)")
+    p.add_argument("new", help="Revised lesson version (file or raw text)")
+    args = p.parse_args(argv)
+
+    plan = plan_revision(read_lesson_text(args.old), read_lesson_text(args.new))
+    for c in plan.changes:
+        print(f"{c['change']:<9} {c['title'] or '(untitled)'}")
+    print(f"changed sections: {plan.changed_share:.0%}; timing changed: {plan.timing_changed}")
+    print(f"re-score: {', '.join(plan.affected) or 'nothing'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
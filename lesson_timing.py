@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+lesson_timing.py
+
+Deterministic timing-table parser for ULPR pacing and ICAP-mix facts.
+
+What it does
+------------
+- Finds the lesson's timed activity segments in the usual plan formats:
+    Hook (5 min): …            Lecture: (20 minutes)       #### Closing (15 minutes)
+    I. Introduction (15 minutes):   Lecture on AI Use Cases 20 Min
+    10 min – Warm-up           0–10 min: Warm-up           10:00–10:15 Warm-up
+    | 10 min | Warm-up | … |   (Markdown/plain table rows)
+  and the planned length ("Duration: 90 minutes", "2 hours", "a 52-minute class").
+  Bulleted sub-steps ("• Step 1 (5 min)") nest under the segment above them;
+  an agenda repeated in an overview and again in the body is counted once.
+- Computes total timed minutes vs the planned length, each segment's start
+  minute, time share by activity type (ICAP: passive / active / constructive /
+  interactive, from keywords in the segment title), retrieval/check episodes
+  with their start minutes and spacing, and delayed follow-up checks.
+- Renders the facts as a short prompt block so the model reads the
+  arithmetic instead of estimating it (A3, B1, C1, C3).
+
+Everything is precompiled regex over lines: a lesson parses in one to three
+milliseconds.
+
+Usage
+-----
+python lesson_timing.py "lessons/lesson_plan(GPT-5).txt" [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+TIMING_VERSION = "timing-1"
+
+# Criteria whose prompts get the computed facts in criterion-focused mode.
+TIMING_CODES = ("A3", "B1", "C1", "C3")
+
+ICAP_KINDS = ("passive", "active", "constructive", "interactive")
+
+# First match wins, so the more engaged mode is checked first.
+_ICAP_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("interactive", ("discuss", "debate", "pair", "partner", "group", "peer", "collaborat", "jigsaw",
+                     "role-play", "role play", "socratic", "debrief", "think-pair", "gallery walk")),
+    ("constructive", ("present", "share-out", "create", "design", "analy", "case stud", "project", "concept map",
+                      "brainstorm", "reflect", "writ", "explor", "inquiry", "investigat", "problem solving")),
+    ("active", ("practice", "exercise", "worksheet", "quiz", "exit ticket", "poll", "hook", "warm-up", "warm up",
+                "assessment", "wrap-up", "wrap up", "closing", "closure", "review", "note", "check")),
+    ("passive", ("lecture", "instruction", "video", "demonstrat", "demo", "overview", "introduc", "explanation",
+                 "presentation by", "mini-lesson", "modeling", "modelling", "read-aloud")),
+]
+
+_RETRIEVAL = re.compile(
+    r"\b(?:exit (?:ticket|slip)|(?:micro|mini|pop)[- ]?quiz|quiz|retrieval|recall|brain dump|self-test|flashcard"
+    r"|checks? for understanding|CFU|cold[- ]call|review questions|poll|whiteboard check)",
+    re.I,
+)
+_DELAYED = re.compile(
+    r"\b(?:(?:next|following) (?:class|lesson|session|week)|(?:48|72) ?h(?:ours?)?\b"
+    r"|(?:two|2|three|3) days|(?:one|1) week|spaced (?:review|retrieval)|cumulative (?:quiz|review|check)"
+    r"|follow-up (?:quiz|check))",
+    re.I,
+)
+
+_NUM = r"\d+(?:\.\d+)?"
+_UNIT = r"(?P<unit>min(?:ute)?s?|mins?\.?|hours?|hrs?|h)\b"
+_DUR = rf"(?P<lo>{_NUM})\s*(?:[-–—]|to)?\s*(?P<hi>{_NUM})?\s*{_UNIT}"
+_DUR_RE = re.compile(_DUR, re.I)
+_CLOCK = re.compile(r"(?P<h1>\d{1,2}):(?P<m1>\d{2})\s*(?:[-–—]|to)\s*(?P<h2>\d{1,2}):(?P<m2>\d{2})")
+_LEAD = re.compile(r"^\s*(?:[#>*]+\s*)?(?P<marker>[-*•●▪◦]|\d+[.)]|[IVX]+\.|[A-Za-z][.)])?\s*")
+# Segment line shapes (see the module docstring), tried in this order.
+_BOX = re.compile(rf"^(?P<title>[^()]{{2,90}}?)\s*:?\s*\(\s*(?:~|about\s)?{_DUR}\s*\)\s*(?P<colon>:)?\s*(?P<rest>.*)$", re.I)
+_TRAILING = re.compile(rf"^(?P<title>[A-Za-z][^.!?]{{1,80}}?)\s*[:\-–—]?\s*{_DUR}\s*$", re.I)
+_LEADING = re.compile(rf"^\(?\s*{_DUR}\s*\)?\s*[:\-–—|]\s*(?P<title>.{{2,90}})$", re.I)
+_LEADING_BOX = re.compile(rf"^\(\s*{_DUR}\s*\)\s*(?P<title>.{{2,90}})$", re.I)
+_STEP = re.compile(r"step \d", re.I)
+_PLANNED = re.compile(
+    rf"(?:total\s+)?(?:duration|length|class (?:time|length|period)|time(?: allotted)?)\s*[:\-–]?\s*\**\s*{_DUR}"
+    rf"|\b(?P<lo2>{_NUM})[- ](?:minute|min) (?:class|lesson|session|period|block)",
+    re.I,
+)
+
+
+@dataclasses.dataclass
+class Segment:
+    title: str
+    minutes: float
+    line: int  # 1-based line number in the lesson
+    kind: str = "unclassified"
+    start_min: Optional[float] = None
+    detail: str = ""  # text after the time box on the same line
+    children: List["Segment"] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class TimingFacts:
+    segments: List[Segment]
+    planned_minutes: Optional[float]
+    retrieval: List[Dict[str, Any]]
+    delayed_checks: List[str]
+    parse_ms: float = 0.0
+
+    @property
+    def total_minutes(self) -> float:
+        return sum(s.minutes for s in self.segments)
+
+    def share_by_kind(self) -> Dict[str, float]:
+        total = self.total_minutes or 1.0
+        out = {k: 0.0 for k in (*ICAP_KINDS, "unclassified")}
+        for s in self.segments:
+            out[s.kind] += s.minutes / total
+        return {k: round(v, 3) for k, v in out.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        share = self.share_by_kind()
+        starts = [r["start_min"] for r in self.retrieval]
+        return {
+            "version": TIMING_VERSION,
+            "planned_minutes": self.planned_minutes,
+            "total_minutes": self.total_minutes,
+            "over_plan_minutes": (
+                self.total_minutes - self.planned_minutes if self.planned_minutes and self.segments else None
+            ),
+            "segments": [
+                {
+                    "title": s.title, "minutes": s.minutes, "start_min": s.start_min, "kind": s.kind, "line": s.line,
+                    "steps": [{"title": c.title, "minutes": c.minutes} for c in s.children],
+                }
+                for s in self.segments
+            ],
+            "share_by_kind": share,
+            "constructive_interactive_share": round(share["constructive"] + share["interactive"], 3),
+            "interactive_share": share["interactive"],
+            "retrieval": self.retrieval,
+            "retrieval_count": len(self.retrieval),
+            "retrieval_gaps_min": [b - a for a, b in zip(starts, starts[1:])],
+            "delayed_checks": self.delayed_checks,
+        }
+
+
+# ------------------------------- Parsing ------------------------------------ #
+
+def _minutes(m: re.Match, lo: str = "lo", hi: str = "hi") -> float:
+    """Duration in minutes; a range like 3–5 min counts as its midpoint."""
+    a = float(m.group(lo))
+    b = float(m.group(hi)) if m.group(hi) else a
+    value = (a + b) / 2
+    unit = (m.group("unit") or "min").lower()
+    return value * 60 if unit.startswith("h") else value
+
+
+def _clean_title(text: str) -> str:
+    text = re.sub(r"[*_`#|]+", " ", text)
+    text = text.strip(" \t:-–—.;,()[]")
+    return re.sub(r"\s+", " ", text)
+
+
+def classify(title: str, detail: str = "") -> str:
+    """ICAP mode from keywords in the title (then the same-line description)."""
+    for text in (title, detail):
+        low = text.lower()
+        for kind, words in _ICAP_KEYWORDS:
+            if any(w in low for w in words):
+                return kind
+    return "unclassified"
+
+
+def _parse_line(line: str) -> Optional[Tuple[str, float, str, bool]]:
+    """(title, minutes, same-line detail, is_sub_step) for a timed segment line, else None."""
+    lead = _LEAD.match(line)
+    marker = lead.group("marker") or ""
+    body = line[lead.end():].rstrip()
+    if not body or len(body) > 220 or not (_DUR_RE.search(body) or _CLOCK.search(body)):
+        return None
+    sub = marker in ("-", "*", "•", "●", "▪", "◦") or bool(_STEP.match(body))
+
+    if "|" in body:  # table row: first duration/clock cell + first text cell
+        cells = [c.strip() for c in body.strip("|").split("|")]
+        dur, title = None, None
+        for c in cells:
+            clock = _CLOCK.fullmatch(c)
+            d = _DUR_RE.fullmatch(c)
+            if dur is None and clock:
+                dur = (int(clock["h2"]) * 60 + int(clock["m2"])) - (int(clock["h1"]) * 60 + int(clock["m1"]))
+            elif dur is None and d:
+                dur = _minutes(d)
+            elif title is None and c and not re.fullmatch(r"[-: ]*", c):
+                title = c
+        if dur and title and dur > 0:
+            return _clean_title(title), float(dur), "", False
+        return None
+
+    # Title (N min)[:] [detail]  — the time box must end the line or be followed by ':'.
+    m = _BOX.match(body)
+    if m and (m.group("colon") or not m.group("rest") or m.group("rest")[0] in "-–—:"):
+        return _clean_title(m.group("title")), _minutes(m), m.group("rest").strip(" -–—:"), sub
+
+    # Title N Min  /  Title – 20 minutes  /  Title: 20 minutes
+    m = _TRAILING.match(body)
+    if m and len(m.group("title").split()) <= 10:
+        return _clean_title(m.group("title")), _minutes(m), "", sub
+
+    # 10 min – Warm-up  /  0–10 min: Warm-up  /  (10 min) Warm-up  /  10:00–10:15 Warm-up
+    m = _LEADING.match(body) or _LEADING_BOX.match(body)
+    if m:
+        title, _, rest = m.group("title").partition(":")
+        return _clean_title(title), _minutes(m), rest.strip(), sub
+    m = _CLOCK.match(body)
+    if m:
+        minutes = (int(m["h2"]) * 60 + int(m["m2"])) - (int(m["h1"]) * 60 + int(m["m1"]))
+        title, _, rest = body[m.end():].strip(" :-–—|").partition(":")
+        if minutes > 0 and title:
+            return _clean_title(title), float(minutes), rest.strip(), sub
+    return None
+
+
+def _planned(text: str) -> Optional[float]:
+    for m in _PLANNED.finditer(text):
+        if m.group("lo2"):
+            return float(m.group("lo2"))
+        return _minutes(m)
+    return None
+
+
+def parse_timing(lesson_text: str) -> TimingFacts:
+    t0 = time.perf_counter()
+    lines = lesson_text.replace("\r\n", "\n").split("\n")
+    planned = _planned(lesson_text)
+    title_line = next((i for i, line in enumerate(lines) if line.strip()), None)
+    if planned is None and title_line is not None:
+        # "Photosynthesis (50 minutes)" as the plan's title states its length.
+        parsed = _parse_line(lines[title_line])
+        planned = parsed[1] if parsed else None
+
+    segments: List[Segment] = []
+    spans: List[Tuple[int, int]] = []  # (first line, last line) index per top-level segment
+    seen: Dict[Tuple[str, float], int] = {}
+    for i, line in enumerate(lines):
+        if i == title_line or (_PLANNED.search(line) and not line.strip().startswith("|")):
+            continue
+        parsed = _parse_line(line)
+        if parsed is None:
+            continue
+        title, minutes, detail, sub = parsed
+        if not title or minutes <= 0 or (planned and minutes >= planned):
+            continue
+        seg = Segment(title=title, minutes=minutes, line=i + 1, detail=detail)
+        # Sub-steps nest while they fit in the parent's time box.
+        if sub and segments and sum(c.minutes for c in segments[-1].children) + minutes <= segments[-1].minutes:
+            segments[-1].children.append(seg)
+            continue
+        key = (title.lower(), minutes)
+        if key in seen:
+            # Agenda overview repeated in the body: keep one, extend its text span.
+            spans[seen[key]] = (spans[seen[key]][0], i)
+            continue
+        seen[key] = len(segments)
+        segments.append(seg)
+        spans.append((i, i))
+
+    # Each segment's body runs to the next segment line; an agenda list item
+    # (overview) stops at its next sibling item or a blank line.
+    order = sorted(range(len(segments)), key=lambda k: spans[k][1])
+    bounds = {}
+    for n, k in enumerate(order):
+        lo = spans[k][1]
+        hi = spans[order[n + 1]][1] if n + 1 < len(order) else len(lines)
+        if _LEAD.match(lines[lo]).group("marker"):
+            indent = len(lines[lo]) - len(lines[lo].lstrip())
+            for j in range(lo + 1, hi):
+                nxt = lines[j]
+                if not nxt.strip() or (
+                    _LEAD.match(nxt).group("marker") and len(nxt) - len(nxt.lstrip()) <= indent
+                ):
+                    hi = j
+                    break
+        bounds[k] = (lo, hi)
+
+    start = 0.0
+    retrieval: List[Dict[str, Any]] = []
+    for k, seg in enumerate(segments):
+        seg.start_min = start
+        seg.kind = classify(seg.title, seg.detail)
+        lo, hi = bounds[k]
+        body = "\n".join(lines[lo:hi])
+        kinds = sorted({m.group(0).strip().lower() for m in _RETRIEVAL.finditer(seg.title + " " + body)})
+        if kinds:
+            retrieval.append({"segment": seg.title, "start_min": start, "kinds": kinds})
+        start += seg.minutes
+
+    delayed = sorted({m.group(0).lower() for m in _DELAYED.finditer(lesson_text)})
+    return TimingFacts(
+        segments=segments, planned_minutes=planned, retrieval=retrieval, delayed_checks=delayed,
+        parse_ms=(time.perf_counter() - t0) * 1000,
+    )
+
+
+# ------------------------------- Rendering ---------------------------------- #
+
+def format_prompt_block(facts: Dict[str, Any]) -> str:
+    """Prompt lines for TimingFacts.to_dict(); empty when no timed segments were found."""
+    if not facts.get("segments"):
+        return ""
+    planned = facts["planned_minutes"]
+    total = facts["total_minutes"]
+    head = f"- Timed segments: {len(facts['segments'])} totalling {total:g} min"
+    if planned:
+        over = facts["over_plan_minutes"]
+        head += f" vs planned {planned:g} min" + (f" ({over:+g} min)" if over else " (exact, no buffer)")
+    agenda = "; ".join(
+        f"{s['start_min']:g}–{s['start_min'] + s['minutes']:g} {s['title']} [{s['kind']}]" for s in facts["segments"]
+    )
+    share = facts["share_by_kind"]
+    mix = ", ".join(f"{k} {share[k]:.0%}" for k in (*ICAP_KINDS, "unclassified") if share[k])
+    lines = [
+        "Computed lesson facts (parsed deterministically from the plan's stated timings; "
+        "use them instead of re-deriving minutes or shares, but judge quality from the plan itself):",
+        head,
+        f"- Agenda (minute ranges): {agenda}",
+        f"- Time share by ICAP mode (keyword-classified): {mix}; "
+        f"Constructive+Interactive {facts['constructive_interactive_share']:.0%}, "
+        f"Interactive {facts['interactive_share']:.0%}",
+    ]
+    if facts["retrieval"]:
+        where = "; ".join(f"min {r['start_min']:g} {r['segment']} ({', '.join(r['kinds'])})" for r in facts["retrieval"])
+        gaps = facts["retrieval_gaps_min"]
+        lines.append(
+            f"- Retrieval/check episodes: {facts['retrieval_count']} — {where}"
+            + (f"; spacing {', '.join(f'{g:g}' for g in gaps)} min" if gaps else "")
+        )
+    else:
+        lines.append("- Retrieval/check episodes inside timed segments: none found")
+    lines.append(
+        "- Delayed/follow-up checks mentioned: " + (", ".join(facts["delayed_checks"]) or "none")
+    )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Parse a lesson's timing table into pacing / ICAP-mix facts")
+    p.add_argument("lesson", help="Lesson file or raw text")
+    p.add_argument("--json", action="store_true", help="Print the facts as JSON")
+    args = p.parse_args(argv)
+
+    from lesson_plan_evaluator import read_lesson_text
+
+    parsed = parse_timing(read_lesson_text(args.lesson))
+    facts = parsed.to_dict()
+    if args.json:
+        print(json.dumps(facts, ensure_ascii=False, indent=2))
+    else:
+        print(format_prompt_block(facts) or "No timed segments found.")
+        print(f"(parsed in {parsed.parse_ms:.2f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+measure_startup.py
+
+Measures CLI start-up cost for the evaluator and compare scripts.
+
+What it does
+------------
+- Runs `<script> --help` N times in fresh interpreters and reports the
+  median / min wall time (this is the fixed cost every shell-driven
+  evaluation pays before any model call).
+- Times importing lesson_plan_evaluator and building the first user prompt
+  (rendering the rubric prefix, see prompt_prefix()) in N fresh
+  interpreters, with the same median / min summary.
+
+Usage
+-----
+python measure_startup.py -n 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_PROMPT_SNIPPET = (
+    "import time; t0=time.perf_counter(); "
+    "import lesson_plan_evaluator as L; t1=time.perf_counter(); "
+    "L.build_user_prompt('x'); t2=time.perf_counter(); "
+    "print(t1-t0, t2-t1)"
+)
+
+
+def time_command(cmd, n: int, env=None):
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        times.append(time.perf_counter() - t0)
+        if proc.returncode != 0:
+            return None, proc.stderr.decode("utf-8", "replace").strip().splitlines()[-1:]
+    return times, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI start-up time")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'command':<40} {'median':>9} {'min':>9}")
+    for script in ("lesson_plan_evaluator.py", "compare.py"):
+        times, err = time_command([sys.executable, script, "--help"], args.runs)
+        label = f"{script} --help"
+        if times is None:
+            print(f"{label:<40} failed: {err}")
+        else:
+            print(f"{label:<40} {statistics.median(times) * 1000:8.1f}ms {min(times) * 1000:8.1f}ms")
+
+    # In-process timings: module import, then the first (rendering) build_user_prompt call.
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", _PROMPT_SNIPPET], cwd=HERE, capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f"{'import + prompt':<40} failed: {out.stderr.strip().splitlines()[-1:]}")
+            return
+        samples.append([float(x) for x in out.stdout.split()])
+    for i, label in enumerate(("import lesson_plan_evaluator", "first build_user_prompt")):
+        times = [sample[i] for sample in samples]
+        print(f"{label:<40} {statistics.median(times) * 1000:8.1f}ms {min(times) * 1000:8.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+model_cascade.py
+
+Tiered model cascade for ULPR scoring: small model first, escalate the
+uncertain lessons to the large model.
+
+What it does
+------------
+- Scores each lesson with a small, fast model.
+- Escalates to the large model only when the small model's result is
+  uncertain:
+    * missing criterion codes in the model JSON,
+    * ungrounded evidence (empty, or little overlap with the lesson text),
+    * a criterion sitting at or one band above an apply_caps trigger while
+      the capped criterion would be affected (one band flips the cap),
+    * a total within --margin points of a reporting threshold (--borderline).
+- Reports the escalation rate, the reasons, and time spent in each tier.
+
+Usage
+-----
+python model_cascade.py --lesson lessons/ --out-dir reports_out \
+    --backend ollama --small-model qwen2.5:3b-instruct --large-model llama3.1:70b
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from lesson_plan_evaluator import (
+    JsonlSink,
+    LLMBackend,
+    RatedCriterion,
+    add_backend_args,
+    backend_meta,
+    build_scored_report,
+    evaluate_lesson,
+    lesson_label,
+    make_backend,
+    read_lesson_text,
+    totals,
+    write_lesson_outputs,
+)
+
+# (trigger code, trigger fires when band <= this, capped codes, capped code affected when band > this)
+# Mirrors apply_caps(); E3 < 2 is written as E3 <= 1.
+CAP_RULES: List[Tuple[str, int, List[str], int]] = [
+    ("A2", 1, ["B2", "C2"], 2),
+    ("A1", 1, ["A2"], 2),
+    ("E3", 1, ["E1", "E2"], 3),
+    ("C3", 1, ["C2"], 3),
+]
+
+_WORD = re.compile(r"[a-z0-9]{4,}")
+
+
+@dataclasses.dataclass
+class CascadePolicy:
+    borderline: Tuple[float, ...] = (50.0, 60.0, 70.0, 80.0)
+    margin: float = 2.5
+    min_grounding: float = 0.35  # share of evidence content words found in the lesson
+    max_ungrounded: int = 3  # escalate when more criteria than this are ungrounded
+
+
+def evidence_grounding(evidence: str, lesson_words: set) -> float:
+    """Share of the evidence's content words (≥4 letters) that occur in the lesson."""
+    words = _WORD.findall(evidence.lower())
+    if not words:
+        return 0.0
+    return sum(1 for w in words if w in lesson_words) / len(words)
+
+
+def escalation_reasons(
+    ratings: Dict[str, RatedCriterion], lesson_text: str, policy: CascadePolicy
+) -> List[str]:
+    reasons: List[str] = []
+
+    missing = [code for code, r in ratings.items() if r.missing]
+    if missing:
+        reasons.append(f"missing codes: {', '.join(missing)}")
+
+    lesson_words = set(_WORD.findall(lesson_text.lower()))
+    ungrounded = [
+        code for code, r in ratings.items()
+        if not r.missing and evidence_grounding(r.evidence, lesson_words) < policy.min_grounding
+    ]
+    if len(ungrounded) > policy.max_ungrounded:
+        reasons.append(f"ungrounded evidence: {', '.join(ungrounded)}")
+
+    for trigger, fires_at, targets, affected_above in CAP_RULES:
+        if trigger not in ratings:
+            continue
+        band = ratings[trigger].raw_band if ratings[trigger].raw_band is not None else ratings[trigger].band
+        if band not in (fires_at, fires_at + 1):
+            continue
+        hit = [
+            t for t in targets
+            if t in ratings and (ratings[t].raw_band if ratings[t].raw_band is not None else ratings[t].band) > affected_above
+        ]
+        if hit:
+            reasons.append(f"near cap: {trigger}={band} vs {', '.join(hit)}")
+
+    total, _ = totals(ratings)
+    near = [t for t in policy.borderline if abs(total - t) <= policy.margin]
+    if near:
+        reasons.append(f"borderline total {total:.1f} (threshold {near[0]:g})")
+
+    return reasons
+
+
+def evaluate_cascade(
+    small: LLMBackend,
+    large: Union[LLMBackend, Callable[[], LLMBackend]],
+    lesson_text: str,
+    policy: Optional[CascadePolicy] = None,
+    prompt_mode: str = "full",
+) -> Tuple[Dict[str, Any], Dict[str, RatedCriterion], List[str], str, Dict[str, Any]]:
+    """
+    Same return values as evaluate_lesson plus an info dict:
+    {"tier": "small"|"large", "reasons": [...], "small_s": ..., "large_s": ...}.
+    A small-model failure (e.g. invalid JSON) also escalates. `large` may be
+    a zero-argument factory, called only when a lesson escalates.
+    """
+    policy = policy or CascadePolicy()
+    info: Dict[str, Any] = {"tier": "small", "reasons": [], "small_s": 0.0, "large_s": 0.0}
+
+    t0 = time.perf_counter()
+    try:
+        result = evaluate_lesson(small, lesson_text, prompt_mode=prompt_mode)
+        info["reasons"] = escalation_reasons(result[1], lesson_text, policy)
+    except Exception as e:
+        result = None
+        info["reasons"] = [f"small model failed: {type(e).__name__}: {e}"]
+    info["small_s"] = time.perf_counter() - t0
+
+    if info["reasons"]:
+        t1 = time.perf_counter()
+        if callable(large):
+            large = large()
+        result = evaluate_lesson(large, lesson_text, prompt_mode=prompt_mode)
+        info["large_s"] = time.perf_counter() - t1
+        info["tier"] = "large"
+
+    model_json, ratings, cap_notes, report_md = result
+    return model_json, ratings, cap_notes, report_md, info
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="ULPR small→large model cascade")
+    p.add_argument("--lesson", required=True, help="Lesson file, directory of lessons, or raw text")
+    add_backend_args(p)
+    p.add_argument("--small-model", required=True, help="Fast first-tier model")
+    p.add_argument("--large-model", default=None, help="Model used for escalated lessons (default: --model)")
+    p.add_argument("--borderline", default="50,60,70,80", help="Comma-separated total thresholds")
+    p.add_argument("--margin", type=float, default=2.5, help="Points around a threshold that count as borderline")
+    p.add_argument("--out-dir", default="reports_out")
+    args = p.parse_args(argv)
+
+    def _backend(model: str) -> LLMBackend:
+        # Both tiers share the backend flags (--hf-device, --hf-quant, ...).
+        return make_backend(argparse.Namespace(**{**vars(args), "model": model}))
+
+    small = _backend(args.small_model)
+    large_backend: List[LLMBackend] = []
+
+    def large() -> LLMBackend:
+        # Loaded on the first escalation: a run the small tier handles alone never pays for it.
+        if not large_backend:
+            large_backend.append(_backend(args.large_model or args.model))
+        return large_backend[0]
+
+    policy = CascadePolicy(
+        borderline=tuple(float(x) for x in args.borderline.split(",") if x.strip()), margin=args.margin
+    )
+
+    if os.path.isdir(args.lesson):
+        from lesson_ingest import ingest_path
+        lessons = {lesson_label(path): text for path, text in ingest_path(args.lesson).items()}
+    else:
+        label = lesson_label(args.lesson) if os.path.isfile(args.lesson) else "lesson"
+        lessons = {label: read_lesson_text(args.lesson)}
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    escalated, small_s, large_s = 0, 0.0, 0.0
+    with JsonlSink(os.path.join(args.out_dir, "scored_reports.jsonl"), truncate=True) as jsonl:
+        for label, lesson_text in lessons.items():
+            model_json, ratings, cap_notes, report_md, info = evaluate_cascade(
+                small, large, lesson_text, policy=policy, prompt_mode=args.prompt_mode
+            )
+            small_s += info["small_s"]
+            large_s += info["large_s"]
+            escalated += info["tier"] == "large"
+            total, _ = totals(ratings)
+            why = f" ← {'; '.join(info['reasons'])}" if info["reasons"] else ""
+            print(f"{label}: ULPR Total {round(total)} / 100 [{info['tier']}]{why}")
+
+            meta = {**backend_meta(large() if info["tier"] == "large" else small), "cascade": info}
+            scored = build_scored_report(ratings, cap_notes, model_json, lesson=label, meta=meta,
+                                         prompt_mode=args.prompt_mode)
+            write_lesson_outputs(args.out_dir, label, model_json, report_md)
+            jsonl.write(scored)
+
+    n = max(len(lessons), 1)
+    print(f"\nEscalated {escalated}/{len(lessons)} ({escalated / n:.0%}); "
+          f"small tier {small_s:.1f}s, large tier {large_s:.1f}s "
+          f"(avg {small_s / n:.1f}s + {large_s / max(escalated, 1):.1f}s per escalation)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
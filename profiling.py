@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+profiling.py
+
+Opt-in per-stage profiling for the ULPR command-line tools.
+
+What it does
+------------
+- span("name") marks a pipeline stage (prompt building, model call, JSON
+  parsing, rating, rendering, output writing, ...). While no profiler is
+  active it returns a shared no-op context manager, so instrumented code
+  pays one global lookup per stage.
+- Profiler aggregates, per stage: calls, total / max wall time, net
+  allocated bytes and peak traced memory (tracemalloc), and the top
+  allocation sites at the end of the run.
+- Optionally records a cProfile dump for snakeviz / pstats.
+
+Usage
+-----
+python lesson_plan_evaluator.py --lesson lessons/ --profile [--profile-out prof/run]
+python compare.py reports_json/*.json --profile
+
+With --profile-out PREFIX the summary is written to PREFIX.json and the
+cProfile dump to PREFIX.prof; the summary table always goes to stderr.
+Spans from several threads are aggregated together; memory figures are
+process-wide, so treat them as approximate under concurrency.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+_NULL_SPAN = contextlib.nullcontext()
+_ACTIVE: Optional["Profiler"] = None
+
+
+def span(name: str):
+    """Context manager timing one stage; free when profiling is off."""
+    if _ACTIVE is None:
+        return _NULL_SPAN
+    return _ACTIVE.span(name)
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "t0", "mem0", "peak")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.peak = 0
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.mem0 = 0  # memory figures stay 0 without trace_memory
+        if self.profiler.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.mem0 = current
+        stack.append(self)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.t0
+        stack = self.profiler._stack()
+        stack.pop()
+        net = 0
+        if self.profiler.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            net = current - self.mem0
+            if stack:
+                # The enclosing span's peak includes everything this one saw.
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+        self.profiler._record(self.name, elapsed, net, self.peak - self.mem0)
+        return False
+
+
+class Profiler:
+    def __init__(self, trace_memory: bool = True, cprofile: bool = False, top_allocations: int = 10):
+        self.trace_memory = trace_memory
+        self.top_allocations = top_allocations
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._order: List[str] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cprofile = None
+        if cprofile:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+        self._t0 = 0.0
+        self.wall_s = 0.0
+        self.allocations: List[Dict[str, Any]] = []
+
+    def _stack(self) -> List[_Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def _record(self, name: str, elapsed: float, net: int, peak: int):
+        with self._lock:
+            s = self.stages.get(name)
+            if s is None:
+                s = self.stages[name] = {"calls": 0, "total_s": 0.0, "max_s": 0.0, "net_bytes": 0, "peak_bytes": 0}
+                self._order.append(name)
+            s["calls"] += 1
+            s["total_s"] += elapsed
+            s["max_s"] = max(s["max_s"], elapsed)
+            s["net_bytes"] += net
+            s["peak_bytes"] = max(s["peak_bytes"], peak)
+
+    # ------------------------------------------------------------------ #
+
+    def start(self) -> "Profiler":
+        global _ACTIVE
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        self._t0 = time.perf_counter()
+        _ACTIVE = self
+        return self
+
+    def stop(self):
+        global _ACTIVE
+        _ACTIVE = None
+        self.wall_s = time.perf_counter() - self._t0
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                    tracemalloc.Filter(False, "<frozen *>"),
+                ]
+            )
+            self.allocations = [
+                {"site": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[: self.top_allocations]
+            ]
+            tracemalloc.stop()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "wall_s": self.wall_s,
+            "stages": {name: dict(self.stages[name]) for name in self._order},
+            "top_allocations": self.allocations,
+        }
+
+    def format_summary(self) -> str:
+        lines = [
+            f"{'stage':<16} {'calls':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'share':>6} "
+            f"{'net MB':>8} {'peak MB':>8}"
+        ]
+        for name in self._order:
+            s = self.stages[name]
+            share = s["total_s"] / self.wall_s if self.wall_s else 0.0
+            lines.append(
+                f"{name:<16} {s['calls']:>6} {s['total_s']:>9.3f} {s['total_s'] / s['calls'] * 1000:>9.1f} "
+                f"{s['max_s'] * 1000:>9.1f} {share:>6.0%} {s['net_bytes'] / 2**20:>8.2f} {s['peak_bytes'] / 2**20:>8.2f}"
+            )
+        lines.append(f"{'wall':<16} {'':>6} {self.wall_s:>9.3f}")
+        if self.allocations:
+            lines.append("Largest live allocations at exit:")
+            lines += [f"  {a['size_bytes'] / 2**10:9.1f} KiB  {a['site']}" for a in self.allocations[:5]]
+        return "\n".join(lines)
+
+    def write(self, prefix: str):
+        with open(prefix + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(prefix + ".prof")
+
+
+def add_profile_args(p):
+    p.add_argument("--profile", action="store_true",
+                   help="Time each stage and trace memory; print a per-stage summary to stderr")
+    p.add_argument("--profile-out", default=None,
+                   help="With --profile: write PREFIX.json (summary) and PREFIX.prof (cProfile dump)")
+
+
+@contextlib.contextmanager
+def profiled(args):
+    """Run the body under a Profiler when args.profile is set, then report."""
+    if not getattr(args, "profile", False):
+        yield None
+        return
+    profiler = Profiler(cprofile=bool(args.profile_out)).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        print("\n=== Profile ===\n" + profiler.format_summary(), file=sys.stderr)
+        if args.profile_out:
+            profiler.write(args.profile_out)
+            print(f"Saved profile → {args.profile_out}.json / .prof", file=sys.stderr)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+rater_harness.py
+
+Agreement + latency regression harness for ULPR rater configurations.
+
+What it does
+------------
+- Runs a matrix of (backend, model, prompt variant) configurations over a
+  golden set: lesson files in --lessons paired by name with reference
+  reports in --golden (lesson_plan(X).txt ↔ report(X).json; raw model JSON
+  or *.scored.json both work).
+- For each configuration reports, against the golden bands (after caps):
+    * per-criterion exact and adjacent (±1) agreement and Cohen's kappa,
+    * pooled exact / adjacent / kappa over all criteria,
+    * total-score delta (mean and mean absolute),
+    * p50 / p95 generate latency and completion tokens/sec.
+- Prints one summary table and optionally writes the full results as JSON.
+
+Usage
+-----
+python rater_harness.py --lessons lessons --golden reports_json \
+    --config ollama:llama3.1:full --config ollama:llama3.1:compact \
+    --config ollama:qwen2.5:7b-instruct:compact --json-out harness.json
+
+or with a JSON matrix file:
+    [{"name": "llama-full", "backend": "ollama", "model": "llama3.1", "prompt_mode": "full",
+      "ollama_url": "http://localhost:11434/api/chat"}, ...]
+python rater_harness.py --matrix matrix.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from lesson_plan_evaluator import (
+    PROMPT_MODES,
+    ULPR_CRITERIA,
+    RatedCriterion,
+    estimate_tokens,
+    evaluate_lesson,
+    lesson_label,
+    make_backend,
+    percentile,
+    rate_from_model,
+    read_lesson_text,
+    totals,
+)
+
+CODES = [c.code for c in ULPR_CRITERIA]
+
+
+# ------------------------------- Statistics --------------------------------- #
+
+def cohen_kappa(a: List[int], b: List[int]) -> float:
+    """Unweighted Cohen's kappa for two raters over the same items (NaN if undefined)."""
+    n = len(a)
+    if n == 0:
+        return float("nan")
+    observed = sum(1 for x, y in zip(a, b) if x == y) / n
+    ca, cb = Counter(a), Counter(b)
+    expected = sum(ca[k] * cb[k] for k in set(ca) | set(cb)) / (n * n)
+    if expected >= 1.0:
+        return 1.0 if observed == 1.0 else float("nan")
+    return (observed - expected) / (1 - expected)
+
+
+def agreement_stats(pairs: Dict[str, List[Tuple[int, int]]]) -> Dict[str, Any]:
+    """pairs: code -> [(golden_band, candidate_band), ...]"""
+    per_code = {}
+    all_g, all_c = [], []
+    for code in CODES:
+        g = [x for x, _ in pairs.get(code, [])]
+        c = [y for _, y in pairs.get(code, [])]
+        all_g += g
+        all_c += c
+        n = max(len(g), 1)
+        per_code[code] = {
+            "exact": sum(1 for x, y in zip(g, c) if x == y) / n,
+            "adjacent": sum(1 for x, y in zip(g, c) if abs(x - y) <= 1) / n,
+            "kappa": cohen_kappa(g, c),
+        }
+    n = max(len(all_g), 1)
+    return {
+        "per_criterion": per_code,
+        "exact": sum(1 for x, y in zip(all_g, all_c) if x == y) / n,
+        "adjacent": sum(1 for x, y in zip(all_g, all_c) if abs(x - y) <= 1) / n,
+        "kappa": cohen_kappa(all_g, all_c),
+    }
+
+
+# ------------------------------- Golden set --------------------------------- #
+
+def load_golden(lessons_dir: str, golden_dir: str) -> List[Tuple[str, str, Dict[str, RatedCriterion]]]:
+    """[(label, lesson_path, golden_ratings)] for lessons that have a golden report."""
+    from lesson_ingest import list_lesson_files
+
+    golden_files = {}
+    for name in os.listdir(golden_dir):
+        if name.startswith("report(") and name.endswith(".json"):
+            label = name[len("report("):].replace(").scored.json", "").replace(").json", "")
+            golden_files[label] = os.path.join(golden_dir, name)
+
+    out = []
+    for path in list_lesson_files(lessons_dir):
+        label = lesson_label(path)
+        if label not in golden_files:
+            continue
+        with open(golden_files[label], "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("schema", "").startswith("ulpr.scored_report"):
+            # Scored reports already carry capped bands.
+            ratings, _ = rate_from_model({"criteria": {k: {"band": v["band"]} for k, v in data["criteria"].items()}})
+        else:
+            ratings, _ = rate_from_model(data)
+        out.append((label, path, ratings))
+    return out
+
+
+# ------------------------------- Configs ------------------------------------ #
+
+def parse_config(spec: str) -> Dict[str, Any]:
+    """`backend:model[:prompt_mode]`; the model may itself contain ':' (qwen2.5:7b-instruct)."""
+    backend, _, rest = spec.partition(":")
+    prompt_mode = "full"
+    head, _, tail = rest.rpartition(":")
+    if head and tail in PROMPT_MODES:
+        rest, prompt_mode = head, tail
+    return {"name": spec, "backend": backend, "model": rest, "prompt_mode": prompt_mode}
+
+
+def run_config(cfg: Dict[str, Any], golden, repeats: int = 1, backend=None) -> Dict[str, Any]:
+    if backend is None:
+        backend = make_backend(argparse.Namespace(
+            backend=cfg.get("backend", "ollama"),
+            model=cfg.get("model", "llama3.1"),
+            ollama_url=cfg.get("ollama_url", "http://localhost:11434/api/chat"),
+        ))
+    prompt_mode = cfg.get("prompt_mode", "full")
+
+    pairs: Dict[str, List[Tuple[int, int]]] = {}
+    deltas: List[float] = []
+    latencies: List[float] = []
+    tok_rates: List[float] = []
+    failures: List[str] = []
+    for label, path, gold in golden:
+        lesson_text = read_lesson_text(path)
+        for _ in range(repeats):
+            timings: Dict[str, float] = {}
+            try:
+                model_json, ratings, _, _ = evaluate_lesson(backend, lesson_text, timings=timings, prompt_mode=prompt_mode)
+            except Exception as e:
+                failures.append(f"{label}: {type(e).__name__}: {e}")
+                continue
+            latencies.append(timings["generate_s"])
+            usage = backend.last_usage() or {}
+            completion = usage.get("completion_tokens") or estimate_tokens(json.dumps(model_json, ensure_ascii=False))
+            eval_s = usage.get("eval_s") or timings["generate_s"]
+            if eval_s > 0:
+                tok_rates.append(completion / eval_s)
+            for code in CODES:
+                pairs.setdefault(code, []).append((gold[code].band, ratings[code].band))
+            deltas.append(totals(ratings)[0] - totals(gold)[0])
+
+    return {
+        "config": cfg,
+        "runs": len(latencies),
+        "failures": failures,
+        "agreement": agreement_stats(pairs),
+        "total_delta_mean": statistics.fmean(deltas) if deltas else float("nan"),
+        "total_delta_abs": statistics.fmean(abs(d) for d in deltas) if deltas else float("nan"),
+        "latency_p50_s": percentile(latencies, 50),
+        "latency_p95_s": percentile(latencies, 95),
+        "tokens_per_s": statistics.median(tok_rates) if tok_rates else float("nan"),
+    }
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    cols = ["config", "runs", "exact", "adjacent", "kappa", "Δtotal", "abs Δtotal", "p50 s", "p95 s", "tok/s"]
+    lines = ["| " + " | ".join(cols) + " |", "|---" * len(cols) + "|"]
+    for r in results:
+        a = r["agreement"]
+        lines.append(
+            f"| {r['config'].get('name', '?')} | {r['runs']} | {a['exact']:.2f} | {a['adjacent']:.2f} | "
+            f"{a['kappa']:.2f} | {r['total_delta_mean']:+.1f} | {r['total_delta_abs']:.1f} | "
+            f"{r['latency_p50_s']:.1f} | {r['latency_p95_s']:.1f} | {r['tokens_per_s']:.1f} |"
+        )
+    return "\n".join(lines)
+
+
+def format_per_criterion(results: List[Dict[str, Any]]) -> str:
+    lines = ["| config | " + " | ".join(CODES) + " |", "|---" * (len(CODES) + 1) + "|"]
+    for r in results:
+        per = r["agreement"]["per_criterion"]
+        lines.append(
+            f"| {r['config'].get('name', '?')} | " + " | ".join(f"{per[c]['kappa']:.2f}" for c in CODES) + " |"
+        )
+    return "Per-criterion Cohen's kappa:\n" + "\n".join(lines)
+
+
+def json_safe(value: Any) -> Any:
+    """Replace NaN/inf (undefined kappa, empty runs) with None so the output is strict JSON."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    return value
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Rater agreement + latency regression harness")
+    p.add_argument("--lessons", default="lessons", help="Directory of golden-set lesson files")
+    p.add_argument("--golden", default="reports_json", help="Directory of reference report(<name>).json files")
+    p.add_argument("--config", action="append", default=[], help="backend:model[:full|compact] (repeatable)")
+    p.add_argument("--matrix", default=None, help="JSON file with a list of configuration objects")
+    p.add_argument("--repeats", type=int, default=1, help="Runs per lesson per configuration")
+    p.add_argument("--json-out", default=None, help="Write full results as JSON")
+    args = p.parse_args(argv)
+
+    configs = [parse_config(s) for s in args.config]
+    if args.matrix:
+        with open(args.matrix, "r", encoding="utf-8") as f:
+            configs += json.load(f)
+    if not configs:
+        p.error("give at least one --config or --matrix")
+
+    golden = load_golden(args.lessons, args.golden)
+    if not golden:
+        print(f"No lessons in {args.lessons} have a matching report in {args.golden}", file=sys.stderr)
+        return 1
+    print(f"Golden set: {len(golden)} lessons", file=sys.stderr)
+
+    results = []
+    for cfg in configs:
+        print(f"→ {cfg.get('name', cfg)}", file=sys.stderr)
+        t0 = time.perf_counter()
+        res = run_config(cfg, golden, repeats=args.repeats)
+        res["wall_s"] = time.perf_counter() - t0
+        results.append(res)
+        for fail in res["failures"]:
+            print(f"   failed: {fail}", file=sys.stderr)
+
+    print(format_table(results))
+    print()
+    print(format_per_criterion(results))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(json_safe(results), f, ensure_ascii=False, indent=2, allow_nan=False)
+        print(f"Saved results → {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+scheduling.py
+
+Priority lanes and deadline-aware scheduling for ULPR backend requests.
+
+What it does
+------------
+- Lanes: work is queued per priority class. The defaults are
+  "interactive" (a teacher waiting on one evaluation; weight 4, 30 s
+  target) and "bulk" (nightly re-scores; weight 1, 6 h target).
+- Every job has a deadline: the caller's, or submit time + its class
+  target. Within a class, jobs are served earliest deadline first, which is
+  arrival order for jobs without their own deadline.
+- Between classes, free slots are shared by weight (stride scheduling).
+  While both lanes are backlogged, interactive gets 4 of every 5 dispatches
+  and bulk the fifth. So interactive jobs overtake queued bulk work
+  without starving it. A lane that was idle doesn't bank credit.
+- Deadline override: a job that will miss its deadline unless it starts
+  within about one service time (the class's recent mean) goes first,
+  whatever its class. Jobs that can no longer make it get no override, so
+  they don't push savable ones past their deadlines too.
+- metrics(): per class queue depth, running, dispatched/completed, deadline
+  misses, wait time p50/p95/max over recent jobs, age of the oldest queued
+  job and mean service time.
+
+Lanes is the policy plus its bookkeeping and is not thread-safe; the
+evaluation service drives it from its event loop, in front of the workers
+that call the backend.
+
+Usage
+-----
+python evaluator_service.py --backend ollama --model llama3.1 --concurrency 2
+curl -X POST localhost:8765/jobs -d '{"lesson": "...", "priority": "bulk"}'
+curl -X POST localhost:8765/jobs -d '{"lesson": "...", "deadline_s": 20}'   # interactive by default
+curl localhost:8765/health   # "lanes": depth, waits, misses per class
+"""
+from __future__ import annotations
+
+import dataclasses
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from lesson_plan_evaluator import percentile
+
+
+@dataclasses.dataclass
+class Lane:
+    weight: float = 1.0  # share of dispatches while several lanes are backlogged
+    target_s: float = 3600.0  # deadline for jobs that don't bring their own
+
+
+DEFAULT_LANES: Dict[str, Lane] = {
+    "interactive": Lane(weight=4.0, target_s=30.0),
+    "bulk": Lane(weight=1.0, target_s=6 * 3600.0),
+}
+
+
+@dataclasses.dataclass
+class Ticket:
+    priority: str
+    deadline: float  # time.time() seconds
+    submitted_at: float
+    item: Any = None
+    started_at: Optional[float] = None
+
+
+class _LaneState:
+    def __init__(self, lane: Lane, window: int):
+        self.lane = lane
+        self.heap: List[Tuple[float, int, Ticket]] = []
+        self.passed = 0.0  # stride "pass": advanced by 1/weight per dispatch
+        self.running = 0
+        self.dispatched = 0
+        self.completed = 0
+        self.missed = 0
+        self.waits: Deque[float] = deque(maxlen=window)
+        self.service_ewma: Optional[float] = None
+
+
+class Lanes:
+    """Per-class EDF queues with weighted fair sharing between classes."""
+
+    def __init__(self, lanes: Optional[Dict[str, Lane]] = None, window: int = 500, smoothing: float = 0.2):
+        self.lanes = {name: _LaneState(lane, window) for name, lane in (lanes or DEFAULT_LANES).items()}
+        self.smoothing = smoothing
+        self._seq = itertools.count()
+        self._vtime = 0.0  # pass of the last dispatch
+
+    def __len__(self) -> int:
+        return sum(len(s.heap) for s in self.lanes.values())
+
+    def depth(self, priority: str) -> int:
+        return len(self.lanes[priority].heap)
+
+    def push(self, item: Any, priority: str, deadline_s: Optional[float] = None, now: Optional[float] = None) -> Ticket:
+        """Queue `item`; `deadline_s` is relative to now (default: the class target)."""
+        if priority not in self.lanes:
+            raise ValueError(f"unknown priority {priority!r}; expected one of {', '.join(self.lanes)}")
+        state = self.lanes[priority]
+        now = time.time() if now is None else now
+        if not state.heap:
+            # A lane joining starts level with the last dispatch instead of
+            # spending the credit it built up while idle.
+            state.passed = max(state.passed, self._vtime)
+        ticket = Ticket(priority, now + (state.lane.target_s if deadline_s is None else deadline_s), now, item)
+        heapq.heappush(state.heap, (ticket.deadline, next(self._seq), ticket))
+        return ticket
+
+    def _urgent(self, now: float) -> Optional[_LaneState]:
+        best = None
+        for state in self.lanes.values():
+            if not state.heap:
+                continue
+            deadline = state.heap[0][0]
+            service = state.service_ewma or 0.0
+            slack = deadline - now - service
+            if 0 <= slack < service and (best is None or deadline < best.heap[0][0]):
+                best = state
+        return best
+
+    def pop(self, now: Optional[float] = None) -> Optional[Ticket]:
+        """Next ticket to run (marked started), or None when empty."""
+        now = time.time() if now is None else now
+        live = [s for s in self.lanes.values() if s.heap]
+        if not live:
+            return None
+        state = self._urgent(now) or min(live, key=lambda s: s.passed)
+        _, _, ticket = heapq.heappop(state.heap)
+        self._vtime = state.passed
+        state.passed += 1.0 / state.lane.weight
+        ticket.started_at = now
+        state.running += 1
+        state.dispatched += 1
+        state.waits.append(now - ticket.submitted_at)
+        return ticket
+
+    def done(self, ticket: Ticket, now: Optional[float] = None):
+        """Record the end of a started ticket (success or failure)."""
+        now = time.time() if now is None else now
+        state = self.lanes[ticket.priority]
+        state.running -= 1
+        state.completed += 1
+        if now > ticket.deadline:
+            state.missed += 1
+        service = now - (ticket.started_at or now)
+        if state.service_ewma is None:
+            state.service_ewma = service
+        else:
+            state.service_ewma = (1 - self.smoothing) * state.service_ewma + self.smoothing * service
+
+    def metrics(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        out = {}
+        for name, s in self.lanes.items():
+            waits = list(s.waits)
+            out[name] = {
+                "queued": len(s.heap),
+                "running": s.running,
+                "dispatched": s.dispatched,
+                "completed": s.completed,
+                "deadline_missed": s.missed,
+                "wait_p50_s": round(percentile(waits, 50), 3) if waits else None,
+                "wait_p95_s": round(percentile(waits, 95), 3) if waits else None,
+                "wait_max_s": round(max(waits), 3) if waits else None,
+                "oldest_queued_s": round(now - min(t.submitted_at for _, _, t in s.heap), 3) if s.heap else 0.0,
+                "service_s": None if s.service_ewma is None else round(s.service_ewma, 3),
+                "weight": s.lane.weight,
+                "target_s": s.lane.target_s,
+            }
+        return out
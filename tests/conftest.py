@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "guardrails_verification")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+LESSONS = os.path.join(ROOT, "lessons")
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    """Keep rule/history/ingest caches out of the user's home directory."""
+    monkeypatch.setenv("ULPR_CACHE_DIR", str(tmp_path / "cache"))
+
+
+def lesson(name: str) -> str:
+    with open(os.path.join(LESSONS, f"lesson_plan({name}).txt"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def model_report(band: int = 2, codes=None) -> dict:
+    from lesson_plan_evaluator import ULPR_CRITERIA
+
+    codes = codes or [c.code for c in ULPR_CRITERIA]
+    return {"criteria": {code: {"band": band, "evidence": "e", "notes": ""} for code in codes}, "global_notes": ""}
+
+
+class FakeBackend:
+    """LLMBackend stand-in: answers every prompt with `respond(system, user)` and records the calls."""
+
+    model = "fake"
+
+    def __init__(self, respond=None):
+        import json
+
+        self.respond = respond or (lambda system, user: json.dumps(model_report()))
+        self.calls = []
+
+    def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls.append((system_prompt, user_prompt))
+        return self.respond(system_prompt, user_prompt)
+
+    def last_usage(self):
+        return None
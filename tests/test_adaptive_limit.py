@@ -0,0 +1,65 @@
+import pytest
+
+from adaptive_limit import AdaptiveLimiter, LimitedBackend
+from conftest import FakeBackend
+
+
+def _run(limiter, latency, n, ok=True):
+    for _ in range(n):
+        assert limiter.acquire(timeout=0)
+        limiter.release(latency, ok=ok)
+
+
+def test_steady_latency_grows_the_limit_about_one_per_round():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=32)
+    _run(limiter, 1.0, 2)  # one round at limit 2
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    _run(limiter, 1.0, 200)
+    assert limiter.limit > 10
+
+
+def test_limit_is_capped_and_floored():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4)
+    _run(limiter, 1.0, 100)
+    assert limiter.limit == 4
+    _run(limiter, 1.0, 200, ok=False)
+    assert limiter.limit == limiter.min_limit
+
+
+def test_latency_climb_cuts_the_limit_once_per_round():
+    limiter = AdaptiveLimiter(initial_limit=8, backoff=0.5, smoothing=1.0)
+    _run(limiter, 1.0, 8)
+    before = limiter.limit
+    _run(limiter, 3.0, 1)  # ewma 3 > 1.5 × baseline 1
+    assert limiter.limit == pytest.approx(before * 0.5)
+    _run(limiter, 3.0, 1)  # same round: no second cut
+    assert limiter.limit == pytest.approx(before * 0.5)
+
+
+def test_errors_cut_harder_than_latency():
+    limiter = AdaptiveLimiter(initial_limit=8, error_backoff=0.25)
+    _run(limiter, 1.0, 8)
+    before = limiter.limit
+    _run(limiter, 0.0, 1, ok=False)
+    assert limiter.limit == pytest.approx(before * 0.25)
+    assert limiter.metrics()["errors"] == 1
+
+
+def test_acquire_waits_at_the_limit():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    assert limiter.acquire(timeout=0)
+    assert not limiter.acquire(timeout=0.01)
+    limiter.release(1.0)
+    assert limiter.acquire(timeout=0)
+
+
+def test_limited_backend_releases_on_errors():
+    def boom(system, user):
+        raise RuntimeError("backend down")
+
+    backend = LimitedBackend(FakeBackend(boom), AdaptiveLimiter(initial_limit=1))
+    with pytest.raises(RuntimeError):
+        backend.generate("s", "u")
+    m = backend.metrics()
+    assert m["inflight"] == 0 and m["errors"] == 1
+    assert LimitedBackend(FakeBackend()).generate("s", "u").startswith("{")
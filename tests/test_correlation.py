@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from correlation import correlation_intervals, correlation_matrix
+
+
+def _bands(n=40, seed=1):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 5, n)
+    return pd.DataFrame({
+        "A1": a,
+        "A2": np.clip(a + rng.integers(-1, 2, n), 1, 4),
+        "B1": rng.integers(1, 5, n),
+        "B2": np.full(n, 3),
+    }).astype(float)
+
+
+def test_missing_values_are_dropped_per_pair():
+    df = _bands()
+    df.loc[[0, 5], "A2"] = np.nan
+    ci = correlation_intervals(df, n_resamples=200).set_index(["criterion_a", "criterion_b"])
+    assert ci.loc[("A1", "A2"), "n"] == 38
+    assert ci.loc[("A1", "B1"), "n"] == 40
+    assert np.isclose(ci.loc[("A1", "A2"), "r"], correlation_matrix(df).loc["A1", "A2"])
+    for pair in [("A1", "A2"), ("A2", "B1"), ("A1", "B1")]:
+        assert ci.loc[pair, ["boot_lo", "boot_hi", "perm_p", "null_lo", "null_hi"]].notna().all()
+
+
+def test_pair_order_matches_complete_data():
+    df = _bands()
+    gappy = df.copy()
+    gappy.loc[3, "B1"] = np.nan
+    full = correlation_intervals(df, n_resamples=50)
+    part = correlation_intervals(gappy, n_resamples=50)
+    assert list(zip(full.criterion_a, full.criterion_b)) == list(zip(part.criterion_a, part.criterion_b))
+
+
+def test_constant_column_gives_nan_not_inf():
+    df = _bands()
+    df.loc[0, "A1"] = np.nan
+    ci = correlation_intervals(df, n_resamples=50)
+    const = ci[(ci.criterion_a == "B2") | (ci.criterion_b == "B2")]
+    assert const["r"].isna().all()
+    assert not np.isinf(ci.select_dtypes("number").to_numpy()).any()
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from conftest import FakeBackend, lesson
+from evaluator_service import EvaluationService, QueueFullError
+
+
+def test_submit_before_start_is_a_clear_error():
+    service = EvaluationService(FakeBackend())
+    with pytest.raises(RuntimeError, match="not started"):
+        service.submit("lesson")
+
+
+def test_jobs_run_and_full_lanes_reject():
+    async def run():
+        service = EvaluationService(FakeBackend(), concurrency=1, lane_queue_sizes={"bulk": 1})
+        await service.start()
+        try:
+            job = service.submit(lesson("brisk"))
+            service.submit("x", priority="bulk")
+            with pytest.raises(QueueFullError):
+                service.submit("y", priority="bulk")
+            while job.status in ("queued", "running"):
+                await asyncio.sleep(0.01)
+            return job
+        finally:
+            await service.stop()
+
+    job = asyncio.run(run())
+    assert job.status == "done"
+    assert "lesson_facts" not in job.result["model_json"]
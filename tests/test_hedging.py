@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from conftest import FakeBackend
+from hedging import HedgedBackend
+
+
+def _scripted(*script):
+    """FakeBackend whose n-th call sleeps script[n][0] s, then returns or raises script[n][1]."""
+    lock = threading.Lock()
+    steps = list(script)
+
+    def respond(system, user):
+        with lock:
+            delay, outcome = steps.pop(0) if steps else (0.0, "ok")
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return FakeBackend(respond)
+
+
+def _warm(hedged, n=3):
+    for _ in range(n):
+        assert hedged.generate("s", "u") == "ok"
+
+
+def test_no_hedging_while_warming_up():
+    hedged = HedgedBackend(_scripted((0.05, "slow")), min_samples=3)
+    assert hedged.hedge_delay() is None
+    assert hedged.generate("s", "u") == "slow"
+    assert hedged.metrics()["hedges"] == 0
+
+
+def test_stalled_request_is_hedged_and_the_duplicate_wins():
+    backend = _scripted((0.0, "ok"), (0.0, "ok"), (0.0, "ok"), (1.0, "stalled"), (0.0, "hedge"))
+    hedged = HedgedBackend(backend, min_samples=3, max_hedge_rate=1.0, min_delay=0.05)
+    _warm(hedged)
+    t0 = time.perf_counter()
+    assert hedged.generate("s", "u") == "hedge"
+    assert time.perf_counter() - t0 < 0.5
+    m = hedged.metrics()
+    assert m["hedges"] == 1 and m["hedge_wins"] == 1 and len(backend.calls) == 5
+
+
+def test_hedge_rate_cap():
+    backend = _scripted((0.0, "ok"), (0.0, "ok"), (0.0, "ok"), (0.2, "primary"))
+    hedged = HedgedBackend(backend, min_samples=3, max_hedge_rate=0.0, min_delay=0.05)
+    _warm(hedged)
+    assert hedged.generate("s", "u") == "primary"
+    assert hedged.metrics()["hedges"] == 0 and len(backend.calls) == 4
+
+
+def test_failed_winner_does_not_turn_success_into_error():
+    backend = _scripted((0.0, "ok"), (0.0, "ok"), (0.0, "ok"), (0.3, "primary"), (0.0, RuntimeError("hedge failed")))
+    hedged = HedgedBackend(backend, min_samples=3, max_hedge_rate=1.0, min_delay=0.05)
+    _warm(hedged)
+    assert hedged.generate("s", "u") == "primary"
+
+
+def test_both_failing_raises():
+    backend = _scripted(
+        (0.0, "ok"), (0.0, "ok"), (0.0, "ok"), (0.2, RuntimeError("primary failed")), (0.0, RuntimeError("hedge failed"))
+    )
+    hedged = HedgedBackend(backend, min_samples=3, max_hedge_rate=1.0, min_delay=0.05)
+    _warm(hedged)
+    with pytest.raises(RuntimeError):
+        hedged.generate("s", "u")
+
+
+def _stall_first_call(prefix="slow", stall=0.4):
+    """FakeBackend: the first call for a `prefix…` prompt stalls; records the thread each call ran on."""
+    lock = threading.Lock()
+    seen = {}
+    threads = []
+
+    def respond(system, user):
+        with lock:
+            seen[user] = n = seen.get(user, 0) + 1
+            threads.append(threading.current_thread().name)
+        if user.startswith(prefix) and n == 1:
+            time.sleep(stall)
+        return f"{user}#{n}"
+
+    backend = FakeBackend(respond)
+    backend.threads = threads
+    return backend
+
+
+def _concurrently(hedged, prompts):
+    results = {}
+    threads = [threading.Thread(target=lambda u=u: results.__setitem__(u, hedged.generate("s", u))) for u in prompts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_duplicates_run_on_their_own_pool():
+    backend = _stall_first_call()
+    hedged = HedgedBackend(backend, min_samples=3, max_hedge_rate=1.0, min_delay=0.05)
+    for i in range(3):
+        hedged.generate("s", f"warm{i}")
+    assert hedged.generate("s", "slow") == "slow#2"
+    assert backend.threads[-2].startswith("ulpr-primary") and backend.threads[-1].startswith("ulpr-hedge")
+
+
+def test_outstanding_hedges_are_capped_until_the_loser_finishes():
+    backend = _stall_first_call()
+    hedged = HedgedBackend(backend, min_samples=3, max_hedge_rate=1.0, min_delay=0.05, max_hedges=1)
+    for i in range(3):
+        hedged.generate("s", f"warm{i}")
+    results = _concurrently(hedged, ["slow-a", "slow-b"])
+    # Only one call got the hedge slot; the other waited for its own stalled primary.
+    assert sorted(r[-2:] for r in results.values()) == ["#1", "#2"]
+    m = hedged.metrics()
+    assert m["hedges"] == 1
+    time.sleep(0.5)
+    assert hedged.metrics()["hedges_in_flight"] == 0
+
+
+def test_concurrent_callers_respect_the_hedge_rate():
+    backend = _stall_first_call(stall=0.2)
+    hedged = HedgedBackend(backend, min_samples=3, max_hedge_rate=0.25, min_delay=0.05, max_hedges=16)
+    for i in range(4):
+        hedged.generate("s", f"warm{i}")
+    _concurrently(hedged, [f"slow-{i}" for i in range(12)])
+    m = hedged.metrics()
+    assert 0 < m["hedges"] <= 0.25 * m["requests"]
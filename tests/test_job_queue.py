@@ -0,0 +1,138 @@
+import json
+import os
+import time
+
+from conftest import FakeBackend, lesson, model_report
+from job_queue import JobQueue, LeaseKeeper, lesson_paths, main, run_worker
+
+
+def _queue(tmp_path, n=1, max_attempts=3):
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    queue.enqueue([str(tmp_path / f"lesson_{i}.txt") for i in range(n)], max_attempts=max_attempts)
+    return queue
+
+
+def test_expired_lease_is_reclaimed_and_the_old_holder_cannot_finish(tmp_path):
+    queue = _queue(tmp_path)
+    job = queue.claim("w1", lease_seconds=-1)  # already expired
+    again = queue.claim("w2", lease_seconds=600)
+    assert again.id == job.id and again.attempts == 2
+    assert not queue.complete(job.id, "w1", 50.0)
+    assert not queue.fail(job.id, "w1", "late")
+    assert not queue.renew(job.id, "w1")
+    assert queue.complete(job.id, "w2", 50.0)
+    assert queue.counts()["done"] == 1
+
+
+def test_live_lease_is_not_reclaimed(tmp_path):
+    queue = _queue(tmp_path)
+    queue.claim("w1", lease_seconds=600)
+    assert queue.claim("w2") is None
+
+
+def test_expired_claim_on_last_attempt_becomes_failed(tmp_path):
+    queue = _queue(tmp_path, max_attempts=1)
+    queue.claim("w1", lease_seconds=-1)
+    assert queue.claim("w2") is None
+    assert queue.counts()["failed"] == 1
+
+
+def test_fail_retries_until_max_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    for _ in range(2):
+        job = queue.claim("w1")
+        assert queue.fail(job.id, "w1", "boom")
+    assert queue.claim("w1") is None
+    assert queue.failures()[0][1:] == (2, "boom")
+
+
+def test_release_gives_the_attempt_back(tmp_path):
+    queue = _queue(tmp_path)
+    job = queue.claim("w1")
+    assert not queue.release(job.id, "w2")
+    assert queue.release(job.id, "w1")
+    assert queue.claim("w2").attempts == 1
+
+
+def test_lease_keeper_renews_a_long_running_job(tmp_path):
+    queue = _queue(tmp_path)
+    job = queue.claim("w1", lease_seconds=0.3)
+    with LeaseKeeper(queue.db_path, job.id, "w1", lease_seconds=0.3):
+        time.sleep(0.6)
+        assert queue.claim("w2", lease_seconds=0.3) is None
+    assert queue.complete(job.id, "w1")
+
+
+def test_run_worker_drains_the_queue(tmp_path):
+    path = tmp_path / "lesson_plan(brisk).txt"
+    path.write_text(lesson("brisk"), encoding="utf-8")
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    queue.enqueue([str(path)])
+    backend = FakeBackend()
+    assert run_worker(queue, backend, str(tmp_path / "out")) == 1
+    assert queue.counts()["done"] == 1
+    calls = len(backend.calls)
+    assert run_worker(queue, backend, str(tmp_path / "out")) == 0  # done jobs are never re-evaluated
+    assert len(backend.calls) == calls
+
+
+class _ListSink:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+def _one_lesson_queue(tmp_path):
+    path = tmp_path / "lesson_plan(brisk).txt"
+    path.write_text(lesson("brisk"), encoding="utf-8")
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    queue.enqueue([str(path)])
+    return queue
+
+
+def test_run_worker_writes_the_sink_once_the_job_is_done(tmp_path):
+    queue = _one_lesson_queue(tmp_path)
+    sink = _ListSink()
+    assert run_worker(queue, FakeBackend(), str(tmp_path / "out"), sink=sink) == 1
+    assert [r["lesson"] for r in sink.records] == ["brisk"]
+    assert (tmp_path / "out" / "report(brisk).json").exists()
+
+
+def test_worker_that_lost_its_lease_writes_nothing(tmp_path):
+    queue = _one_lesson_queue(tmp_path)
+    other = JobQueue(queue.db_path)
+
+    def slow_worker_loses_the_job(system, user):
+        # The lease expires mid-generation and another worker takes the job over.
+        other.conn.execute("UPDATE jobs SET lease_until=0")
+        assert other.claim("w2") is not None
+        return json.dumps(model_report())
+
+    sink = _ListSink()
+    assert run_worker(queue, FakeBackend(slow_worker_loses_the_job), str(tmp_path / "out"), sink=sink) == 0
+    assert sink.records == []
+    assert not os.path.exists(tmp_path / "out" / "report(brisk).json")
+    assert queue.counts()["running"] == 1  # still w2's job
+    other.close()
+
+
+def test_lesson_paths_skips_missing_and_unsupported_files(tmp_path, capsys):
+    (tmp_path / "a.txt").write_text("A", encoding="utf-8")
+    (tmp_path / "notes.rtf").write_text("R", encoding="utf-8")
+    sub = tmp_path / "dir"
+    sub.mkdir()
+    (sub / "b.md").write_text("B", encoding="utf-8")
+    paths = lesson_paths([str(tmp_path / "a.txt"), str(tmp_path / "missing.txt"), str(tmp_path / "notes.rtf"), str(sub)])
+    assert paths == [str(tmp_path / "a.txt"), str(sub / "b.md")]
+    err = capsys.readouterr().err
+    assert "missing.txt: no such file" in err and "notes.rtf: unsupported" in err
+
+
+def test_enqueue_command_ignores_missing_paths(tmp_path, capsys):
+    (tmp_path / "a.txt").write_text("A", encoding="utf-8")
+    db = str(tmp_path / "q.sqlite")
+    assert main(["enqueue", "--db", db, str(tmp_path / "a.txt"), str(tmp_path / "typo.txt")]) == 0
+    assert "Enqueued 1 new job(s) (0 already known)" in capsys.readouterr().out
+    assert JobQueue(db).counts()["pending"] == 1
@@ -0,0 +1,43 @@
+import os
+import zipfile
+
+from conftest import ROOT
+from lesson_ingest import extract_text
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+
+
+def _box(text):
+    return f'<w:txbxContent><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:txbxContent>'
+
+
+def _docx(tmp_path, body):
+    path = tmp_path / "lesson.docx"
+    xml = f'<?xml version="1.0"?><w:document xmlns:w="{W}" xmlns:mc="{MC}"><w:body>{body}</w:body></w:document>'
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", xml)
+    return str(path)
+
+
+def test_text_box_is_extracted_once_after_its_anchor(tmp_path):
+    body = (
+        "<w:p><w:r><w:t>Objectives</w:t></w:r>"
+        "<w:r><mc:AlternateContent>"
+        f"<mc:Choice><w:drawing>{_box('Warm-up: 5 min')}</w:drawing></mc:Choice>"
+        f"<mc:Fallback><w:pict>{_box('Warm-up: 5 min')}</w:pict></mc:Fallback>"
+        "</mc:AlternateContent></w:r></w:p>"
+        "<w:p><w:r><w:t>Closure</w:t><w:tab/><w:t>5 min</w:t></w:r></w:p>"
+    )
+    assert extract_text(_docx(tmp_path, body)) == "Objectives\nWarm-up: 5 min\nClosure\t5 min"
+
+
+def test_table_cells_become_lines(tmp_path):
+    cell = "<w:tc><w:p><w:r><w:t>{}</w:t></w:r></w:p></w:tc>"
+    body = f"<w:tbl><w:tr>{cell.format('Time')}{cell.format('Activity')}</w:tr></w:tbl>"
+    assert extract_text(_docx(tmp_path, body)) == "Time\nActivity"
+
+
+def test_sample_docx_extracts():
+    text = extract_text(os.path.join(ROOT, "ai unveiled- navigating the future with intelligence.docx"))
+    assert len(text) > 1000
@@ -0,0 +1,74 @@
+import json
+
+from conftest import FakeBackend, lesson, model_report
+from lesson_packing import PackConfig, build_packed_prompt, evaluate_pack, packed_prompt_prefix, plan_packs
+from lesson_plan_evaluator import ULPR_CRITERIA, estimate_tokens, raw_model_json
+
+SHORT = {f"s{i}": f"Lesson {i}: fractions warm-up (5 min), pair practice (20 min), exit ticket (5 min)." for i in range(5)}
+
+
+def test_short_lessons_are_packed_and_long_ones_run_alone():
+    lessons = {"long": lesson("brisk"), **SHORT}
+    packs, singles = plan_packs(lessons, PackConfig(max_lesson_tokens=400, max_lessons=3, budget_tokens=20000))
+    assert "long" in singles
+    assert all(2 <= len(p) <= 3 for p in packs)
+    packed = [label for p in packs for label in p]
+    assert sorted(packed + singles) == sorted(lessons)
+    order = list(lessons)
+    assert all(p == sorted(p, key=order.index) for p in packs)
+
+
+def test_budget_limits_the_pack_size():
+    config = PackConfig(max_lessons=4)
+    per_lesson = max(estimate_tokens(text) for text in SHORT.values()) + 8 + config.output_tokens
+    config.budget_tokens = estimate_tokens(packed_prompt_prefix(2)) + 2 * per_lesson  # room for two, not three
+    packs, _ = plan_packs(SHORT, config)
+    assert packs and all(len(p) == 2 for p in packs)
+
+
+def test_a_lone_short_lesson_is_not_packed():
+    packs, singles = plan_packs({"only": SHORT["s0"]}, PackConfig())
+    assert packs == [] and singles == ["only"]
+
+
+def test_packed_prompt_keeps_each_lesson_in_its_own_block():
+    prompt = build_packed_prompt([("L1", "alpha plan"), ("L2", "beta plan")], facts_blocks=["", "FACTS"])
+    assert prompt.index("=== Lesson L1 ===\nalpha plan") < prompt.index("=== Lesson L2 ===\nbeta plan\n\nFACTS")
+
+
+def _responder(packed_reports):
+    def respond(system, user):
+        if '"reports"' in system:
+            return json.dumps({"reports": packed_reports})
+        return json.dumps(model_report(band=4))
+    return respond
+
+
+def test_pack_is_split_back_into_per_lesson_results():
+    backend = FakeBackend(_responder({"L1": model_report(band=3), "L2": model_report(band=1)}))
+    timings = {}
+    out = evaluate_pack(backend, {"a": SHORT["s0"], "b": SHORT["s1"]}, timings=timings)
+    assert list(out) == ["a", "b"] and len(backend.calls) == 1
+    (json_a, ratings_a, _, _), (json_b, ratings_b, _, _) = out["a"], out["b"]
+    assert {r.raw_band for r in ratings_a.values()} == {3}
+    assert {r.raw_band for r in ratings_b.values()} == {1}
+    assert json_a["packing"]["lessons"] == ["a", "b"] and json_b["packing"]["key"] == "L2"
+    assert "packing" not in raw_model_json(json_a)
+    assert set(timings) == {"a", "b"}
+
+
+def test_incomplete_report_is_rescored_individually():
+    partial = model_report(band=3, codes=[c.code for c in ULPR_CRITERIA[:-1]])
+    backend = FakeBackend(_responder({"L1": model_report(band=3), "L2": partial}))
+    out = evaluate_pack(backend, {"a": SHORT["s0"], "b": SHORT["s1"]})
+    assert len(backend.calls) == 2
+    assert "fallback" not in out["a"][0]["packing"]
+    assert out["b"][0]["packing"]["fallback"] == f"missing {ULPR_CRITERIA[-1].code}"
+    assert {r.raw_band for r in out["b"][1].values()} == {4}
+
+
+def test_invalid_json_falls_back_for_every_lesson():
+    backend = FakeBackend(lambda system, user: "not json" if '"reports"' in system else json.dumps(model_report()))
+    out = evaluate_pack(backend, {"a": SHORT["s0"], "b": SHORT["s1"]})
+    assert len(backend.calls) == 3
+    assert all(result[0]["packing"]["fallback"] == "no report for this lesson" for result in out.values())
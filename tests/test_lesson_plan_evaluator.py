@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+
+import pytest
+
+from conftest import FakeBackend, lesson, model_report
+from lesson_plan_evaluator import (
+    PROMPT_MODES,
+    RUBRIC_VERSION,
+    SCORED_REPORT_SCHEMA,
+    ULPR_CRITERIA,
+    JsonlSink,
+    atomic_write_text,
+    build_scored_report,
+    build_user_prompt,
+    compare_prompt_modes,
+    estimate_tokens,
+    normalize_lesson_text,
+    prompt_prefix,
+    prompt_token_report,
+    rate_from_model,
+    totals,
+)
+
+
+def _capped_report():
+    raw = model_report(4, codes=["A1", "A2", "B1", "B2", "C1", "C2", "C3", "D1"])
+    raw["criteria"]["A2"]["band"] = 1
+    raw["global_notes"] = "solid plan"
+    return raw
+
+
+def test_scored_report_records_raw_and_capped_bands():
+    raw = _capped_report()
+    ratings, cap_notes = rate_from_model(raw)
+    report = build_scored_report(ratings, cap_notes, raw, lesson="x", meta={"backend": "fake", "timings": {"generate_s": 1.5}})
+
+    assert report["schema"] == SCORED_REPORT_SCHEMA and report["lesson"] == "x"
+    b2 = report["criteria"]["B2"]
+    assert (b2["raw_band"], b2["band"], b2["capped"]) == (4, 2, True)
+    assert b2["points"] == pytest.approx(b2["weight"] * 2 / 4)
+    assert report["criteria"]["B1"]["capped"] is False
+    assert report["cap_notes"] == cap_notes and len(cap_notes) == 2
+    assert report["missing_codes"] == [c.code for c in ULPR_CRITERIA if c.code not in raw["criteria"]]
+    assert report["total"] == pytest.approx(totals(ratings)[0], abs=0.01)
+    assert sum(report["by_section"].values()) == pytest.approx(report["total"], abs=0.05)
+    assert report["global_notes"] == "solid plan"
+    assert report["versions"] == {"rubric": RUBRIC_VERSION, "prompt": "full-1", "backend": "fake"}
+    assert report["timings"] == {"generate_s": 1.5}
+    json.dumps(report)
+
+
+def test_scored_report_criteria_load_like_model_json():
+    raw = _capped_report()
+    ratings, cap_notes = rate_from_model(raw)
+    report = build_scored_report(ratings, cap_notes, raw, prompt_mode="compact")
+    reloaded, notes = rate_from_model({"criteria": {k: {"band": v["band"]} for k, v in report["criteria"].items()}})
+    assert {k: r.band for k, r in reloaded.items()} == {k: r.band for k, r in ratings.items()}
+    assert notes == [] and report["versions"]["prompt"] == "compact-1"
+
+
+def test_scored_report_copies_derived_blocks():
+    raw = {**model_report(3), "focus": {"scope": "section", "codes": ["A1"]}, "lesson_facts": {"minutes": 50},
+           "packing": {"lessons": 2}}
+    ratings, cap_notes = rate_from_model(raw)
+    report = build_scored_report(ratings, cap_notes, raw)
+    assert report["focus"] == raw["focus"] and report["lesson_facts"] == {"minutes": 50}
+    assert {"focus_prompt", "pack_prompt"} <= set(report["versions"])
+    assert "revision" not in report
+
+    raw["packing"] = {"fallback": "too long"}
+    assert "pack_prompt" not in build_scored_report(ratings, cap_notes, raw)["versions"]
+
+
+def test_normalize_lesson_text():
+    text = "Title  \r\n\r\n\r\n\r\nWarm-up:\t\tquiz  now\n-----\n* * *\n\n\nGroup work |  roles\n"
+    assert normalize_lesson_text(text) == "Title\n\nWarm-up: quiz now\n\nGroup work | roles"
+    brisk = normalize_lesson_text(lesson("brisk"))
+    assert "  " not in brisk and "\n\n\n" not in brisk and "- National Geographic article" in brisk
+    assert normalize_lesson_text(brisk) == brisk
+
+
+class _Tokenizer:
+    def encode(self, text):
+        return text.split()
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("cat") == 1
+    assert estimate_tokens("photosynthesis") == 4  # ⌈14 / 4⌉ word pieces
+    assert estimate_tokens("Hi, you!") == 4
+    assert estimate_tokens("a\n    b") == 3
+    assert estimate_tokens("one two three", tokenizer=_Tokenizer()) == 3
+
+
+def test_compact_prompt_is_smaller():
+    report = prompt_token_report(lesson("brisk"))
+    assert set(report) == set(PROMPT_MODES)
+    assert report["compact"] < report["full"]
+
+
+def test_compare_prompt_modes():
+    answers = iter([model_report(3), model_report(3, codes=["A1", "A2"])])
+    backend = FakeBackend(lambda s, u: json.dumps(next(answers)))
+    result = compare_prompt_modes(backend, lesson("brisk"))
+    (_, full_user), (_, compact_user) = backend.calls
+    assert len(compact_user) < len(full_user)
+    assert set(result["generate_s"]) == set(PROMPT_MODES)
+    assert result["prompt_tokens"] == prompt_token_report(lesson("brisk"))
+    agreement = result["agreement"]
+    assert agreement["exact"] == pytest.approx(2 / len(ULPR_CRITERIA))
+    assert set(agreement["disagreements"]) == {c.code for c in ULPR_CRITERIA} - {"A1", "A2"}
+    assert agreement["total_delta"] < 0
+
+
+def test_atomic_write_text_replaces_in_one_step(tmp_path):
+    path = tmp_path / "report.md"
+    atomic_write_text(str(path), "first")
+    atomic_write_text(str(path), "second")
+    assert path.read_text(encoding="utf-8") == "second"
+    assert os.listdir(tmp_path) == ["report.md"]
+
+
+def test_atomic_write_text_keeps_the_old_file_on_failure(tmp_path, monkeypatch):
+    path = tmp_path / "report.md"
+    path.write_text("old", encoding="utf-8")
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        atomic_write_text(str(path), "new")
+    assert path.read_text(encoding="utf-8") == "old"
+    assert os.listdir(tmp_path) == ["report.md"]
+
+
+def test_jsonl_sink_appends_or_truncates(tmp_path):
+    path = str(tmp_path / "out" / "scored_reports.jsonl")
+    with JsonlSink(path) as sink:
+        sink.write({"lesson": "a"})
+    with JsonlSink(path) as sink:
+        sink.write({"lesson": "b"})
+        assert sink.count == 1
+    assert [json.loads(line)["lesson"] for line in open(path, encoding="utf-8")] == ["a", "b"]
+
+    with JsonlSink(path, truncate=True) as sink:
+        sink.write({"lesson": "c", "note": "ünïcode"})
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == '{"lesson": "c", "note": "ünïcode"}\n'
+    sink.close()  # closing twice is harmless
+
+
+def test_jsonl_sink_lines_stay_whole_across_threads(tmp_path):
+    path = str(tmp_path / "scored_reports.jsonl")
+    with JsonlSink(path, truncate=True) as sink:
+        threads = [
+            threading.Thread(target=lambda i=i: [sink.write({"t": i, "n": n, "pad": "x" * 2000}) for n in range(50)])
+            for i in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    records = [json.loads(line) for line in open(path, encoding="utf-8")]
+    assert len(records) == sink.count == 200
+
+
+def test_prompt_prefix_is_rendered_once_in_memory(tmp_path):
+    for mode in PROMPT_MODES:
+        assert prompt_prefix(mode) is prompt_prefix(mode)
+        assert build_user_prompt("Lesson body", mode).startswith(prompt_prefix(mode))
+    assert not (tmp_path / "cache").exists()
@@ -0,0 +1,93 @@
+import pytest
+
+from conftest import lesson
+from lesson_retrieval import LessonIndex, section_lesson, tokenize
+
+LESSON = """# Photosynthesis (50 minutes)
+
+## Learning Objectives
+Students will be able to explain how plants convert light energy into chemical energy, and to identify the inputs and outputs of photosynthesis in a labelled diagram.
+
+## Warm-up (5 minutes)
+Quick recall quiz: five retrieval questions reviewing last week's lesson on plant cells, answered on mini whiteboards.
+
+## Direct Instruction (10 minutes)
+Teacher demonstration with a worked example: model the light reactions on the board, then guided practice labelling the chloroplast diagram.
+
+## Group Activity (20 minutes)
+Students work in groups of three with roles (reader, recorder, presenter). Each group discusses the prompt, then shares and presents its findings to the class.
+
+## Exit Ticket (5 minutes)
+Check for understanding: each student answers two questions on an exit ticket; the teacher reviews answers and gives feedback next lesson.
+
+## Homework
+Review notes and complete a short cumulative quiz as follow-up before the next lesson.
+"""
+
+
+def test_sections_split_at_headings_and_merge_fragments():
+    sections = section_lesson(LESSON, min_chars=40)
+    assert [s.title for s in sections] == [
+        "Photosynthesis (50 minutes)",  # the bare title line merges into the objectives
+        "Warm-up (5 minutes)",
+        "Direct Instruction (10 minutes)",
+        "Group Activity (20 minutes)",
+        "Exit Ticket (5 minutes)",
+        "Homework",
+    ]
+    assert "Learning Objectives" in sections[0].text
+    assert [s.index for s in sections] == list(range(6))
+
+
+def test_sample_lesson_sections():
+    sections = section_lesson(lesson("brisk"))
+    titles = [s.title for s in sections]
+    assert titles[:3] == ["", "Location", "Lecture (15 minutes)"]
+    assert "Group Activity (25 minutes)" in titles and "Homework Reflection Paper" in titles
+    assert all(len(s.text) <= 1500 for s in sections)
+    assert all(len(s.text) >= 160 for s in sections)
+
+
+def test_long_sections_split_at_paragraphs():
+    body = "\n\n".join(f"Paragraph {i} " + "word " * 60 for i in range(6))
+    sections = section_lesson(f"Activity (30 minutes)\n{body}", max_chars=700)
+    assert len(sections) > 1
+    assert all(s.title == "Activity (30 minutes)" for s in sections)
+
+
+@pytest.mark.parametrize("code,title", [
+    ("A1", "Photosynthesis (50 minutes)"),
+    ("B3", "Group Activity (20 minutes)"),
+    ("C2", "Exit Ticket (5 minutes)"),
+    ("C3", "Homework"),
+    ("D1", "Direct Instruction (10 minutes)"),
+])
+def test_top_section_per_criterion(code, title):
+    index = LessonIndex(LESSON, min_chars=40)
+    r = index.retrieve(code, top_k=1, min_confidence=0)
+    assert r.fallback is None
+    assert [index.sections[i].title for i in r.sections] == [title]
+
+
+def test_confidence_grows_with_kept_sections_and_gates_fallback():
+    index = LessonIndex(LESSON, min_chars=40)
+    for code in ("A3", "C1", "C3"):
+        confidences = [index.retrieve(code, top_k=k, min_confidence=0, max_share=1.0).confidence for k in (1, 2, 3)]
+        assert all(b >= a - 1e-9 for a, b in zip(confidences, confidences[1:]))
+        assert 0 < confidences[0] and confidences[-1] <= 1 + 1e-9
+    low = index.retrieve("C3", top_k=1, min_confidence=0)
+    gated = index.retrieve("C3", top_k=1, min_confidence=low.confidence + 0.01)
+    assert gated.fallback == "low confidence" and gated.sections == list(range(len(index.sections)))
+
+
+def test_fallbacks_and_excerpt():
+    assert LessonIndex("One short paragraph.").retrieve("A1").fallback == "too few sections"
+    index = LessonIndex(LESSON, min_chars=40)
+    assert index.retrieve("C2", top_k=3, min_confidence=0, max_share=0.1).fallback == "excerpts ≈ full text"
+    excerpt = index.excerpt([1, 4])
+    assert excerpt.startswith("[…]") and excerpt.endswith("[…]") and excerpt.count("[…]") == 3
+    assert index.excerpt(list(range(len(index.sections)))) == LESSON
+
+
+def test_tokenize_stems_and_drops_stop_words():
+    assert tokenize("The students are presenting their presentations") == ["student", "present", "present"]
@@ -0,0 +1,66 @@
+import json
+
+from conftest import FakeBackend, lesson, model_report
+from lesson_plan_evaluator import PROMPT_VERSIONS, RUBRIC_VERSION, ULPR_CRITERIA
+from lesson_revision import plan_revision, reevaluate_lesson
+from lesson_timing import TIMING_CODES
+
+BRISK = lesson("brisk")
+
+
+def test_unchanged_and_whitespace_only_edits_affect_nothing():
+    for new in (BRISK, BRISK.replace("\n", "\n\n"), BRISK.replace(" ", "  ")):
+        plan = plan_revision(BRISK, new)
+        assert plan.affected == [] and plan.changes == [] and not plan.timing_changed
+
+
+def test_timing_edit_touches_the_timing_criteria():
+    plan = plan_revision(BRISK, BRISK.replace("Group Activity (25 minutes)", "Group Activity (30 minutes)"))
+    assert plan.timing_changed
+    assert set(TIMING_CODES) <= set(plan.affected)
+    assert plan.changes == [{"change": "modified", "title": "Group Activity (30 minutes)"}]
+
+
+def test_local_edit_affects_a_subset_in_rubric_order():
+    new = BRISK.replace("Location", "Location\nThe school library's media lab, booked for the full period.")
+    plan = plan_revision(BRISK, new)
+    codes = [c.code for c in ULPR_CRITERIA]
+    assert plan.affected and len(plan.affected) < len(codes)
+    assert plan.affected == [c for c in codes if c in plan.affected]
+    assert 0 < plan.changed_share < 0.5
+
+
+def _previous(text):
+    return {
+        "lesson_text": text,
+        "model_json": model_report(band=2),
+        "versions": {"rubric": RUBRIC_VERSION, "prompt": PROMPT_VERSIONS["full"], "model": "fake"},
+        "saved_at": "2026-01-01T00:00:00",
+    }
+
+
+def test_partial_reevaluation_rescores_only_affected_criteria():
+    new = BRISK.replace("Group Activity (25 minutes)", "Group Activity (30 minutes)")
+    backend = FakeBackend(lambda system, user: json.dumps(model_report(band=3)))
+    model_json, ratings, _, _ = reevaluate_lesson(backend, new, _previous(BRISK))
+    revision = model_json["revision"]
+    assert revision["mode"] == "partial" and len(backend.calls) == 1
+    assert revision["rescored"] == plan_revision(BRISK, new).affected
+    for code, r in ratings.items():
+        assert r.raw_band == (3 if code in revision["rescored"] else 2)
+
+
+def test_stale_or_missing_history_falls_back_to_full():
+    backend = FakeBackend()
+    model_json, *_ = reevaluate_lesson(backend, BRISK, None)
+    assert model_json["revision"]["mode"] == "full"
+    previous = _previous(BRISK)
+    previous["versions"]["model"] = "other"
+    model_json, *_ = reevaluate_lesson(backend, BRISK, previous)
+    assert model_json["revision"]["reason"].startswith("model changed")
+
+
+def test_unchanged_lesson_makes_no_model_call():
+    backend = FakeBackend()
+    model_json, *_ = reevaluate_lesson(backend, BRISK, _previous(BRISK))
+    assert model_json["revision"]["mode"] == "unchanged" and backend.calls == []
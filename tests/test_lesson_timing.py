@@ -0,0 +1,55 @@
+import json
+
+from conftest import FakeBackend, lesson
+from lesson_plan_evaluator import build_scored_report, evaluate_lesson, write_lesson_outputs
+from lesson_timing import format_prompt_block, parse_timing
+
+PLAN = """Lesson: Photosynthesis (50 minutes)
+
+Warm-up (5 min): quick quiz recalling last week's vocabulary.
+Lecture (15 min): teacher explains the light reactions.
+Group work (20 min): pairs discuss and build a diagram together.
+Exit ticket (10 min): students answer three questions.
+"""
+
+
+def test_parses_segments_minutes_and_shares():
+    facts = parse_timing(PLAN).to_dict()
+    assert [s["minutes"] for s in facts["segments"]] == [5, 15, 20, 10]
+    assert [s["start_min"] for s in facts["segments"]] == [0, 5, 20, 40]
+    assert facts["total_minutes"] == 50
+    assert facts["planned_minutes"] == 50
+    assert facts["over_plan_minutes"] == 0
+    assert abs(sum(facts["share_by_kind"].values()) - 1) < 0.01
+    assert facts["retrieval_count"] >= 2  # warm-up quiz and exit ticket
+
+
+def test_sample_lessons():
+    gpt5 = parse_timing(lesson("GPT-5")).to_dict()
+    assert gpt5["total_minutes"] == 95 and gpt5["planned_minutes"] == 90
+    assert [s["start_min"] for s in gpt5["segments"]] == [0, 5, 25, 50, 70, 85]
+    assert gpt5["retrieval_gaps_min"] == [85]
+
+    brisk = parse_timing(lesson("brisk")).to_dict()
+    assert brisk["total_minutes"] == 60 and brisk["over_plan_minutes"] == 0
+
+    assert parse_timing(lesson("eduaide")).segments == []
+    assert format_prompt_block(parse_timing(lesson("eduaide")).to_dict()) == ""
+
+
+def test_facts_are_reproducible():
+    text = lesson("GPT-5")
+    assert parse_timing(text).to_dict() == parse_timing(text).to_dict()
+
+
+def test_raw_json_keeps_facts_out_and_scored_report_keeps_them(tmp_path):
+    outputs = []
+    for run in ("a", "b"):
+        model_json, ratings, cap_notes, report_md = evaluate_lesson(FakeBackend(), lesson("GPT-5"), timing_facts=True)
+        scored = build_scored_report(ratings, cap_notes, model_json, lesson="GPT-5")
+        (tmp_path / run).mkdir()
+        write_lesson_outputs(str(tmp_path / run), "GPT-5", model_json, report_md, scored)
+        outputs.append((tmp_path / run / "report(GPT-5).json").read_text(encoding="utf-8"))
+        assert scored["lesson_facts"]["total_minutes"] == 95 and scored["lesson_facts"]["in_prompt"]
+    assert outputs[0] == outputs[1]
+    assert "lesson_facts" not in json.loads(outputs[0])
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from conftest import FakeBackend, lesson, model_report
+from lesson_plan_evaluator import rate_from_model
+from model_cascade import CascadePolicy, escalation_reasons, evaluate_cascade
+
+EVIDENCE = "students explain the physiological effects of spaceflight on the human body"
+
+
+def _report(band=3, codes=None, evidence=EVIDENCE, **bands):
+    report = model_report(band, codes)
+    for entry in report["criteria"].values():
+        entry["evidence"] = evidence
+    for code, b in bands.items():
+        report["criteria"][code]["band"] = b
+    return report
+
+
+def _reasons(report, policy=None):
+    ratings, _ = rate_from_model(report)
+    return escalation_reasons(ratings, lesson("brisk"), policy or CascadePolicy())
+
+
+def test_confident_result_is_not_escalated():
+    assert _reasons(_report()) == []
+
+
+def test_missing_codes():
+    [reason] = _reasons(_report(codes=["A1", "A2", "B1", "B2"]), CascadePolicy(borderline=()))
+    assert reason.startswith("missing codes: A3")
+
+
+def test_ungrounded_evidence():
+    [reason] = _reasons(_report(evidence="quantum chromodynamics lattice gauge theory"))
+    assert reason.startswith("ungrounded evidence: A1")
+    assert _reasons(_report(evidence="")) == [reason]
+
+
+def test_few_ungrounded_criteria_are_tolerated():
+    report = _report()
+    for code in ("A1", "B1", "C1"):
+        report["criteria"][code]["evidence"] = "quantum chromodynamics"
+    assert _reasons(report) == []
+
+
+@pytest.mark.parametrize("trigger,band,target", [("A2", 2, "B2"), ("A1", 1, "A2"), ("E3", 2, "E1"), ("C3", 1, "C2")])
+def test_near_cap(trigger, band, target):
+    reasons = _reasons(_report(band=4, **{trigger: band}), CascadePolicy(borderline=()))
+    assert any(r.startswith(f"near cap: {trigger}={band}") and target in r for r in reasons)
+
+
+def test_cap_trigger_without_affected_target_is_ignored():
+    assert _reasons(_report(band=2, A2=2, B2=2, C2=2), CascadePolicy(borderline=())) == []
+
+
+def test_borderline_total():
+    assert _reasons(_report(), CascadePolicy(borderline=(76.0,), margin=2.5)) == ["borderline total 75.0 (threshold 76)"]
+    assert _reasons(_report(), CascadePolicy(borderline=(80.0,), margin=2.5)) == []
+
+
+def _backend(report):
+    return FakeBackend(lambda s, u: json.dumps(report))
+
+
+def test_small_model_failure_escalates():
+    large = _backend(_report(band=4))
+    _, ratings, _, _, info = evaluate_cascade(FakeBackend(lambda s, u: "not json"), large, lesson("brisk"))
+    assert info["tier"] == "large" and info["reasons"][0].startswith("small model failed:")
+    assert len(large.calls) == 1 and ratings["A1"].band == 4
+
+
+def test_large_backend_is_built_only_on_escalation():
+    built = []
+
+    def factory():
+        built.append(_backend(_report(band=4)))
+        return built[-1]
+
+    _, ratings, _, _, info = evaluate_cascade(_backend(_report()), factory, lesson("brisk"))
+    assert (info["tier"], info["reasons"], info["large_s"], built) == ("small", [], 0.0, [])
+    assert ratings["A1"].band == 3
+
+    _, ratings, _, _, info = evaluate_cascade(_backend(_report(codes=["A1"])), factory, lesson("brisk"))
+    assert info["tier"] == "large" and len(built) == 1 and ratings["A1"].band == 4
@@ -0,0 +1,138 @@
+import json
+import types
+
+import pytest
+
+import lesson_plan_evaluator as lpe
+from lesson_plan_evaluator import OllamaBackend, _ollama_host_error
+
+A, B, C = "http://gpu1:11434/api/chat", "http://gpu2:11434/api/chat", "http://gpu3:11434/api/chat"
+
+
+class _RequestException(Exception):
+    def __init__(self, *args, response=None):
+        super().__init__(*args)
+        self.response = response
+
+
+class _Response:
+    def __init__(self, status=200, data=None):
+        self.status_code = status
+        self._data = data if data is not None else {"message": {"content": '{"ok": true}'}, "eval_count": 7}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise fake_requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        if isinstance(self._data, Exception):
+            raise self._data
+        return self._data
+
+
+fake_requests = types.SimpleNamespace(
+    RequestException=_RequestException,
+    ConnectionError=type("ConnectionError", (_RequestException,), {}),
+    Timeout=type("Timeout", (_RequestException,), {}),
+    HTTPError=type("HTTPError", (_RequestException,), {}),
+)
+
+
+@pytest.fixture
+def hosts(monkeypatch):
+    """Stubbed `requests`: hosts.outcomes maps url -> _Response or exception; hosts.posted logs the calls."""
+    stub = types.SimpleNamespace(outcomes={}, posted=[])
+
+    def post(url, json=None, timeout=None):
+        stub.posted.append(url)
+        outcome = stub.outcomes.get(url, _Response())
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(lpe, "requests", types.SimpleNamespace(**vars(fake_requests), post=post))
+    return stub
+
+
+def test_host_error_classification(hosts):
+    assert _ollama_host_error(fake_requests.ConnectionError("refused"))
+    assert _ollama_host_error(fake_requests.Timeout("slow"))
+    assert _ollama_host_error(fake_requests.HTTPError(response=_Response(503)))
+    assert _ollama_host_error(fake_requests.HTTPError(response=None))
+    assert not _ollama_host_error(fake_requests.HTTPError(response=_Response(404)))
+    assert not _ollama_host_error(json.JSONDecodeError("bad", "", 0))
+
+
+def test_urls_are_normalized(hosts):
+    backend = OllamaBackend(url="http://gpu1:11434/, http://gpu2:11434/api/chat ,")
+    assert [ep.url for ep in backend.endpoints] == [A, B]
+
+
+def test_pick_prefers_least_inflight(hosts):
+    backend = OllamaBackend(url=[A, B, C])
+    picked = [backend._pick([]).url for _ in range(4)]
+    assert picked == [A, B, C, A]
+    backend.endpoints[1].inflight = 0
+    assert backend._pick([]).url == B
+    assert backend._pick([backend.endpoints[2]]).url != C
+
+
+def test_cooldown_skips_a_down_host_until_it_expires(hosts, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lpe.time, "time", lambda: now[0])
+    backend = OllamaBackend(url=[A, B], cooldown=30)
+    a, b = backend.endpoints
+    with backend._lock:
+        backend._mark(a, False)
+    assert a.down_until == 1030.0
+    assert {backend._pick([]).url for _ in range(3)} == {B}
+    now[0] = 1031.0
+    assert backend._pick([]).url == A
+    # Repeated failures back off longer.
+    with backend._lock:
+        backend._mark(a, False)
+    assert a.down_until == 1031.0 + 60
+
+
+def test_all_hosts_down_still_tries_them(hosts):
+    backend = OllamaBackend(url=[A, B])
+    for ep in backend.endpoints:
+        with backend._lock:
+            backend._mark(ep, False)
+    assert backend._pick([]) is not None
+
+
+def test_failover_on_host_error(hosts):
+    hosts.outcomes[A] = fake_requests.ConnectionError("refused")
+    backend = OllamaBackend(url=[A, B])
+    assert backend.generate("s", "u") == '{"ok": true}'
+    assert hosts.posted == [A, B]
+    a, b = backend.endpoints
+    assert (a.healthy, a.failures, a.errors, a.inflight) == (False, 1, 1, 0)
+    assert (b.healthy, b.requests, b.inflight) == (True, 1, 0)
+    assert backend.last_usage()["endpoint"] == B
+    # A is cooling down: the next request goes straight to B.
+    backend.generate("s", "u")
+    assert hosts.posted == [A, B, B]
+
+
+def test_5xx_fails_over_but_4xx_is_raised(hosts):
+    hosts.outcomes[A] = _Response(503)
+    backend = OllamaBackend(url=[A, B])
+    backend.generate("s", "u")
+    assert hosts.posted == [A, B]
+
+    hosts.outcomes[B] = _Response(400)
+    with pytest.raises(fake_requests.HTTPError):
+        backend.generate("s", "u")
+    assert backend.endpoints[1].healthy
+
+
+def test_every_host_failing(hosts):
+    hosts.outcomes[A] = fake_requests.Timeout("slow")
+    hosts.outcomes[B] = _Response(500)
+    with pytest.raises(RuntimeError, match="All Ollama endpoints failed"):
+        OllamaBackend(url=[A, B]).generate("s", "u")
+    # A single host re-raises its own error.
+    with pytest.raises(fake_requests.Timeout):
+        OllamaBackend(url=A).generate("s", "u")
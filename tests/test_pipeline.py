@@ -0,0 +1,44 @@
+import os
+
+import pipeline
+from conftest import ROOT
+
+BANDS = os.path.join(ROOT, "guardrails_verification", "all_reports_bands.csv")
+
+
+def _sources(cache):
+    return {stage: source for stage, source, _ in cache.log}
+
+
+def test_unchanged_inputs_and_code_are_served_from_cache():
+    pipeline.run_pipeline(bands_csv=BANDS, resamples=50)
+    _, cache = pipeline.run_pipeline(bands_csv=BANDS, resamples=50)
+    assert set(_sources(cache).values()) == {"cache"}
+
+
+def test_editing_a_stage_module_recomputes_only_that_stage(monkeypatch):
+    pipeline.run_pipeline(bands_csv=BANDS, resamples=50)
+    real = pipeline.code_hash
+
+    def edited(*deps):
+        return real(*deps) + ("-edited" if "correlation" in deps else "")
+
+    monkeypatch.setattr(pipeline, "code_hash", edited)
+    _, cache = pipeline.run_pipeline(bands_csv=BANDS, resamples=50)
+    sources = _sources(cache)
+    assert sources["correlations"] == sources["correlation_ci"] == "computed"
+    assert sources["bands"] == sources["thresholds"] == sources["guardrailed"] == "cache"
+
+
+def test_code_hash_tracks_the_module_file(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "stage_mod.py").write_text("X = 1\n")
+    before = pipeline.code_hash("stage_mod")
+    (tmp_path / "stage_mod.py").write_text("X = 2\n")
+    assert pipeline.code_hash("stage_mod") != before
+
+
+def test_default_reports_dir_does_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    results, _ = pipeline.run_pipeline(resamples=0)
+    assert len(results["bands"]) == len(os.listdir(os.path.join(ROOT, "reports_json")))
@@ -0,0 +1,71 @@
+import json
+import threading
+
+import pytest
+
+import profiling
+from profiling import Profiler, span
+
+
+@pytest.fixture(params=[True, False], ids=["trace_memory", "time_only"])
+def profiler(request):
+    prof = Profiler(trace_memory=request.param).start()
+    yield prof
+    if profiling._ACTIVE is prof:
+        prof.stop()
+
+
+def test_spans_are_aggregated_per_stage(profiler):
+    for _ in range(3):
+        with span("outer"):
+            with span("inner"):
+                sum(range(1000))
+    profiler.stop()
+    stages = profiler.summary()["stages"]
+    assert list(stages) == ["inner", "outer"]
+    assert stages["inner"]["calls"] == stages["outer"]["calls"] == 3
+    assert stages["outer"]["total_s"] >= stages["inner"]["total_s"] > 0
+    assert "outer" in profiler.format_summary()
+
+
+def test_memory_figures_follow_the_mode(profiler):
+    with span("alloc"):
+        blob = [bytes(1000) for _ in range(2000)]
+    profiler.stop()
+    stage = profiler.summary()["stages"]["alloc"]
+    if profiler.trace_memory:
+        assert stage["net_bytes"] > 1_000_000 and stage["peak_bytes"] >= stage["net_bytes"]
+    else:
+        assert stage["net_bytes"] == stage["peak_bytes"] == 0
+        assert profiler.allocations == []
+    del blob
+
+
+def test_spans_from_threads_keep_separate_stacks(profiler):
+    def work():
+        with span("worker"):
+            with span("step"):
+                pass
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    profiler.stop()
+    assert profiler.summary()["stages"]["worker"]["calls"] == 4
+
+
+def test_span_is_free_when_inactive():
+    assert profiling._ACTIVE is None
+    assert span("x") is span("y")
+
+
+def test_write_summary(tmp_path):
+    prof = Profiler(trace_memory=False, cprofile=True).start()
+    with span("stage"):
+        pass
+    prof.stop()
+    prof.write(str(tmp_path / "run"))
+    assert json.loads((tmp_path / "run.json").read_text())["stages"]["stage"]["calls"] == 1
+    assert (tmp_path / "run.prof").exists()
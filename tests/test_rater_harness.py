@@ -0,0 +1,92 @@
+import json
+import math
+import os
+
+import pytest
+
+import rater_harness
+from conftest import LESSONS, ROOT, FakeBackend, model_report
+from rater_harness import CODES, agreement_stats, cohen_kappa, load_golden, parse_config
+
+
+def test_cohen_kappa():
+    assert cohen_kappa([1, 2, 3, 1], [1, 2, 3, 1]) == 1.0
+    # observed 0.5, expected 0.5 → no better than chance
+    assert cohen_kappa([1, 1, 2, 2], [1, 2, 1, 2]) == pytest.approx(0.0)
+    assert cohen_kappa([1, 2, 3, 3], [1, 2, 3, 2]) == pytest.approx((0.75 - 5 / 16) / (1 - 5 / 16))
+    assert math.isnan(cohen_kappa([], []))
+
+
+def test_cohen_kappa_degenerate_expected_agreement():
+    # Both raters use one and the same category: expected agreement is 1, no division by zero.
+    assert cohen_kappa([2, 2, 2], [2, 2, 2]) == 1.0
+    assert cohen_kappa([0], [0]) == 1.0
+
+
+def test_agreement_stats():
+    pairs = {"A1": [(1, 1), (2, 3), (3, 1)], "B2": [(2, 2)]}
+    stats = agreement_stats(pairs)
+    a1 = stats["per_criterion"]["A1"]
+    assert a1["exact"] == pytest.approx(1 / 3) and a1["adjacent"] == pytest.approx(2 / 3)
+    assert stats["per_criterion"]["B2"] == {"exact": 1.0, "adjacent": 1.0, "kappa": 1.0}
+    assert set(stats["per_criterion"]) == set(CODES)
+    assert math.isnan(stats["per_criterion"]["E1"]["kappa"])
+    assert stats["exact"] == pytest.approx(2 / 4) and stats["adjacent"] == pytest.approx(3 / 4)
+
+
+def test_load_golden_pairs_lessons_with_reports():
+    golden = load_golden(LESSONS, os.path.join(ROOT, "reports_json"))
+    labels = [label for label, _, _ in golden]
+    assert "brisk" in labels and "GPT-5" in labels
+    for label, path, ratings in golden:
+        assert os.path.basename(path) == f"lesson_plan({label}).txt"
+        assert set(ratings) == set(CODES)
+
+
+def test_load_golden_reads_scored_reports(tmp_path):
+    lessons = tmp_path / "lessons"
+    golden = tmp_path / "golden"
+    lessons.mkdir()
+    golden.mkdir()
+    (lessons / "lesson_plan(x).txt").write_text("Lesson body", encoding="utf-8")
+    (lessons / "lesson_plan(unrated).txt").write_text("Lesson body", encoding="utf-8")
+    scored = {"schema": "ulpr.scored_report/1", "criteria": {c: {"band": 3} for c in CODES}}
+    (golden / "report(x).scored.json").write_text(json.dumps(scored), encoding="utf-8")
+    [(label, _, ratings)] = load_golden(str(lessons), str(golden))
+    assert label == "x" and all(r.band == 3 for r in ratings.values())
+
+
+@pytest.mark.parametrize("spec,model,mode", [
+    ("ollama:llama3.1", "llama3.1", "full"),
+    ("ollama:llama3.1:compact", "llama3.1", "compact"),
+    ("ollama:qwen2.5:7b-instruct", "qwen2.5:7b-instruct", "full"),
+    ("ollama:qwen2.5:7b-instruct:compact", "qwen2.5:7b-instruct", "compact"),
+])
+def test_parse_config(spec, model, mode):
+    cfg = parse_config(spec)
+    assert cfg == {"name": spec, "backend": "ollama", "model": model, "prompt_mode": mode}
+
+
+def test_json_out_has_no_nan_tokens(tmp_path, monkeypatch):
+    real = rater_harness.run_config
+
+    def failing_run(cfg, golden, repeats=1, backend=None):
+        return real(cfg, golden, repeats, backend=FakeBackend(lambda s, u: "not json"))
+
+    monkeypatch.setattr(rater_harness, "run_config", failing_run)
+    out = tmp_path / "harness.json"
+    assert rater_harness.main([
+        "--lessons", LESSONS, "--golden", os.path.join(ROOT, "reports_json"),
+        "--config", "ollama:fake", "--json-out", str(out),
+    ]) == 0
+    text = out.read_text(encoding="utf-8")
+    assert "NaN" not in text
+    [result] = json.loads(text)
+    assert result["runs"] == 0 and result["latency_p50_s"] is None and result["agreement"]["kappa"] is None
+
+
+def test_run_config_with_fake_backend():
+    golden = load_golden(LESSONS, os.path.join(ROOT, "reports_json"))[:2]
+    res = rater_harness.run_config({"name": "fake"}, golden, backend=FakeBackend(lambda s, u: json.dumps(model_report(2))))
+    assert res["runs"] == 2 and not res["failures"]
+    assert 0.0 <= res["agreement"]["exact"] <= 1.0
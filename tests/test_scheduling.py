@@ -0,0 +1,62 @@
+from lesson_plan_evaluator import percentile
+from scheduling import Lane, Lanes
+
+LANES = {"interactive": Lane(weight=4, target_s=30), "bulk": Lane(weight=1, target_s=3600)}
+
+
+def _drain(lanes, now):
+    out = []
+    while len(lanes):
+        ticket = lanes.pop(now=now)
+        lanes.done(ticket, now=now)
+        out.append(ticket.item)
+    return out
+
+
+def test_fifo_within_a_lane():
+    lanes = Lanes(LANES)
+    for i in range(5):
+        lanes.push(i, "interactive", now=100.0 + i)
+    assert _drain(lanes, now=200.0) == [0, 1, 2, 3, 4]
+
+
+def test_backlogged_lanes_share_by_weight_without_starving_bulk():
+    lanes = Lanes(LANES)
+    for i in range(10):
+        lanes.push(f"b{i}", "bulk", now=0.0)
+    for i in range(8):
+        lanes.push(f"i{i}", "interactive", now=1.0)
+    order = _drain(lanes, now=2.0)
+    first_ten = order[:10]
+    assert sum(x.startswith("i") for x in first_ten) == 8
+    assert sum(x.startswith("b") for x in first_ten) == 2
+
+
+def test_job_about_to_miss_its_deadline_goes_first():
+    lanes = Lanes(LANES)
+    for state in lanes.lanes.values():
+        state.service_ewma = 10.0
+    lanes.push("lost", "interactive", deadline_s=5, now=1000.0)  # can't make it any more: no override
+    for i in range(3):
+        lanes.push(f"i{i}", "interactive", now=1000.0)
+    lanes.push("due", "bulk", deadline_s=15, now=1000.0)
+    assert lanes.pop(now=1000.0).item == "due"
+    assert lanes.pop(now=1000.0).item == "lost"
+
+
+def test_metrics_report_depth_waits_and_misses():
+    lanes = Lanes(LANES)
+    lanes.push("a", "interactive", deadline_s=1, now=0.0)
+    lanes.push("b", "bulk", now=0.0)
+    ticket = lanes.pop(now=2.0)
+    lanes.done(ticket, now=5.0)
+    m = lanes.metrics(now=5.0)
+    assert m["interactive"]["wait_max_s"] == 2.0
+    assert m["interactive"]["deadline_missed"] == 1
+    assert m["bulk"]["queued"] == 1 and m["bulk"]["oldest_queued_s"] == 5.0
+
+
+def test_percentile_interpolates():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([7], 95) == 7
+    assert percentile([], 50) != percentile([], 50)  # NaN
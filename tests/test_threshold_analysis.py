@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ROOT
+from threshold_analysis import conditional_summary, summary_cube
+
+BANDS = os.path.join(ROOT, "guardrails_verification", "all_reports_bands.csv")
+
+
+def _with_gaps():
+    df = pd.read_csv(BANDS, index_col="model")
+    df.iloc[0, df.columns.get_loc("B1")] = np.nan
+    df.iloc[3, df.columns.get_loc("E2")] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("focus,threshold", [("A2", 3), ("B1", 2), ("E2", 3), ("C1", 3)])
+def test_cube_matches_conditional_summary_with_missing_bands(focus, threshold):
+    df = _with_gaps()
+    cube = summary_cube(df, thresholds=(threshold,))
+    rows = cube[cube.focus == focus].set_index("criterion")
+    expected = conditional_summary(df, focus, threshold, verbose=False).drop(index=focus)
+    np.testing.assert_allclose(rows["mean_low"], expected.iloc[:, 0].loc[rows.index], equal_nan=True)
+    np.testing.assert_allclose(rows["mean_high"], expected.iloc[:, 1].loc[rows.index], equal_nan=True)
+    for criterion, row in rows.iterrows():
+        both = df[[focus, criterion]].dropna()
+        assert row.n_low == (both[focus] < threshold).sum()
+        assert row.n_high == (both[focus] >= threshold).sum()
+
+
+def test_missing_focus_band_is_in_neither_group():
+    df = _with_gaps()
+    rows = summary_cube(df, thresholds=(2,)).query("focus == 'B1' and criterion == 'A1'")
+    assert int(rows.n_low.iloc[0] + rows.n_high.iloc[0]) == len(df) - 1
+
+
+def test_complete_data_cohens_d():
+    df = pd.DataFrame({"X": [1, 1, 3, 3], "Y": [1.0, 2.0, 3.0, 4.0]})
+    row = summary_cube(df, thresholds=(2,)).query("focus == 'X' and criterion == 'Y'").iloc[0]
+    assert (row.n_low, row.n_high, row.mean_low, row.mean_high) == (2, 2, 1.5, 3.5)
+    assert row.cohens_d == pytest.approx(2.0 / np.sqrt(0.5))